@@ -0,0 +1,86 @@
+# benchmarks/bench_db_writer.py
+"""
+Benchmark message persistence: the old connect-insert-commit per message
+against the batched background writer in db.py.
+
+Runs against a throwaway database in a temp directory.
+
+    python benchmarks/bench_db_writer.py
+    python benchmarks/bench_db_writer.py --messages 50000 --json
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import db  # noqa: E402
+
+
+def per_message_connect(n: int) -> float:
+    """
+    The previous save_message: one connection and one commit per insert.
+    """
+    started = time.perf_counter()
+    for i in range(n):
+        with sqlite3.connect(db.DB_PATH) as conn:
+            conn.execute(
+                "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
+                (f"c{i % 100}", "user", f"message {i}"),
+            )
+    return time.perf_counter() - started
+
+
+async def batched_writer(n: int):
+    """
+    Returns (time to enqueue on the event loop, time until committed).
+    """
+    started = time.perf_counter()
+    for i in range(n):
+        await db.save_message_async("user", f"message {i}", f"c{i % 100}")
+    enqueued = time.perf_counter() - started
+    await asyncio.to_thread(db.writer.flush)
+    return enqueued, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--baseline-messages", type=int, default=2000, help="the per-message baseline is slow")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = pathlib.Path(tmp) / "bench.db"
+        db.init_db()
+
+        baseline_s = per_message_connect(args.baseline_messages)
+        enqueue_s, total_s = asyncio.run(batched_writer(args.messages))
+        db.writer.close()
+        stats = db.writer.snapshot()
+
+    result = {
+        "baseline_messages": args.baseline_messages,
+        "baseline_msgs_per_s": round(args.baseline_messages / baseline_s),
+        "messages": args.messages,
+        "enqueue_msgs_per_s": round(args.messages / enqueue_s),
+        "committed_msgs_per_s": round(args.messages / total_s),
+        "batches": stats["batches"],
+        "errors": stats["errors"],
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    for key, value in result.items():
+        print(f"{key:>22}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# benchmarks/bench_endpoints.py
+"""
+End-to-end endpoint benchmark against local mock upstreams.
+
+Starts benchmarks/mock_upstreams.py and the API (uvicorn main:app) as
+subprocesses, points every provider at its stand-in through the
+<PROVIDER>_BASE_URL overrides in http_clients, then drives each endpoint at
+several concurrency levels and reports p50/p95/p99 latency, RPS, error
+count and the API's peak RSS.
+
+    python benchmarks/bench_endpoints.py
+    python benchmarks/bench_endpoints.py --concurrency 1 8 32 --requests 200 \
+        --endpoints experiences travel-intel --out results.json
+    python benchmarks/bench_endpoints.py --profile slow.json --locations 5
+    python benchmarks/bench_endpoints.py --endpoints chat-experiences --days 7
+
+--locations sets how many distinct places the requests cycle through: few
+locations measure the warm (cached) path, many measure the cold one. Reddit
+goes through PRAW rather than http_clients, so it is left unconfigured and
+/social only exercises YouTube.
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+MOCKS = ROOT / "benchmarks" / "mock_upstreams.py"
+
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from mock_upstreams import PROVIDERS  # noqa: E402
+
+DUMMY_KEYS = {
+    "VY_GROQ_API_KEY": "bench",
+    "GEOAPIFY_API_KEY": "bench",
+    "YELP_API_KEY": "bench",
+    "WEATHERAPI_KEY": "bench",
+    "TOMTOMKEY": "bench",
+    "YOUTUBE_API_KEY": "bench",
+    "T_PAYOUTS_TOKEN": "bench",
+    "OPENWEATHER": "bench",
+}
+
+PLACES = [
+    "Pune", "Jaipur", "Udaipur", "Kochi", "Shimla", "Manali", "Ooty", "Hampi",
+    "Varanasi", "Rishikesh", "Munnar", "Gokarna", "Ranikhet", "Leh", "Darjeeling",
+    "Mysuru", "Puducherry", "Jodhpur", "Agra", "Amritsar",
+]
+
+
+# Trip length for /chat/experiences (--days)
+CHAT_DAYS = 2
+
+
+def place(i: int, locations: int) -> str:
+    base = PLACES[i % locations % len(PLACES)]
+    cycle = (i % locations) // len(PLACES)
+    return f"{base} {cycle}" if cycle else base
+
+
+# -----------------------------
+# ENDPOINTS
+# -----------------------------
+def chat_experiences(i, loc, images_url):
+    body = {"location": loc, "duration": "multi_day", "num_days": CHAT_DAYS, "activity": "food"}
+    return "POST", "/chat/experiences", {"json": body}
+
+
+def experiences(i, loc, images_url):
+    return "GET", "/experiences", {"params": {"location": loc}}
+
+
+def village_experiences(i, loc, images_url):
+    return "GET", "/village/experiences", {"params": {"location": loc}}
+
+
+def travel_intel(i, loc, images_url):
+    return "GET", "/travel-intel", {"params": {"city": loc}}
+
+
+def social(i, loc, images_url):
+    return "GET", "/social", {"params": {"location": loc}}
+
+
+def hotels(i, loc, images_url):
+    params = {"city": loc, "check_in": "2030-01-10", "check_out": "2030-01-12"}
+    return "GET", "/hotels", {"params": params}
+
+
+def img(i, loc, images_url):
+    params = {"url": f"{images_url}/photo/{loc}.jpg", "w": 480}
+    return "GET", "/img", {"params": params}
+
+
+ENDPOINTS = {
+    "chat-experiences": chat_experiences,
+    "experiences": experiences,
+    "village-experiences": village_experiences,
+    "travel-intel": travel_intel,
+    "social": social,
+    "hotels": hotels,
+    "img": img,
+}
+
+
+# -----------------------------
+# PROCESSES
+# -----------------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mocks(port_base: int, profile: str, seed: int):
+    cmd = [sys.executable, str(MOCKS), "--port-base", str(port_base), "--seed", str(seed)]
+    if profile:
+        cmd += ["--profile", profile]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if not line:
+        raise SystemExit("mock upstreams exited before becoming ready")
+    return proc, json.loads(line)["base_urls"]
+
+
+def start_app(port: int, base_urls: dict, workdir: str):
+    env = {**os.environ, **DUMMY_KEYS, "PYTHONPATH": str(ROOT), "IMG_CACHE_DIR": str(pathlib.Path(workdir) / "img")}
+    for name in PROVIDERS:
+        env[f"{name.upper()}_BASE_URL"] = base_urls[name]
+        # The mocks have no quota: keep the client-side limiter out of the numbers
+        env[f"{name.upper()}_RATE_PER_S"] = "100000"
+        env[f"{name.upper()}_BURST"] = "100000"
+        env[f"{name.upper()}_DAILY_QUOTA"] = "0"
+    env.setdefault("PREWARM_ENABLED", "0")
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("API exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise SystemExit("API did not start within 60s")
+
+
+def peak_rss_kb(pid: int):
+    """
+    VmHWM (peak resident set) from /proc; None where /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+# -----------------------------
+# LOAD
+# -----------------------------
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def reports_error(r) -> bool:
+    """
+    Several endpoints answer 200 with an "error" key instead of failing.
+    """
+    if not r.headers.get("content-type", "").startswith("application/json"):
+        return False
+    try:
+        body = r.json()
+    except ValueError:
+        return True
+    return isinstance(body, dict) and bool(body.get("error"))
+
+
+async def run_level(client, endpoint: str, concurrency: int, requests: int, locations: int, images_url: str):
+    build = ENDPOINTS[endpoint]
+    latencies, errors, statuses = [], 0, {}
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, path, kwargs = build(i, place(i, locations), images_url)
+            started = time.perf_counter()
+            try:
+                r = await client.request(method, path, **kwargs)
+                await r.aread()
+                status = r.status_code
+                failed = status >= 400 or reports_error(r)
+            except httpx.HTTPError as e:
+                status, failed = type(e).__name__, True
+            latencies.append(time.perf_counter() - started)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(len(latencies) / wall, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+async def run(args, app_port: int, images_url: str, app_pid: int):
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    results = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{app_port}", timeout=60, limits=limits) as client:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                row = await run_level(client, endpoint, concurrency, args.requests, args.locations, images_url)
+                row["peak_rss_kb"] = peak_rss_kb(app_pid)
+                results.append(row)
+                print(
+                    f"{endpoint:>20} c={concurrency:<4} rps={row['rps']:<8} p50={row['p50_ms']:<8} "
+                    f"p95={row['p95_ms']:<8} p99={row['p99_ms']:<8} err={row['errors']:<4} "
+                    f"rss={row['peak_rss_kb']}kB",
+                    file=sys.stderr, flush=True,
+                )
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    global CHAT_DAYS
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint and concurrency level")
+    parser.add_argument("--locations", type=int, default=len(PLACES), help="distinct locations to cycle through")
+    parser.add_argument("--days", type=int, default=CHAT_DAYS, help="trip length for chat-experiences")
+    parser.add_argument("--profile", help="latency / failure profile for the mocks (JSON)")
+    parser.add_argument("--mock-port-base", type=int, default=19000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON to this file (default: stdout)")
+    args = parser.parse_args()
+    CHAT_DAYS = args.days
+
+    mocks, base_urls = start_mocks(args.mock_port_base, args.profile, args.seed)
+    app = None
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            app_port = free_port()
+            app = start_app(app_port, base_urls, workdir)
+            results = asyncio.run(run(args, app_port, base_urls["images"], app.pid))
+            report = {
+                "commit": git_commit(),
+                "python": sys.version.split()[0],
+                "config": {k: v for k, v in vars(args).items() if k != "out"},
+                "peak_rss_kb": peak_rss_kb(app.pid),
+                "results": results,
+            }
+            app.terminate()
+            app.wait(10)
+    finally:
+        if app is not None and app.poll() is None:
+            app.kill()
+        mocks.terminate()
+        mocks.wait(10)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        pathlib.Path(args.out).write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
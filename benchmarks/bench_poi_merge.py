@@ -0,0 +1,134 @@
+# benchmarks/bench_poi_merge.py
+"""
+Benchmark poi_merge.merge_pois against a naive O(n^2) pairwise merge.
+
+Generates synthetic cities where each real place shows up in 1-4 providers
+with jittered coordinates and name variants, then reports merge time and how
+many canonical places were produced.
+
+    python benchmarks/bench_poi_merge.py
+    python benchmarks/bench_poi_merge.py --sizes 100 300 1000 --json
+"""
+import argparse
+import json
+import math
+import pathlib
+import random
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from geo import haversine_m  # noqa: E402
+from poi_merge import (  # noqa: E402
+    FAR_SIMILARITY,
+    MAX_MATCH_M,
+    NEAR_M,
+    NEAR_SIMILARITY,
+    merge_pois,
+    name_similarity,
+    normalize_name,
+)
+
+SOURCES = ["geoapify", "yelp", "foursquare", "opentripmap"]
+WORDS = [
+    "fort", "lake", "garden", "temple", "market", "museum", "beach", "palace",
+    "gate", "bazaar", "church", "mosque", "park", "tower", "bridge", "cafe",
+]
+
+
+def synthetic_candidates(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    center_lat, center_lon = 19.076, 72.8777
+    out = []
+    place = 0
+    while len(out) < n:
+        place += 1
+        base_name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {place}"
+        lat = center_lat + rng.uniform(-0.1, 0.1)
+        lon = center_lon + rng.uniform(-0.1, 0.1)
+        for source in rng.sample(SOURCES, rng.randint(1, 4)):
+            name = rng.choice([base_name, base_name.upper(), f"The {base_name}", f"{base_name} Mumbai"])
+            jitter = 40 / 111320
+            out.append({
+                "name": name,
+                "lat": lat + rng.uniform(-jitter, jitter),
+                "lon": lon + rng.uniform(-jitter, jitter),
+                "source": source,
+            })
+    return out[:n], place
+
+
+def naive_merge(candidates):
+    """
+    Reference O(n^2): every pair gets a haversine and a name comparison.
+    """
+    keys = [normalize_name(c["name"]) for c in candidates]
+    parent = list(range(len(candidates)))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(len(candidates)):
+        for j in range(i + 1, len(candidates)):
+            d = haversine_m(candidates[i]["lat"], candidates[i]["lon"], candidates[j]["lat"], candidates[j]["lon"])
+            if d > MAX_MATCH_M:
+                continue
+            s = name_similarity(keys[i], keys[j])
+            if (d <= NEAR_M and s >= NEAR_SIMILARITY) or s >= FAR_SIMILARITY:
+                parent[find(j)] = find(i)
+
+    return len({find(i) for i in range(len(candidates))})
+
+
+def timed(fn, repeat: int):
+    best = math.inf
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 300, 1000, 3000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--naive-max", type=int, default=1000, help="skip the O(n^2) baseline above this size")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        candidates, real_places = synthetic_candidates(n)
+        merge_s, merged = timed(lambda: merge_pois(candidates), args.repeat)
+        row = {
+            "candidates": n,
+            "real_places": real_places,
+            "merged_places": len(merged),
+            "merge_ms": round(merge_s * 1000, 3),
+        }
+        if n <= args.naive_max:
+            naive_s, naive_groups = timed(lambda: naive_merge(candidates), 1)
+            row["naive_ms"] = round(naive_s * 1000, 3)
+            row["naive_places"] = naive_groups
+            row["speedup"] = round(naive_s / merge_s, 1)
+        rows.append(row)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'candidates':>10} {'real':>6} {'merged':>7} {'merge ms':>10} {'naive ms':>10} {'speedup':>8}")
+    for r in rows:
+        print(
+            f"{r['candidates']:>10} {r['real_places']:>6} {r['merged_places']:>7} {r['merge_ms']:>10} "
+            f"{r.get('naive_ms', '-'):>10} {r.get('speedup', '-'):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# benchmarks/bench_startup.py
+"""
+Cold start benchmark.
+
+Reports, as medians over --runs fresh interpreters:
+  * import_main_s  - `import main` (what a worker pays before serving)
+  * import_eager_s - `import main` plus loading every provider integration,
+                     i.e. what startup cost before the lazy registry
+  * ready_s        - spawn `uvicorn main:app` until GET / answers
+  * warm_s         - spawn until /stats/providers shows everything loaded
+  * modules        - per-module import cost from `python -X importtime`
+                     (with every provider loaded), self and cumulative, for
+                     app modules and the heaviest third-party packages
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --top 25 --json
+"""
+import argparse
+import json
+import os
+import pathlib
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+APP_MODULES = {p.stem for p in ROOT.glob("*.py")}
+
+
+def env():
+    return {**os.environ, "PYTHONPATH": str(ROOT), "PREWARM_ENABLED": "0"}
+
+
+def python(code: str, cwd: str, *flags) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=cwd, env=env(), capture_output=True, text=True, check=True,
+    )
+
+
+# __import__ rather than providers.get(): -X importtime does not see
+# importlib.import_module, only import statements and __import__
+LOAD_ALL = "import providers\nfor spec in providers.PROVIDERS.values(): __import__(spec['module'])\n"
+
+
+def timed_import(cwd: str, eager: bool) -> float:
+    code = (
+        "import time; t = time.perf_counter(); import main\n"
+        + (LOAD_ALL if eager else "")
+        + "print(time.perf_counter() - t)"
+    )
+    return float(python(code, cwd).stdout.strip().splitlines()[-1])
+
+
+def import_profile(cwd: str) -> dict:
+    """
+    {module: (self_us, cumulative_us)} for top-level packages and app
+    modules, with every provider loaded so integrations are listed too.
+    """
+    stderr = python("import main\n" + LOAD_ALL, cwd, "-X", "importtime").stderr
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        top = name.split(".")[0]
+        if name != top and top not in APP_MODULES:
+            continue
+        modules[name] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_ready(cwd: str):
+    """
+    (seconds until GET / answers, seconds until every provider is loaded)
+    """
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    ready = warm = None
+    try:
+        deadline = started + 60
+        while time.perf_counter() < deadline and warm is None:
+            try:
+                if ready is None:
+                    httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+                    ready = time.perf_counter() - started
+                providers = httpx.get(f"http://127.0.0.1:{port}/stats/providers", timeout=1).json()
+                if all(p["loaded"] for p in providers.values()):
+                    warm = time.perf_counter() - started
+            except httpx.TransportError:
+                pass
+            time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+    return ready, warm
+
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="third-party packages to list")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        lazy = [timed_import(cwd, eager=False) for _ in range(args.runs)]
+        eager = [timed_import(cwd, eager=True) for _ in range(args.runs)]
+        boots = [time_to_ready(cwd) for _ in range(args.runs)]
+        profiles = [import_profile(cwd) for _ in range(args.runs)]
+
+    names = set().union(*profiles)
+    modules = {
+        name: {
+            "self_ms": median([p[name][0] / 1000 for p in profiles if name in p]),
+            "cumulative_ms": median([p[name][1] / 1000 for p in profiles if name in p]),
+            "app": name.split(".")[0] in APP_MODULES,
+        }
+        for name in names
+    }
+    app_modules = {n: m for n, m in modules.items() if m["app"]}
+    third_party = sorted(
+        ((n, m) for n, m in modules.items() if not m["app"]),
+        key=lambda item: item[1]["cumulative_ms"], reverse=True,
+    )[:args.top]
+
+    result = {
+        "runs": args.runs,
+        "import_main_s": median(lazy),
+        "import_eager_s": median(eager),
+        "ready_s": median([r for r, _ in boots]),
+        "warm_s": median([w for _, w in boots]),
+        "app_modules": dict(sorted(app_modules.items(), key=lambda item: -item[1]["cumulative_ms"])),
+        "third_party": dict(third_party),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    for key in ("import_main_s", "import_eager_s", "ready_s", "warm_s"):
+        print(f"{key:>16}: {result[key]}")
+    for title, rows in (("app modules", result["app_modules"]), ("third party", result["third_party"])):
+        print(f"\n{title:<32} {'self ms':>10} {'cum ms':>10}")
+        for name, row in rows.items():
+            print(f"{name:<32} {row['self_ms']:>10} {row['cumulative_ms']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+# benchmarks/mock_upstreams.py
+"""
+Local stand-ins for the paid upstream APIs, for benchmarks.
+
+One small Starlette app per provider, each on its own port, answering with
+plausible canned payloads after a latency drawn from a log-normal
+distribution. A share of requests can fail with 500 or be throttled with 429.
+
+    python benchmarks/mock_upstreams.py --port-base 19000
+    python benchmarks/mock_upstreams.py --profile slow.json
+
+A profile is JSON: {"<provider>": {"median_ms": 80, "sigma": 0.5,
+"failure_rate": 0.01, "throttle_rate": 0.0}, ...}; missing providers and
+fields use DEFAULT_PROFILE. Once listening, the process prints one JSON line
+{"ready": true, "base_urls": {...}} so a driver can wire the app to it.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import math
+import random
+import re
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Providers the app reaches through http_clients, in port order
+PROVIDERS = [
+    "groq", "geoapify", "yelp", "weatherapi", "openmeteo", "openmeteo_geocoding",
+    "openweather", "tomtom", "youtube", "travelpayouts", "images",
+]
+
+DEFAULT_PROFILE = {
+    "groq": {"median_ms": 600, "sigma": 0.4},
+    "geoapify": {"median_ms": 120, "sigma": 0.5},
+    "yelp": {"median_ms": 150, "sigma": 0.5},
+    "weatherapi": {"median_ms": 80, "sigma": 0.4},
+    "openmeteo": {"median_ms": 60, "sigma": 0.4},
+    "openmeteo_geocoding": {"median_ms": 40, "sigma": 0.4},
+    "openweather": {"median_ms": 70, "sigma": 0.4},
+    "tomtom": {"median_ms": 90, "sigma": 0.5},
+    "youtube": {"median_ms": 150, "sigma": 0.5},
+    "travelpayouts": {"median_ms": 200, "sigma": 0.5},
+    "images": {"median_ms": 50, "sigma": 0.5},
+}
+DEFAULT_FIELDS = {"median_ms": 100, "sigma": 0.5, "failure_rate": 0.0, "throttle_rate": 0.0}
+
+
+def load_profile(path: str = None) -> dict:
+    overrides = {}
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+    return {
+        name: {**DEFAULT_FIELDS, **DEFAULT_PROFILE.get(name, {}), **overrides.get(name, {})}
+        for name in PROVIDERS
+    }
+
+
+# -----------------------------
+# HELPERS
+# -----------------------------
+def latency_s(profile: dict) -> float:
+    return random.lognormvariate(math.log(profile["median_ms"] / 1000), profile["sigma"])
+
+
+def seeded(*parts) -> random.Random:
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()
+    return random.Random(int(digest[:12], 16))
+
+
+def coords_for(name: str):
+    """
+    Deterministic pseudo-coordinates for a place name (inside India).
+    """
+    rng = seeded(name.casefold().strip())
+    return round(rng.uniform(9, 30), 5), round(rng.uniform(70, 88), 5)
+
+
+def image_bytes() -> bytes:
+    try:
+        from PIL import Image
+        buf = io.BytesIO()
+        Image.new("RGB", (1280, 720), (90, 140, 200)).save(buf, "JPEG", quality=85)
+        return buf.getvalue()
+    except ImportError:
+        # Not decodable, but fine for pass-through /img requests
+        return b"\xff\xd8\xff" + bytes(random.Random(1).getrandbits(8) for _ in range(200_000))
+
+
+IMAGE = image_bytes()
+
+WORDS = ["Fort", "Lake", "Garden", "Temple", "Market", "Museum", "Beach", "Palace", "Gate", "Park"]
+
+
+def place_names(seed: str, n: int):
+    rng = seeded(seed)
+    return [f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}" for i in range(n)]
+
+
+# -----------------------------
+# PAYLOADS
+# -----------------------------
+async def groq(request):
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+    match = re.search(r"Total items must be exactly (\d+)", prompt)
+    total = int(match.group(1)) if match else 3
+    location = (re.search(r"visiting: (.*)", prompt) or [None, "Somewhere"])[1]
+    # A day-range shard numbers its days from 1 but plans different places
+    shard = re.search(r"covers only days (\d+) to", prompt)
+    offset = (int(shard.group(1)) - 1) * 2 if shard else 0
+
+    items = [
+        {
+            "day": i // 2 + 1,
+            "title": f"{location} day {i // 2 + 1} block {i + 1}",
+            "intro": "What people enjoy here.",
+            "top_places": [
+                {"name": f"{name} ({offset + i + 1})", "tip": "Go early."}
+                for name in place_names(f"{location}{offset + i}", 3)
+            ],
+        }
+        for i in range(total)
+    ]
+    text = json.dumps(items)
+    pieces = [text[i:i + 24] for i in range(0, len(text), 24)]
+    delay = request.state.latency / max(1, len(pieces))
+
+    async def sse():
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            chunk = {"choices": [{"delta": {"content": piece}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
+
+
+def geoapify_feature(name, lat, lon, categories, distance=None):
+    return {
+        "type": "Feature",
+        "properties": {"name": name, "categories": categories, "formatted": f"{name}, Somewhere", "distance": distance},
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+    }
+
+
+async def geoapify(request):
+    params = request.query_params
+    if request.url.path.endswith("/geocode/search"):
+        lat, lon = coords_for(params.get("text", ""))
+        return JSONResponse({"features": [geoapify_feature(params.get("text"), lat, lon, ["administrative"])]})
+
+    seed = params.get("filter", "") + params.get("text", "")
+    rng = seeded(seed)
+    match = re.search(r"circle:([\d.-]+),([\d.-]+)", params.get("filter", ""))
+    lon0, lat0 = (float(match.group(1)), float(match.group(2))) if match else (77.0, 20.0)
+    categories = (params.get("categories") or "tourism.sights").split(",")
+    limit = int(params.get("limit", 20))
+    features = [
+        geoapify_feature(
+            name,
+            lat0 + rng.uniform(-0.1, 0.1),
+            lon0 + rng.uniform(-0.1, 0.1),
+            [rng.choice(categories)],
+            distance=rng.randint(100, 40000),
+        )
+        for name in place_names(seed, limit)
+    ]
+    return JSONResponse({"features": features})
+
+
+async def yelp(request):
+    location = request.query_params.get("location", "")
+    lat, lon = coords_for(location)
+    rng = seeded(location, request.query_params.get("term"))
+    businesses = [
+        {
+            "name": name,
+            "categories": [{"alias": rng.choice(["museums", "parks", "restaurants", "cafes"])}],
+            "rating": round(rng.uniform(3, 5), 1),
+            "location": {"display_address": [f"{name} Road", location]},
+            "image_url": f"https://images.example/{i}.jpg",
+            "url": f"https://yelp.example/{i}",
+            "coordinates": {"latitude": lat + rng.uniform(-0.05, 0.05), "longitude": lon + rng.uniform(-0.05, 0.05)},
+        }
+        for i, name in enumerate(place_names(location, int(request.query_params.get("limit", 10))))
+    ]
+    return JSONResponse({"businesses": businesses})
+
+
+async def weatherapi(request):
+    rng = seeded(request.query_params.get("q"))
+    condition = rng.choice(["Sunny", "Partly cloudy", "Light rain", "Mist"])
+    return JSONResponse({"current": {"temp_c": round(rng.uniform(12, 38), 1), "condition": {"text": condition}}})
+
+
+def daily_forecast(lat, lon):
+    rng = seeded(lat, lon)
+    return {
+        "daily": {
+            "time": [f"2030-01-{d + 1:02d}" for d in range(16)],
+            "temperature_2m_max": [round(rng.uniform(25, 38), 1) for _ in range(16)],
+            "temperature_2m_min": [round(rng.uniform(12, 24), 1) for _ in range(16)],
+            "weathercode": [rng.choice([0, 1, 2, 3, 61]) for _ in range(16)],
+            "rain_sum": [round(rng.uniform(0, 8), 1) for _ in range(16)],
+            "windspeed_10m_max": [round(rng.uniform(5, 30), 1) for _ in range(16)],
+        }
+    }
+
+
+async def openmeteo(request):
+    lats = request.query_params.get("latitude", "0").split(",")
+    lons = request.query_params.get("longitude", "0").split(",")
+    forecasts = [daily_forecast(lat, lon) for lat, lon in zip(lats, lons)]
+    return JSONResponse(forecasts if len(forecasts) > 1 else forecasts[0])
+
+
+async def openmeteo_geocoding(request):
+    name = request.query_params.get("name", "")
+    if name.casefold().startswith("nowhere"):
+        return JSONResponse({})
+    lat, lon = coords_for(name)
+    return JSONResponse({"results": [{"name": name, "latitude": lat, "longitude": lon}]})
+
+
+async def openweather(request):
+    rng = seeded(request.query_params.get("lat"), request.query_params.get("lon"))
+    return JSONResponse({"list": [{"main": {"aqi": rng.randint(1, 5)}, "components": {"pm2_5": rng.uniform(5, 90)}}]})
+
+
+async def tomtom(request):
+    rng = seeded(request.query_params.get("point"))
+    free = rng.randint(40, 70)
+    return JSONResponse({"flowSegmentData": {"currentSpeed": rng.randint(10, free), "freeFlowSpeed": free}})
+
+
+async def youtube(request):
+    q = request.query_params.get("q", "")
+    items = [
+        {
+            "id": {"videoId": f"v{i}"},
+            "snippet": {
+                "title": f"{q} vlog {i}",
+                "description": "A walk through the old town.",
+                "thumbnails": {"medium": {"url": f"{request.app.state.images_url}/thumb/{i}.jpg"}},
+            },
+        }
+        for i in range(int(request.query_params.get("maxResults", 5)))
+    ]
+    return JSONResponse({"items": items})
+
+
+async def travelpayouts(request):
+    location = request.query_params.get("location", "")
+    lat, lon = coords_for(location)
+    rng = seeded(location)
+    hotels = [
+        {
+            "hotelName": f"Hotel {name}",
+            "stars": rng.randint(2, 5),
+            "priceFrom": rng.randint(1500, 12000),
+            "location": {"geo": {"lat": lat + rng.uniform(-0.05, 0.05), "lon": lon + rng.uniform(-0.05, 0.05)}},
+        }
+        for name in place_names(location, int(request.query_params.get("limit", 6)))
+    ]
+    return JSONResponse(hotels)
+
+
+async def images(request):
+    return Response(IMAGE, media_type="image/jpeg", headers={"ETag": '"mock-image"', "Cache-Control": "max-age=3600"})
+
+
+HANDLERS = {
+    "groq": groq, "geoapify": geoapify, "yelp": yelp, "weatherapi": weatherapi,
+    "openmeteo": openmeteo, "openmeteo_geocoding": openmeteo_geocoding,
+    "openweather": openweather, "tomtom": tomtom, "youtube": youtube,
+    "travelpayouts": travelpayouts, "images": images,
+}
+
+
+# -----------------------------
+# APPS
+# -----------------------------
+def build_app(name: str, profile: dict, images_url: str) -> Starlette:
+    handler = HANDLERS[name]
+    stats = {"requests": 0, "failed": 0, "throttled": 0}
+
+    async def endpoint(request):
+        stats["requests"] += 1
+        request.state.latency = latency_s(profile)
+        roll = random.random()
+        if roll < profile["throttle_rate"]:
+            stats["throttled"] += 1
+            return JSONResponse({"error": "rate limited"}, status_code=429, headers={"Retry-After": "1"})
+        if roll < profile["throttle_rate"] + profile["failure_rate"]:
+            await asyncio.sleep(request.state.latency)
+            stats["failed"] += 1
+            return JSONResponse({"error": "mock failure"}, status_code=500)
+        if name != "groq":      # Groq spreads its latency over the stream
+            await asyncio.sleep(request.state.latency)
+        return await handler(request)
+
+    async def mock_stats(request):
+        return JSONResponse(stats)
+
+    app = Starlette(routes=[
+        Route("/__stats", mock_stats),
+        Route("/{path:path}", endpoint, methods=["GET", "POST"]),
+    ])
+    app.state.images_url = images_url
+    return app
+
+
+async def serve(port_base: int, profile: dict, host: str = "127.0.0.1"):
+    ports = {name: port_base + i for i, name in enumerate(PROVIDERS)}
+    base_urls = {name: f"http://{host}:{port}" for name, port in ports.items()}
+
+    servers = [
+        uvicorn.Server(uvicorn.Config(
+            build_app(name, profile[name], base_urls["images"]),
+            host=host, port=ports[name], log_level="warning", access_log=False,
+        ))
+        for name in PROVIDERS
+    ]
+    tasks = [asyncio.create_task(server.serve()) for server in servers]
+    while not all(server.started for server in servers):
+        if any(task.done() for task in tasks):
+            raise SystemExit("mock upstream failed to start")
+        await asyncio.sleep(0.05)
+
+    print(json.dumps({"ready": True, "base_urls": base_urls}), flush=True)
+    await asyncio.gather(*tasks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port-base", type=int, default=19000)
+    parser.add_argument("--profile", help="JSON latency / failure profile")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    asyncio.run(serve(args.port_base, load_profile(args.profile)))
+
+
+if __name__ == "__main__":
+    main()
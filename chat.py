@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from pydantic import BaseModel
 from datetime import datetime
 import json
+import logging
 from llm import generate_itinerary
 from pydantic import BaseModel
 from typing import Optional
@@ -9,6 +10,8 @@ from typing import Optional
 # Only needed if run standalone
 app = FastAPI()
 
+log = logging.getLogger(__name__)
+
 # -----------------------------
 # Models
 # -----------------------------
@@ -53,8 +56,7 @@ def register_chat_routes(app: FastAPI):
                 days = max(1, num_days)
                 total_experiences = days * experiences_per_day
     
-            print("RECEIVED:", data)
-            print("TOTAL EXPERIENCES:", total_experiences)
+            log.debug("itinerary request", extra={"location": location, "total_experiences": total_experiences})
     
             prompt = f"""
     You are a travel assistant.
@@ -85,7 +87,7 @@ def register_chat_routes(app: FastAPI):
     Output only the JSON array. No explanation text.
     """
     
-            llm_output = generate_itinerary(prompt)
+            llm_output = await generate_itinerary(prompt)
     
             if isinstance(llm_output, list):
                 experiences = llm_output
@@ -112,7 +114,7 @@ def register_chat_routes(app: FastAPI):
             return {"stops": experiences}
     
         except Exception as e:
-            print("ERROR:", e)
+            log.exception("itinerary request failed")
             return {"stops": [], "error": str(e)}
     
     
@@ -0,0 +1,144 @@
+# circuit_breaker.py
+"""
+Per-provider circuit breakers and latency tracking.
+
+Each upstream gets a breaker fed by the outcome of its recent calls: errors,
+5xx answers and calls slower than its slow-call threshold count as failures.
+When the failure rate over the window crosses CB_FAILURE_RATE the breaker
+opens and requests fail immediately with CircuitOpen (so provider modules
+fall back at once instead of waiting out their timeouts). After CB_OPEN_S a
+single probe is let through (half-open); it decides whether to close again.
+
+The same latency window gives the p95 used as the hedging delay for
+idempotent GETs.
+"""
+import logging
+import os
+import time
+from collections import deque
+
+import httpx
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+WINDOW = int(os.getenv("CB_WINDOW", "20"))
+MIN_CALLS = int(os.getenv("CB_MIN_CALLS", "10"))
+FAILURE_RATE = float(os.getenv("CB_FAILURE_RATE", "0.5"))
+OPEN_S = float(os.getenv("CB_OPEN_S", "30"))
+SLOW_CALL_S = float(os.getenv("CB_SLOW_CALL_S", "5"))
+
+log = logging.getLogger(__name__)
+
+LATENCY_SAMPLES = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_S = float(os.getenv("HEDGE_MIN_DELAY_S", "0.05"))
+# At most this share of requests may send a second attempt
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.05"))
+
+
+class CircuitOpen(httpx.TransportError):
+    """
+    Raised instead of calling an upstream whose breaker is open.
+    """
+
+
+def percentile(samples, q: float):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, slow_call_s: float = SLOW_CALL_S):
+        self.name = name
+        self.slow_call_s = slow_call_s
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.outcomes = deque(maxlen=WINDOW)        # True = failure
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.stats = {"calls": 0, "failures": 0, "short_circuited": 0, "opened": 0, "hedges": 0, "hedge_wins": 0}
+
+    # -- breaker --
+    def allow(self):
+        """
+        Raise CircuitOpen unless a call may go upstream now.
+        """
+        if self.state == OPEN and time.monotonic() - self.opened_at >= OPEN_S:
+            self.state = HALF_OPEN
+            self.probing = False
+
+        if self.state == CLOSED:
+            return
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return
+
+        self.stats["short_circuited"] += 1
+        raise CircuitOpen(f"{self.name} circuit open")
+
+    def record(self, failed: bool, latency_s: float = None):
+        self.stats["calls"] += 1
+        if latency_s is not None:
+            self.latencies.append(latency_s)
+            failed = failed or latency_s > self.slow_call_s
+        if failed:
+            self.stats["failures"] += 1
+
+        if self.state == HALF_OPEN:
+            self.probing = False
+            if failed:
+                self._open()
+            else:
+                self.state = CLOSED
+                self.outcomes.clear()
+            return
+
+        self.outcomes.append(failed)
+        if (
+            self.state == CLOSED
+            and len(self.outcomes) >= MIN_CALLS
+            and sum(self.outcomes) / len(self.outcomes) >= FAILURE_RATE
+        ):
+            self._open()
+
+    def abandon(self):
+        """
+        A call was cancelled before it finished: free the half-open probe.
+        """
+        if self.state == HALF_OPEN:
+            self.probing = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.stats["opened"] += 1
+        log.warning("circuit opened", extra={"provider": self.name})
+
+    # -- hedging --
+    def hedge_delay(self):
+        """
+        Delay before a second attempt (p95 latency), or None when hedging
+        is not allowed right now.
+        """
+        if self.state != CLOSED or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        if self.stats["hedges"] >= HEDGE_MAX_RATIO * self.stats["calls"]:
+            return None
+        return max(HEDGE_MIN_DELAY_S, percentile(self.latencies, 0.95))
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "state": self.state,
+            "failure_rate": round(sum(self.outcomes) / len(self.outcomes), 3) if self.outcomes else 0.0,
+            "p50_ms": round(percentile(self.latencies, 0.5) * 1000, 1) if self.latencies else None,
+            "p95_ms": round(percentile(self.latencies, 0.95) * 1000, 1) if self.latencies else None,
+        }
+
+
+def is_failure(response: httpx.Response) -> bool:
+    return response.status_code >= 500
@@ -1,15 +1,241 @@
 import sqlite3, pathlib
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+
 DB_PATH = pathlib.Path("concierge.db")
 
+log = logging.getLogger(__name__)
+
+# -----------------------------
+# WRITER SETTINGS (env overridable)
+# -----------------------------
+WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", "10000"))
+WRITE_BATCH_ROWS = int(os.getenv("DB_WRITE_BATCH_ROWS", "500"))
+WRITE_BATCH_MS = float(os.getenv("DB_WRITE_BATCH_MS", "50"))
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False)
+    # WAL is a property of the database file: every other connection to it
+    # (geocoding, poi_index, prewarm) gets concurrent reads during writes too.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
+    with connect() as conn:
         conn.execute("""CREATE TABLE IF NOT EXISTS messages (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             role TEXT,
             content TEXT,
             ts DATETIME DEFAULT CURRENT_TIMESTAMP)
         """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+        if "conversation_id" not in columns:
+            conn.execute("ALTER TABLE messages ADD COLUMN conversation_id TEXT")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS messages_conversation ON messages (conversation_id, id)"
+        )
+
+
+# -----------------------------
+# BATCHED WRITER
+# -----------------------------
+class MessageWriter:
+    """
+    One long-lived connection owned by a writer thread. Messages go through
+    a bounded queue and are committed in batches of WRITE_BATCH_ROWS rows or
+    every WRITE_BATCH_MS, whichever comes first, so request handlers never
+    wait on a connection open or an fsync.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = {}          # conversation_id -> rows not yet committed
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "errors": 0}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            init_db()
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    # -- producer side --
+    def _track(self, conversation_id, delta: int):
+        with self._lock:
+            left = self._pending.get(conversation_id, 0) + delta
+            if left > 0:
+                self._pending[conversation_id] = left
+            else:
+                self._pending.pop(conversation_id, None)
+
+    def put_nowait(self, row):
+        self.start()
+        # Counted before queueing so the writer can never un-count it first
+        self._track(row[0], 1)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._track(row[0], -1)
+            raise
+        self.stats["enqueued"] += 1
+
+    def put(self, row):
+        """
+        Blocking put: used when the queue is full (backpressure).
+        """
+        self.start()
+        self._track(row[0], 1)
+        self._queue.put(row)
+        self.stats["enqueued"] += 1
+
+    def pending(self, conversation_id=None) -> int:
+        with self._lock:
+            if conversation_id is None:
+                return sum(self._pending.values())
+            return self._pending.get(conversation_id, 0)
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Block until everything enqueued so far is committed.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # -- writer thread --
+    def _run(self):
+        conn = connect()
+        try:
+            while True:
+                item = self._queue.get()
+                batch, markers, stop = [], [], False
+                deadline = time.monotonic() + WRITE_BATCH_MS / 1000
+
+                while True:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        markers.append(item)
+                    else:
+                        batch.append(item)
+
+                    if stop or markers or len(batch) >= WRITE_BATCH_ROWS:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    self._write(conn, batch)
+                for marker in markers:
+                    marker.set()
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO messages (conversation_id, role, content) VALUES (?, ?, ?)",
+                    batch,
+                )
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            log.error("db writer dropped %d messages: %s", len(batch), e)
+        finally:
+            for conversation_id, _, _ in batch:
+                self._track(conversation_id, -1)
+
+    def snapshot(self):
+        return {**self.stats, "queued": self._queue.qsize(), "pending": self.pending()}
+
+
+writer = MessageWriter()
+
+
+def save_message(role: str, content: str, conversation_id: str = None):
+    """
+    Queue a message for the writer thread. Only blocks when the queue is full.
+    """
+    row = (conversation_id, role, content)
+    try:
+        writer.put_nowait(row)
+    except queue.Full:
+        writer.put(row)
+
+
+async def save_message_async(role: str, content: str, conversation_id: str = None):
+    """
+    Same as save_message, but waits off the event loop when the queue is full.
+    """
+    row = (conversation_id, role, content)
+    try:
+        writer.put_nowait(row)
+    except queue.Full:
+        await asyncio.to_thread(writer.put, row)
+
+
+# -----------------------------
+# READS
+# -----------------------------
+_read_local = threading.local()
+
+
+def _read_conn():
+    conn = getattr(_read_local, "conn", None)
+    if conn is None:
+        conn = connect()
+        _read_local.conn = conn
+    return conn
+
+
+def _history(conversation_id: str, limit: int):
+    rows = _read_conn().execute(
+        "SELECT role, content, ts FROM messages WHERE conversation_id = ? ORDER BY id DESC LIMIT ?",
+        (conversation_id, limit),
+    ).fetchall()
+    return [{"role": role, "content": content, "ts": ts} for role, content, ts in reversed(rows)]
+
+
+async def get_history(conversation_id: str, limit: int = 50):
+    """
+    Last `limit` messages of a conversation, oldest first. Messages of this
+    conversation still waiting in the queue are flushed first.
+    """
+    if writer.pending(conversation_id):
+        await asyncio.to_thread(writer.flush)
+    return await asyncio.to_thread(_history, conversation_id, limit)
+
 
-def save_message(role: str, content: str):
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute("INSERT INTO messages (role, content) VALUES (?, ?)", (role, content))
\ No newline at end of file
+async def shutdown():
+    await asyncio.to_thread(writer.close)
@@ -0,0 +1,210 @@
+# env_cache.py
+"""
+Stale-while-revalidate cache for weather and air-quality data, keyed by
+geohash cell instead of by city string, so "Bandra", "Andheri" and "Mumbai"
+share one entry. Per-location provider results that have no coordinates
+(experiences, social posts) use the same machinery with their own keys.
+
+Each dataset has its own freshness window. Fresh entries are served as-is;
+stale ones are served immediately while a background task refreshes them;
+only a cold cell (or one past its hard expiry) waits on the upstream.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import rate_limit
+from geo import geohash
+from singleflight import flights
+
+PRECISION = int(os.getenv("ENV_CACHE_GEOHASH_PRECISION", "4"))
+MAX_ENTRIES = int(os.getenv("ENV_CACHE_SIZE", "10000"))
+
+log = logging.getLogger(__name__)
+
+
+def next_hour(now: float) -> float:
+    return (int(now // 3600) + 1) * 3600
+
+
+# dataset -> fresh_until(now), max age before a stale entry is no longer served
+DATASETS = {
+    "current": {"fresh": lambda now: now + 10 * 60, "max_stale_s": 2 * 3600},
+    "forecast_16d": {"fresh": lambda now: now + 3 * 3600, "max_stale_s": 24 * 3600},
+    "aqi": {"fresh": next_hour, "max_stale_s": 6 * 3600},
+    "experiences": {"fresh": lambda now: now + 30 * 60, "max_stale_s": 6 * 3600},
+    "social": {"fresh": lambda now: now + 20 * 60, "max_stale_s": 3 * 3600},
+}
+
+# Set by the prewarmer: entries that stop being fresh within this many
+# seconds are refreshed now (and awaited) instead of being served.
+refresh_ahead_s = contextvars.ContextVar("refresh_ahead_s", default=0)
+
+# (dataset, cell) -> {"value", "fresh_until", "stale_until"}
+_entries = OrderedDict()
+_refreshing = {}
+
+stats = {
+    "hits": 0, "stale_hits": 0, "misses": 0,
+    "refreshes": 0, "refresh_errors": 0, "prewarmed": 0,
+}
+
+
+def cell_of(lat: float, lon: float) -> str:
+    return geohash(float(lat), float(lon), PRECISION)
+
+
+def _store(key, dataset: str, value):
+    now = time.time()
+    _entries[key] = {
+        "value": value,
+        "fresh_until": DATASETS[dataset]["fresh"](now),
+        "stale_until": now + DATASETS[dataset]["max_stale_s"],
+    }
+    _entries.move_to_end(key)
+    while len(_entries) > MAX_ENTRIES:
+        _entries.popitem(last=False)
+
+
+async def _fetch_and_store(key, dataset: str, fetch, cacheable):
+    # Coalesce concurrent misses / refreshes for the same cell
+    value = await flights.do(f"env:{dataset}", key[1], fetch)
+    if cacheable(value):
+        _store(key, dataset, value)
+    return value
+
+
+async def _refresh(key, dataset: str, fetch, cacheable):
+    # Runs in its own task: background refreshes queue behind live requests
+    rate_limit.priority.set(rate_limit.BACKGROUND)
+    try:
+        stats["refreshes"] += 1
+        await _fetch_and_store(key, dataset, fetch, cacheable)
+    except Exception as e:
+        stats["refresh_errors"] += 1
+        log.warning("background refresh failed: %s", e, extra={"dataset": dataset, "key": key[1]})
+    finally:
+        _refreshing.pop(key, None)
+
+
+async def get(dataset: str, lat: float, lon: float, fetch, cacheable=bool):
+    """
+    Return the cached `dataset` value for the cell around (lat, lon).
+
+    `fetch()` performs the upstream call and should raise on errors;
+    results for which `cacheable(value)` is false are returned but not stored.
+    """
+    return await get_keyed(dataset, cell_of(lat, lon), fetch, cacheable)
+
+
+async def get_keyed(dataset: str, key, fetch, cacheable=bool):
+    """
+    Same as get(), for data keyed by something other than a location cell.
+    `key` must be hashable and already normalized.
+    """
+    key = (dataset, key)
+    entry = _entries.get(key)
+    now = time.time()
+    ahead = refresh_ahead_s.get()
+
+    if entry and ahead and now + ahead >= entry["fresh_until"]:
+        stats["prewarmed"] += 1
+        return await _fetch_and_store(key, dataset, fetch, cacheable)
+
+    if entry and now < entry["stale_until"]:
+        _entries.move_to_end(key)
+        if now < entry["fresh_until"]:
+            stats["hits"] += 1
+        else:
+            stats["stale_hits"] += 1
+            if key not in _refreshing:
+                _refreshing[key] = asyncio.create_task(_refresh(key, dataset, fetch, cacheable))
+        return entry["value"]
+
+    stats["misses"] += 1
+    return await _fetch_and_store(key, dataset, fetch, cacheable)
+
+
+async def _fetch_many_and_store(dataset: str, wanted: dict, fetch_many, cacheable):
+    keys = list(wanted)
+    values = await flights.do(
+        f"env:{dataset}:batch",
+        tuple(key[1] for key in keys),
+        lambda: fetch_many([wanted[key] for key in keys]),
+    )
+    for key, value in zip(keys, values):
+        if cacheable(value):
+            _store(key, dataset, value)
+    return dict(zip(keys, values))
+
+
+async def _refresh_many(dataset: str, wanted: dict, fetch_many, cacheable):
+    rate_limit.priority.set(rate_limit.BACKGROUND)
+    try:
+        stats["refreshes"] += 1
+        await _fetch_many_and_store(dataset, wanted, fetch_many, cacheable)
+    except Exception as e:
+        stats["refresh_errors"] += 1
+        log.warning("background batch refresh failed: %s", e, extra={"dataset": dataset, "cells": len(wanted)})
+    finally:
+        for key in wanted:
+            _refreshing.pop(key, None)
+
+
+async def get_many(dataset: str, coords, fetch_many, cacheable=bool):
+    """
+    get() for several locations at once, in the order of `coords`.
+
+    Cached cells are served as usual; every cold cell is fetched in one
+    `fetch_many([(lat, lon), ...])` call that returns one value per pair,
+    and stale cells are refreshed together in the background. If the batch
+    fetch fails, its cells get the exception instead of a value.
+    """
+    now = time.time()
+    ahead = refresh_ahead_s.get()
+    results = [None] * len(coords)
+
+    positions = {}
+    for i, (lat, lon) in enumerate(coords):
+        positions.setdefault((dataset, cell_of(lat, lon)), []).append(i)
+
+    missing, stale = {}, {}
+    for key, idx in positions.items():
+        entry = _entries.get(key)
+        servable = entry and now < entry["stale_until"]
+        if servable and not (ahead and now + ahead >= entry["fresh_until"]):
+            _entries.move_to_end(key)
+            if now < entry["fresh_until"]:
+                stats["hits"] += 1
+            else:
+                stats["stale_hits"] += 1
+                if key not in _refreshing:
+                    stale[key] = coords[idx[0]]
+            for i in idx:
+                results[i] = entry["value"]
+        else:
+            stats["prewarmed" if servable else "misses"] += 1
+            missing[key] = coords[idx[0]]
+
+    if stale:
+        task = asyncio.create_task(_refresh_many(dataset, stale, fetch_many, cacheable))
+        for key in stale:
+            _refreshing[key] = task
+
+    if missing:
+        try:
+            fetched = await _fetch_many_and_store(dataset, missing, fetch_many, cacheable)
+        except Exception as e:
+            fetched = {key: e for key in missing}
+        for key, value in fetched.items():
+            for i in positions[key]:
+                results[i] = value
+
+    return results
+
+
+def cache_stats():
+    return {**stats, "entries": len(_entries), "refreshing": len(_refreshing)}
@@ -1,20 +1,34 @@
-import aiohttp
 import os
+import asyncio
+import logging
+from http_clients import get_client
+from singleflight import coalesce, normalize_arg
+import env_cache
+import metrics
+import poi_index
 from yelp_backend import search_yelp
+from foursquare_backend import foursquare_search
+from opentripmap import get_mindful_places
+from weather_openmeteo import get_lat_lon_from_city
+from poi_merge import merge_pois
 from weather import get_weather_and_risk as get_weather
 
 GEOAPIFY_API_KEY = os.getenv("GEOAPIFY_API_KEY")
 
+log = logging.getLogger(__name__)
 
+
+@metrics.timed("search_geoapify", fallback=metrics.is_empty)
+@coalesce("geoapify_places")
 async def search_geoapify(location: str, query: str):
     """
     Geoapify fallback search for POIs (FIXED)
     """
     if not GEOAPIFY_API_KEY:
-        print("❌ GEOAPIFY_API_KEY not set")
+        log.warning("GEOAPIFY_API_KEY not set", extra={"provider": "geoapify"})
         return []
 
-    url = "https://api.geoapify.com/v2/places"
+    url = "/v2/places"
 
     # ✅ IMPORTANT: add filter to satisfy Geoapify requirements
     params = {
@@ -25,82 +39,175 @@ async def search_geoapify(location: str, query: str):
     }
 
     try:
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
-            async with session.get(url, params=params) as res:
-                text = await res.text()
-
-                if res.status != 200:
-                    print("❌ Geoapify HTTP error:", res.status)
-                    print("Geoapify response:", text)
-                    return []
-
-                data = await res.json()
-                features = data.get("features", [])
-
-                results = []
-                for f in features:
-                    props = f.get("properties", {})
-                    coords = f.get("geometry", {}).get("coordinates", [None, None])
-
-                    results.append({
-                        "name": props.get("name", "Unknown place"),
-                        "category": props.get("categories", []),
-                        "address": props.get("formatted"),
-                        "lat": coords[1],
-                        "lon": coords[0],
-                        "source": "geoapify"
-                    })
-
-                print(f"✅ Geoapify results: {len(results)}")
-                return results
+        res = await get_client("geoapify").get(url, params=params)
+
+        if res.status_code != 200:
+            log.warning(
+                "geoapify places failed",
+                extra={"provider": "geoapify", "status": res.status_code, "body": res.text[:500]},
+            )
+            return []
+
+        data = res.json()
+        features = data.get("features", [])
+
+        results = []
+        for f in features:
+            props = f.get("properties", {})
+            coords = f.get("geometry", {}).get("coordinates", [None, None])
+
+            results.append({
+                "name": props.get("name", "Unknown place"),
+                "category": props.get("categories", []),
+                "address": props.get("formatted"),
+                "lat": coords[1],
+                "lon": coords[0],
+                "source": "geoapify"
+            })
+
+        log.debug("geoapify results", extra={"provider": "geoapify", "count": len(results)})
+        await poi_index.add(results)
+        return results
 
     except Exception as e:
-        print("❌ Geoapify exception:", str(e))
+        log.warning("geoapify places error: %s", e, extra={"provider": "geoapify"})
         return []
 
-async def get_combined_experiences(location: str, query: str):
-    print(f"🔎 Searching experiences for: {location} | query: {query}")
+# -----------------------------
+# WEATHER-AWARE RANKING
+# -----------------------------
+INDOOR_HINTS = [
+    "museum", "gallery", "mall", "shopping", "spa", "cinema", "theatre",
+    "theater", "aquarium", "restaurant", "cafe", "catering", "library",
+    "indoor", "bowling", "entertainment.culture", "arts",
+]
+OUTDOOR_HINTS = [
+    "park", "beach", "natural", "garden", "hiking", "mountain", "lake",
+    "river", "viewpoint", "zoo", "trail", "outdoor", "camp", "fort",
+]
+
+
+def setting_of(place: dict) -> str:
+    """
+    Guess "indoor" / "outdoor" / "unknown" from a place's categories and name.
+    """
+    categories = place.get("category") or place.get("categories") or []
+    text = " ".join([*categories, place.get("name") or ""]).lower()
+
+    if any(hint in text for hint in INDOOR_HINTS):
+        return "indoor"
+    if any(hint in text for hint in OUTDOOR_HINTS):
+        return "outdoor"
+    return "unknown"
+
+
+def rank_for_weather(results: list, indoor_only: bool) -> list:
+    """
+    Stable re-rank: places matching the weather first, unknowns next,
+    mismatches last. Replaces rewriting the search query with
+    " indoor" / " outdoor", so searches don't have to wait for the weather.
+    """
+    preferred = "indoor" if indoor_only else "outdoor"
+    order = {preferred: 0, "unknown": 1}
+    return sorted(results, key=lambda place: order.get(setting_of(place), 2))
 
-    # 1. Weather
+
+async def fetch_weather(location: str):
     try:
         weather = await get_weather(location)   # 🔑 FIXED NAME
-        print("🌦 Weather:", weather)
+        log.debug("weather", extra={"provider": "weatherapi", "summary": weather.get("summary")})
+        return weather
     except Exception as e:
-        print("❌ Weather error:", e)
-        weather = {
+        log.warning("weather error: %s", e, extra={"provider": "weatherapi"})
+        return {
             "summary": "Unknown",
             "temperature_c": "N/A",
             "indoor_preferred": True
         }
 
-    indoor_only = weather.get("indoor_preferred", True)
 
-    # Modify query based on weather
-    if indoor_only:
-        query = query + " indoor"
-    else:
-        query = query + " outdoor"
-
-    # 2. Yelp
+async def fetch_yelp(location: str, query: str):
     try:
         yelp_results = await search_yelp(location, query)
-        print(f"✅ Yelp results: {len(yelp_results)}")
+        log.debug("yelp results", extra={"provider": "yelp", "count": len(yelp_results)})
+        return yelp_results
     except Exception as e:
-        print("❌ Yelp error:", e)
-        yelp_results = []
+        log.warning("yelp error: %s", e, extra={"provider": "yelp"})
+        return []
 
-    # 3. Geoapify
-    geo_results = await search_geoapify(location, query)
 
-    # 4. Fallback
-    if not yelp_results and not geo_results:
-        print("⚠️ Both empty, trying generic 'tourist attractions'")
-        geo_results = await search_geoapify(location, "tourist attractions")
+@metrics.timed("extra_places", fallback=metrics.is_empty)
+async def fetch_extra_places(location: str, query: str):
+    """
+    Foursquare + OpenTripMap candidates; only used for the merged "places" list.
+    """
+    async def opentripmap_places():
+        lat, lon = await get_lat_lon_from_city(location)
+        if lat is None or lon is None:
+            return []
+        return await get_mindful_places(lat, lon, radius=5000, limit=15)
+
+    results = await asyncio.gather(
+        foursquare_search(location, query, limit=10),
+        opentripmap_places(),
+        return_exceptions=True,
+    )
+    extra = []
+    for r in results:
+        if isinstance(r, Exception):
+            log.warning("extra places error: %s", r)
+        else:
+            extra.extend(r)
+    return extra
+
+
+@metrics.timed("get_combined_experiences", fallback=lambda r: not r["places"])
+async def get_combined_experiences(location: str, query: str):
+    """
+    Cached per (location, query); stale results are served while refreshing.
+    """
+    return await env_cache.get_keyed(
+        "experiences",
+        (normalize_arg(location), normalize_arg(query)),
+        lambda: fetch_combined_experiences(location, query),
+        cacheable=lambda r: bool(r["yelp"] or r["geoapify"] or r["places"]),
+    )
+
+
+async def fetch_combined_experiences(location: str, query: str):
+    log.debug("searching experiences", extra={"location": location, "query": query})
+
+    # 1. Weather runs alongside the searches; it only affects ranking
+    weather_task = asyncio.create_task(fetch_weather(location))
+    extra_task = asyncio.create_task(fetch_extra_places(location, query))
 
+    try:
+        # 2. Yelp + Geoapify in parallel
+        yelp_results, geo_results = await asyncio.gather(
+            fetch_yelp(location, query),
+            search_geoapify(location, query),
+        )
+
+        # 3. Fallback as soon as both are known to be empty
+        if not yelp_results and not geo_results:
+            log.info("yelp and geoapify empty, retrying with tourist attractions", extra={"location": location})
+            geo_results = await search_geoapify(location, "tourist attractions")
+
+        weather, extra_results = await asyncio.gather(weather_task, extra_task)
+    finally:
+        weather_task.cancel()
+        extra_task.cancel()
+
+    indoor_only = weather.get("indoor_preferred", True)
+
+    # 4. One canonical entry per real place across every provider
+    places = merge_pois([*yelp_results, *geo_results, *extra_results])
+
+    # 5. Late re-rank by weather
     return {
         "weather": weather,
         "indoor_only": indoor_only,
-        "yelp": yelp_results,
-        "geoapify": geo_results
+        "yelp": rank_for_weather(yelp_results, indoor_only),
+        "geoapify": rank_for_weather(geo_results, indoor_only),
+        "places": rank_for_weather(places, indoor_only)
     }
-
@@ -1,11 +1,13 @@
 # foursquare_backend.py
 import os
-import httpx
+from http_clients import get_client
+import metrics
 from typing import List, Dict, Any
 
 FOURSQUARE_API_KEY = os.getenv("FOURSQUARE_API_KEY")
-FOURSQUARE_BASE = "https://api.foursquare.com/v3/places/search"
+FOURSQUARE_BASE = "/v3/places/search"
 
+@metrics.timed("foursquare_search", fallback=metrics.is_empty)
 async def foursquare_search(location: str, query: str = "", limit: int = 6) -> List[Dict[str, Any]]:
     """
     Async Foursquare search. Returns normalized dicts.
@@ -21,17 +23,19 @@ async def foursquare_search(location: str, query: str = "", limit: int = 6) -> L
     }
 
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            resp = await client.get(FOURSQUARE_BASE, headers=headers, params=params)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = await get_client("foursquare").get(FOURSQUARE_BASE, headers=headers, params=params)
+        resp.raise_for_status()
+        data = resp.json()
     except Exception:
         return []
 
     out = []
     for item in data.get("results", []):
+        coords = item.get("geocodes", {}).get("main", {})
         out.append({
             "title": item.get("name"),
+            "lat": coords.get("latitude"),
+            "lon": coords.get("longitude"),
             "rating": item.get("rating", None),
             "categories": [c.get("name") for c in item.get("categories", [])],
             "address": ", ".join(item.get("location", {}).get("formatted_address", [])) if item.get("location") else "",
@@ -0,0 +1,70 @@
+# geo.py
+"""
+Small geographic helpers shared by the caches and the POI index.
+"""
+import math
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat: float, lon: float, precision: int = 5) -> str:
+    """
+    Standard geohash. Precision 4 is a ~39 x 20 km cell, 5 is ~4.9 x 4.9 km.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    out = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(out) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            rng[0] = mid
+        else:
+            bits = bits * 2
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            out.append(GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(out)
+
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def grid_cell(lat: float, lon: float, size_deg: float):
+    """
+    Integer (row, col) of the fixed lat/lon grid bucket containing a point.
+    """
+    return math.floor(lat / size_deg), math.floor(lon / size_deg)
+
+
+def grid_cells_around(lat: float, lon: float, radius_m: float, size_deg: float):
+    """
+    Every grid bucket that can contain a point within radius_m of (lat, lon).
+    """
+    dlat = radius_m / 111320.0
+    dlon = radius_m / (111320.0 * max(math.cos(math.radians(lat)), 0.01))
+    row_min, col_min = grid_cell(lat - dlat, lon - dlon, size_deg)
+    row_max, col_max = grid_cell(lat + dlat, lon + dlon, size_deg)
+    return [
+        (row, col)
+        for row in range(row_min, row_max + 1)
+        for col in range(col_min, col_max + 1)
+    ]
@@ -0,0 +1,204 @@
+# geocoding.py
+"""
+Shared geocoding cache used by every place-name -> (lat, lon) lookup.
+
+In-memory LRU in front of a persistent SQLite table, with concurrent lookups
+for the same name collapsed into one upstream call. Found coordinates never
+expire; "not found" answers are kept for GEOCODE_NEGATIVE_TTL_S only.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+
+from db import DB_PATH
+
+LRU_SIZE = int(os.getenv("GEOCODE_LRU_SIZE", "4096"))
+NEGATIVE_TTL_S = float(os.getenv("GEOCODE_NEGATIVE_TTL_S", str(6 * 3600)))
+
+_lru = OrderedDict()
+_inflight = {}
+_db_ready = False
+
+stats = {
+    "lru_hits": 0,
+    "db_hits": 0,
+    "upstream_calls": 0,
+    "coalesced": 0,
+}
+
+
+# -----------------------------
+# NORMALIZATION
+# -----------------------------
+def normalize_place(name: str) -> str:
+    """
+    "  São Paulo ", "sao   paulo" and "SAO PAULO" all map to "sao paulo".
+    """
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"\s+", " ", text.casefold()).strip(" ,.")
+    return text
+
+
+# -----------------------------
+# LRU
+# -----------------------------
+def _lru_get(key):
+    entry = _lru.get(key)
+    if entry is None:
+        return None
+    if entry["expires"] is not None and entry["expires"] < time.time():
+        _lru.pop(key, None)
+        return None
+    _lru.move_to_end(key)
+    return entry
+
+
+def _lru_put(key, entry):
+    _lru[key] = entry
+    _lru.move_to_end(key)
+    while len(_lru) > LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+# -----------------------------
+# SQLITE
+# -----------------------------
+def _init_table(conn):
+    global _db_ready
+    if _db_ready:
+        return
+    conn.execute("""CREATE TABLE IF NOT EXISTS geocode_cache (
+        name_key TEXT,
+        provider TEXT,
+        lat REAL,
+        lon REAL,
+        found INTEGER,
+        updated_at REAL,
+        PRIMARY KEY (name_key, provider))
+    """)
+    _db_ready = True
+
+
+def _db_load(name_key: str, provider: str):
+    with sqlite3.connect(DB_PATH) as conn:
+        _init_table(conn)
+        row = conn.execute(
+            "SELECT lat, lon FROM geocode_cache WHERE name_key = ? AND found = 1 LIMIT 1",
+            (name_key,),
+        ).fetchone()
+        if row:
+            return {"lat": row[0], "lon": row[1], "expires": None}
+
+        row = conn.execute(
+            "SELECT updated_at FROM geocode_cache WHERE name_key = ? AND provider = ? AND found = 0",
+            (name_key, provider),
+        ).fetchone()
+        if row and row[0] + NEGATIVE_TTL_S > time.time():
+            return {"lat": None, "lon": None, "expires": row[0] + NEGATIVE_TTL_S}
+
+    return None
+
+
+def _db_store(name_key: str, provider: str, lat, lon):
+    with sqlite3.connect(DB_PATH) as conn:
+        _init_table(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO geocode_cache (name_key, provider, lat, lon, found, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (name_key, provider, lat, lon, int(lat is not None), time.time()),
+        )
+
+
+# -----------------------------
+# LOOKUP
+# -----------------------------
+def _cached(name_key: str, provider: str):
+    # Found coordinates are shared by every provider; a "not found" only
+    # short-circuits the provider that said so.
+    return _lru_get(("found", name_key)) or _lru_get(("missing", name_key, provider))
+
+
+def _remember(name_key: str, provider: str, entry):
+    if entry["lat"] is not None:
+        _lru_put(("found", name_key), entry)
+    else:
+        _lru_put(("missing", name_key, provider), entry)
+
+
+async def _resolve(name: str, name_key: str, provider: str, fetch):
+    entry = await asyncio.to_thread(_db_load, name_key, provider)
+    if entry:
+        stats["db_hits"] += 1
+        _remember(name_key, provider, entry)
+        return entry
+
+    stats["upstream_calls"] += 1
+    lat, lon = await fetch(name)
+    if lat is None or lon is None:
+        lat, lon = None, None
+
+    entry = {
+        "lat": lat,
+        "lon": lon,
+        "expires": None if lat is not None else time.time() + NEGATIVE_TTL_S,
+    }
+    _remember(name_key, provider, entry)
+    await asyncio.to_thread(_db_store, name_key, provider, lat, lon)
+    return entry
+
+
+async def geocode(name: str, provider: str, fetch):
+    """
+    Return (lat, lon) for a place name, or (None, None) if not found.
+
+    `fetch(name)` is the provider's own upstream lookup; it must return
+    (None, None) for "not found" and raise on errors (errors are not cached).
+    """
+    name_key = normalize_place(name)
+    if not name_key:
+        return None, None
+
+    while True:
+        entry = _cached(name_key, provider)
+        if entry:
+            stats["lru_hits"] += 1
+            return entry["lat"], entry["lon"]
+
+        leader = _inflight.get(name_key)
+        if leader is None:
+            break
+
+        # Someone is already resolving this name: wait for their answer
+        stats["coalesced"] += 1
+        leader_provider, task = leader
+        try:
+            entry = await asyncio.shield(task)
+        except Exception:
+            if leader_provider == provider:
+                raise
+            continue
+
+        if entry["lat"] is not None or leader_provider == provider:
+            return entry["lat"], entry["lon"]
+        # Another provider could not find it; ours might. Try again ourselves.
+        if _inflight.get(name_key) is leader:
+            _inflight.pop(name_key, None)
+
+    task = asyncio.ensure_future(_resolve(name, name_key, provider, fetch))
+    _inflight[name_key] = (provider, task)
+    try:
+        entry = await asyncio.shield(task)
+    finally:
+        if _inflight.get(name_key, (None, None))[1] is task:
+            _inflight.pop(name_key, None)
+
+    return entry["lat"], entry["lon"]
+
+
+def cache_stats():
+    return {**stats, "lru_entries": len(_lru), "inflight": len(_inflight)}
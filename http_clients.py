@@ -0,0 +1,391 @@
+# http_clients.py
+"""
+Shared, pooled HTTP clients for every upstream provider.
+
+One httpx.AsyncClient per upstream host, opened in the FastAPI lifespan and
+reused for every request, so we stop paying a TCP + TLS handshake per call.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+
+import httpcore
+import httpx
+
+import metrics
+import rate_limit
+from circuit_breaker import SLOW_CALL_S, CircuitBreaker, CircuitOpen, is_failure
+
+log = logging.getLogger(__name__)
+
+# -----------------------------
+# POOL DEFAULTS (env overridable)
+# -----------------------------
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_MAX_KEEPALIVE_PER_HOST", "10"))
+KEEPALIVE_EXPIRY_S = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "30"))
+DNS_CACHE_TTL_S = float(os.getenv("HTTP_DNS_CACHE_TTL_S", "300"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "0") == "1"
+
+try:
+    import h2  # noqa: F401  (httpx only speaks HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# -----------------------------
+# PROVIDERS
+# -----------------------------
+# One entry per upstream host. "timeout" is the per-provider default,
+# "max_connections" overrides the per-host limit, "http2" opts the host in
+# to HTTP/2 when HTTP2_ENABLED is set and h2 is installed. "hedge" allows a
+# second attempt for slow GETs (idempotent endpoints only), "slow_s" is the
+# latency the circuit breaker counts as a failure, "breaker": False skips it.
+PROVIDERS = {
+    "travelpayouts": {"base_url": "https://engine.hotellook.com", "timeout": 10},
+    "weatherapi": {"base_url": "https://api.weatherapi.com", "timeout": 10, "http2": True, "hedge": True},
+    "youtube": {"base_url": "https://www.googleapis.com", "timeout": 15, "http2": True},
+    "opentripmap": {"base_url": "https://api.opentripmap.com", "timeout": 12},
+    "foursquare": {"base_url": "https://api.foursquare.com", "timeout": 10, "http2": True},
+    "gnews": {"base_url": "https://gnews.io", "timeout": 10},
+    "klimapi": {"base_url": "https://api.klimapi.com", "timeout": 10},
+    "yelp": {"base_url": "https://api.yelp.com", "timeout": 10, "http2": True},
+    "geoapify": {"base_url": "https://api.geoapify.com", "timeout": 15, "max_connections": 30, "hedge": True},
+    "openmeteo_geocoding": {"base_url": "https://geocoding-api.open-meteo.com", "timeout": 10, "hedge": True},
+    "openmeteo": {"base_url": "https://api.open-meteo.com", "timeout": 10, "hedge": True},
+    "openweather": {"base_url": "https://api.openweathermap.org", "timeout": 10, "hedge": True},
+    "tomtom": {"base_url": "https://api.tomtom.com", "timeout": 10, "http2": True},
+    "groq": {"base_url": "https://api.groq.com", "timeout": 30, "http2": True, "slow_s": 10},
+    # Arbitrary image hosts behind /img (Reddit, YouTube thumbnails, ...)
+    "images": {"base_url": None, "timeout": 15, "follow_redirects": True, "max_connections": 50, "breaker": False},
+}
+
+
+# -----------------------------
+# DNS CACHE
+# -----------------------------
+class CachingDNSBackend(httpcore.AsyncNetworkBackend):
+    """
+    Network backend that caches getaddrinfo() results for DNS_CACHE_TTL_S.
+    TLS still uses the original hostname for SNI / certificate checks.
+    """
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL_S):
+        self._backend = httpcore.AnyIOBackend()
+        self._ttl = ttl
+        self._cache = {}
+
+    async def _resolve(self, host: str, port: int):
+        key = (host, port)
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        self._cache[key] = (time.monotonic() + self._ttl, addrs)
+        return addrs
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addrs = await self._resolve(host, port)
+        except OSError as e:
+            raise httpcore.ConnectError(str(e)) from e
+
+        last_error = None
+        for addr in addrs:
+            try:
+                return await self._backend.connect_tcp(
+                    addr,
+                    port,
+                    timeout=timeout,
+                    local_address=local_address,
+                    socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+
+        # Every cached address failed: forget them so the next call re-resolves
+        self._cache.pop((host, port), None)
+        raise last_error or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+class CountingStream(httpx.AsyncByteStream):
+    """
+    Response body wrapper that records the upstream payload size once read.
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, provider: str):
+        self._stream = stream
+        self._provider = provider
+        self._bytes = 0
+        self._recorded = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._bytes += len(chunk)
+            yield chunk
+
+    async def aclose(self):
+        if not self._recorded:
+            self._recorded = True
+            metrics.upstream_bytes.observe(self._bytes, self._provider)
+        await self._stream.aclose()
+
+
+_ssl_context = None
+
+
+def shared_ssl_context():
+    """
+    One SSL context for every pool: building one (loading the CA bundle)
+    takes tens of ms, and each transport used to build two.
+    """
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
+
+
+class PooledTransport(httpx.AsyncHTTPTransport):
+    """
+    httpx transport whose connection pool resolves through CachingDNSBackend.
+    Every request passes the provider's circuit breaker and takes a token
+    from its rate limiter; slow idempotent GETs may be hedged.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limits: httpx.Limits,
+        http2: bool,
+        dns_backend: CachingDNSBackend,
+        breaker: CircuitBreaker = None,
+        hedge: bool = False,
+    ):
+        ssl_context = shared_ssl_context()
+        super().__init__(verify=ssl_context, limits=limits, http2=http2)
+        self.name = name
+        self.breaker = breaker
+        self.hedge = hedge
+        self.http2 = http2
+        self.max_connections = limits.max_connections
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=ssl_context,
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=dns_backend,
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            if self.breaker is not None:
+                self.breaker.allow()
+            try:
+                await rate_limit.acquire(self.name)
+            except BaseException:
+                # Rate limited or cancelled before _send: free the probe slot
+                if self.breaker is not None:
+                    self.breaker.abandon()
+                raise
+
+            if self.hedge and self.breaker is not None and request.method == "GET":
+                response = await self._hedged(request)
+            else:
+                response = await self._send(request)
+
+            status = str(response.status_code)
+            rate_limit.observe(self.name, response)
+            response.stream = CountingStream(response.stream, self.name)
+            return response
+        except CircuitOpen:
+            status = "circuit_open"
+            raise
+        except rate_limit.RateLimited:
+            status = "rate_limited"
+            raise
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.upstream_duration.observe(elapsed, self.name, status)
+            metrics.add_span(self.name, started, elapsed, status)
+            log.debug(
+                "upstream request",
+                extra={"provider": self.name, "status": status, "duration_ms": round(elapsed * 1000, 1)},
+            )
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        try:
+            response = await super().handle_async_request(request)
+        except asyncio.CancelledError:
+            if self.breaker is not None:
+                self.breaker.abandon()
+            raise
+        except Exception:
+            if self.breaker is not None:
+                self.breaker.record(failed=True)
+            raise
+        if self.breaker is not None:
+            self.breaker.record(is_failure(response), time.monotonic() - started)
+        return response
+
+    async def _hedged(self, request: httpx.Request) -> httpx.Response:
+        """
+        Send `request`; if it is still pending after the provider's p95
+        latency, send a second copy and return whichever answers first.
+        """
+        delay = self.breaker.hedge_delay()
+        first = asyncio.ensure_future(self._send(request))
+        if delay is None:
+            return await first
+
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done:
+                return first.result()
+
+            # The hedge never queues for rate-limit budget
+            try:
+                with rate_limit.policy(wait_s=0):
+                    await rate_limit.acquire(self.name)
+            except rate_limit.RateLimited:
+                return await first
+
+            self.breaker.stats["hedges"] += 1
+            second = asyncio.ensure_future(self._send(request))
+            pending = {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [t for t in done if t.exception() is None]
+                if winners:
+                    if winners[0] is second:
+                        self.breaker.stats["hedge_wins"] += 1
+                    for task in pending:
+                        task.cancel()
+                    for loser in winners[1:]:
+                        await loser.result().aclose()
+                    return winners[0].result()
+            # Both attempts failed
+            raise first.exception()
+        finally:
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self):
+        connections = self._pool.connections
+        idle = sum(1 for c in connections if c.is_idle())
+        waiting = sum(1 for r in getattr(self._pool, "_requests", []) if r.connection is None)
+        return {
+            "open": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+            "waiting": waiting,
+            "max_connections": self.max_connections,
+            "http2": self.http2,
+        }
+
+
+# -----------------------------
+# CLIENT REGISTRY
+# -----------------------------
+_dns_backend = CachingDNSBackend()
+_clients = {}
+_transports = {}
+# Breakers outlive client rebuilds so an open circuit stays open
+_breakers = {}
+
+
+def base_url(name: str) -> str:
+    """
+    Provider base URL; <PROVIDER>_BASE_URL overrides it (local stand-ins,
+    staging proxies, benchmarks).
+    """
+    return os.getenv(f"{name.upper()}_BASE_URL") or PROVIDERS[name].get("base_url") or ""
+
+
+def _build_client(name: str) -> httpx.AsyncClient:
+    config = PROVIDERS[name]
+    limits = httpx.Limits(
+        max_connections=config.get("max_connections", MAX_CONNECTIONS_PER_HOST),
+        max_keepalive_connections=MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry=KEEPALIVE_EXPIRY_S,
+    )
+    http2 = HTTP2_ENABLED and HTTP2_AVAILABLE and config.get("http2", False)
+    breaker = None
+    if config.get("breaker", True):
+        breaker = _breakers.setdefault(
+            name, CircuitBreaker(name, slow_call_s=config.get("slow_s", SLOW_CALL_S))
+        )
+    transport = PooledTransport(
+        name,
+        limits=limits,
+        http2=http2,
+        dns_backend=_dns_backend,
+        breaker=breaker,
+        hedge=config.get("hedge", False),
+    )
+    _transports[name] = transport
+
+    return httpx.AsyncClient(
+        base_url=base_url(name),
+        timeout=config.get("timeout", 10),
+        follow_redirects=config.get("follow_redirects", False),
+        transport=transport,
+    )
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """
+    Return the shared client for a provider.
+    Created lazily so scripts that never run the app lifespan still work.
+    """
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        client = _build_client(name)
+        _clients[name] = client
+    return client
+
+
+async def startup():
+    for name in PROVIDERS:
+        get_client(name)
+
+
+async def shutdown():
+    clients = list(_clients.values())
+    _clients.clear()
+    _transports.clear()
+    await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+
+
+def pool_stats():
+    """
+    Per-provider pool stats: open, idle, active and waiting connections.
+    """
+    return {name: transport.stats() for name, transport in _transports.items()}
+
+
+def breaker_stats():
+    """
+    Per-provider circuit state, failure rate, latency and hedging counters.
+    """
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
@@ -0,0 +1,487 @@
+# image_proxy.py
+"""
+Streaming, disk-cached image proxy behind /img.
+
+Upstream bytes are streamed straight to the client while being written to a
+content-addressed on-disk cache (size-bounded, LRU). Cached objects are served
+with FileResponse (sendfile where the server supports it) and revalidated with
+the upstream ETag / Last-Modified once they go stale. Concurrent requests for
+the same URL share one upstream fetch.
+
+Resized / re-encoded variants (?w=&q=&fmt=) are produced in a bounded process
+pool and cached as their own entries next to the original.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import multiprocessing
+import json
+import logging
+import os
+import pathlib
+import tempfile
+import time
+
+from fastapi import HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
+
+from http_clients import get_client
+from image_resize import FORMATS, PIL_AVAILABLE, UndecodableImage, resize_image
+
+CACHE_DIR = pathlib.Path(os.getenv("IMG_CACHE_DIR", "img_cache"))
+CACHE_MAX_BYTES = int(os.getenv("IMG_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MAX_OBJECT_BYTES = int(os.getenv("IMG_MAX_OBJECT_BYTES", str(10 * 1024 * 1024)))
+FRESH_S = int(os.getenv("IMG_FRESH_S", "86400"))
+FOLLOWER_WAIT_S = 30
+# A leader response whose body has not started streaming by then (the client
+# went away before it was sent) gives up the upstream fetch
+STREAM_START_S = float(os.getenv("IMG_STREAM_START_S", "10"))
+RESIZE_WORKERS = int(os.getenv("IMG_RESIZE_WORKERS", "2"))
+# Unreferenced objects and .part files older than this are swept at startup;
+# younger ones may still be being written by another worker
+SWEEP_AGE_S = 3600
+MAX_WIDTH = 2048
+
+CACHE_CONTROL = f"public, max-age={FRESH_S}"
+
+OBJECTS_DIR = CACHE_DIR / "objects"
+META_DIR = CACHE_DIR / "meta"
+
+# url key -> meta dict (url, object, content_type, etag, last_modified, size,
+# fetched_at, last_access)
+_index = {}
+_inflight = {}
+_watchdogs = set()
+
+log = logging.getLogger(__name__)
+
+_resize_pool = None
+_resize_slots = asyncio.Semaphore(RESIZE_WORKERS * 4)
+
+
+# -----------------------------
+# INDEX / EVICTION
+# -----------------------------
+def url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def load_index():
+    """
+    Rebuild the in-memory index from meta files (called once at startup).
+    """
+    OBJECTS_DIR.mkdir(parents=True, exist_ok=True)
+    META_DIR.mkdir(parents=True, exist_ok=True)
+
+    _index.clear()
+    for path in META_DIR.glob("*.json"):
+        try:
+            meta = json.loads(path.read_text())
+        except (OSError, ValueError):
+            path.unlink(missing_ok=True)
+            continue
+        if not (OBJECTS_DIR / meta["object"]).exists():
+            path.unlink(missing_ok=True)
+            continue
+        meta["last_access"] = path.stat().st_mtime
+        _index[path.stem] = meta
+
+    sweep()
+    evict()
+
+
+def sweep():
+    """
+    Delete object files no entry references (left behind by a crash or an
+    older version) and abandoned .part / .tmp files.
+    """
+    referenced = {m["object"] for m in _index.values()}
+    cutoff = time.time() - SWEEP_AGE_S
+    removed = 0
+    for path in [*OBJECTS_DIR.iterdir(), *META_DIR.glob("*.tmp")]:
+        try:
+            if path.name in referenced or path.stat().st_mtime > cutoff:
+                continue
+            path.unlink()
+            removed += 1
+        except OSError:
+            continue
+    if removed:
+        log.info("image cache swept", extra={"removed": removed})
+
+
+def cache_size() -> int:
+    # Objects are content-addressed, so several URLs may share one file
+    return sum({m["object"]: m["size"] for m in _index.values()}.values())
+
+
+def evict():
+    total = cache_size()
+    if total <= CACHE_MAX_BYTES:
+        return
+
+    for key, meta in sorted(_index.items(), key=lambda kv: kv[1]["last_access"]):
+        if total <= CACHE_MAX_BYTES:
+            break
+        _index.pop(key, None)
+        (META_DIR / f"{key}.json").unlink(missing_ok=True)
+
+        if release(meta):
+            total -= meta["size"]
+
+
+def release(meta: dict) -> bool:
+    """
+    Delete the object of an entry that was dropped or replaced, unless
+    another entry still uses it. True when the file was deleted.
+    """
+    if any(m["object"] == meta["object"] for m in _index.values()):
+        return False
+    (OBJECTS_DIR / meta["object"]).unlink(missing_ok=True)
+    return True
+
+
+def write_meta(key: str, meta: dict):
+    previous = _index.get(key)
+    _index[key] = meta
+    if previous is not None and previous["object"] != meta["object"]:
+        # Revalidation brought new content: the old object is garbage now
+        release(previous)
+    path = META_DIR / f"{key}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, path)
+
+
+def touch(key: str, meta: dict):
+    meta["last_access"] = time.time()
+    try:
+        os.utime(META_DIR / f"{key}.json")
+    except OSError:
+        pass
+
+
+def stats():
+    return {
+        "entries": len(_index),
+        "bytes": cache_size(),
+        "max_bytes": CACHE_MAX_BYTES,
+        "inflight": len(_inflight),
+    }
+
+
+# -----------------------------
+# RESPONSES
+# -----------------------------
+def file_response(meta: dict):
+    return FileResponse(
+        OBJECTS_DIR / meta["object"],
+        media_type=meta["content_type"],
+        headers={"Cache-Control": CACHE_CONTROL},
+    )
+
+
+def upstream_headers(meta):
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    return headers
+
+
+# -----------------------------
+# FETCH (leader side)
+# -----------------------------
+async def open_upstream(url: str, meta):
+    client = get_client("images")
+    request = client.build_request("GET", url, headers=upstream_headers(meta))
+    try:
+        r = await client.send(request, stream=True)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Image fetch failed: {e}")
+
+    if r.status_code == 304 or r.status_code < 400:
+        length = r.headers.get("content-length")
+        if r.status_code != 304 and length and int(length) > MAX_OBJECT_BYTES:
+            await r.aclose()
+            raise HTTPException(status_code=413, detail="Image too large")
+        return r
+
+    await r.aclose()
+    raise HTTPException(status_code=502, detail=f"Upstream returned {r.status_code}")
+
+
+def store_and_stream(key: str, url: str, r, fut: asyncio.Future):
+    """
+    Stream upstream bytes to the client and into the cache at the same time.
+    Resolves `fut` once the object is on disk, or fails it (and closes `r`)
+    when the body is never consumed within STREAM_START_S.
+    """
+    content_type = r.headers.get("content-type", "image/jpeg")
+
+    async def abandon_unread():
+        await asyncio.sleep(STREAM_START_S)
+        await r.aclose()
+        if not fut.done():
+            fut.set_exception(HTTPException(status_code=502, detail="Image fetch aborted"))
+
+    watchdog = asyncio.create_task(abandon_unread())
+    _watchdogs.add(watchdog)
+    watchdog.add_done_callback(_watchdogs.discard)
+
+    async def body():
+        if watchdog.done():
+            # Too late: the upstream response is already closed
+            raise HTTPException(status_code=502, detail="Image fetch aborted")
+        watchdog.cancel()
+
+        fd, tmp_name = tempfile.mkstemp(dir=OBJECTS_DIR, suffix=".part")
+        digest = hashlib.sha256()
+        size = 0
+        complete = False
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in r.aiter_bytes():
+                    size += len(chunk)
+                    if size > MAX_OBJECT_BYTES:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    yield chunk
+
+            if size > MAX_OBJECT_BYTES:
+                # No Content-Length up front: cut the stream and keep it out of the cache
+                fut.set_exception(HTTPException(status_code=413, detail="Image too large"))
+                return
+
+            object_name = digest.hexdigest()
+            os.replace(tmp_name, OBJECTS_DIR / object_name)
+            now = time.time()
+            meta = {
+                "url": url,
+                "object": object_name,
+                "content_type": content_type,
+                "etag": r.headers.get("etag"),
+                "last_modified": r.headers.get("last-modified"),
+                "size": size,
+                "fetched_at": now,
+                "last_access": now,
+            }
+            write_meta(key, meta)
+            evict()
+            complete = True
+            if not fut.done():
+                fut.set_result(meta)
+
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            raise
+
+        finally:
+            await r.aclose()
+            if not complete:
+                pathlib.Path(tmp_name).unlink(missing_ok=True)
+                if not fut.done():
+                    # Client went away mid-stream; let followers refetch
+                    fut.set_exception(HTTPException(status_code=502, detail="Image fetch aborted"))
+
+    return StreamingResponse(
+        body(),
+        media_type=content_type,
+        headers={"Cache-Control": CACHE_CONTROL},
+    )
+
+
+async def lead_fetch(key: str, url: str, meta, fut: asyncio.Future):
+    try:
+        r = await open_upstream(url, meta)
+    except Exception as e:
+        fut.set_exception(e)
+        raise
+    except BaseException:
+        # Cancelled: an unresolved future would block this URL for good
+        fut.set_exception(HTTPException(status_code=502, detail="Image fetch aborted"))
+        raise
+
+    if r.status_code == 304:
+        await r.aclose()
+        meta["fetched_at"] = time.time()
+        touch(key, meta)
+        write_meta(key, meta)
+        fut.set_result(meta)
+        return file_response(meta)
+
+    return store_and_stream(key, url, r, fut)
+
+
+# -----------------------------
+# PUBLIC ENTRY POINT
+# -----------------------------
+async def proxy(url: str):
+    if not url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=400, detail="Only http(s) image URLs are supported")
+
+    key = url_key(url)
+    meta = _index.get(key)
+
+    if meta and time.time() - meta["fetched_at"] < FRESH_S:
+        touch(key, meta)
+        return file_response(meta)
+
+    fut = _inflight.get(key)
+    if fut is not None:
+        # Another request is already fetching / revalidating this URL
+        try:
+            meta = await asyncio.wait_for(asyncio.shield(fut), FOLLOWER_WAIT_S)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Image fetch timed out")
+        touch(key, meta)
+        return file_response(meta)
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[key] = fut
+    fut.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Followers may never await a failed future; don't warn about it
+    fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    return await lead_fetch(key, url, meta, fut)
+
+
+# -----------------------------
+# VARIANTS (resize / re-encode)
+# -----------------------------
+def get_resize_pool():
+    global _resize_pool
+    if _resize_pool is None:
+        _resize_pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=RESIZE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _resize_pool
+
+
+def shutdown_resize_pool():
+    global _resize_pool
+    if _resize_pool is not None:
+        _resize_pool.shutdown(wait=False, cancel_futures=True)
+        _resize_pool = None
+
+
+async def original_meta(url: str):
+    """
+    Make sure the original is cached and fresh on disk and return its meta.
+    """
+    response = await proxy(url)
+    if isinstance(response, StreamingResponse):
+        # We led the fetch: drain the tee so the object lands on disk
+        async for _ in response.body_iterator:
+            pass
+
+    meta = _index.get(url_key(url))
+    if meta is None:
+        raise HTTPException(status_code=502, detail="Image could not be cached")
+    return meta
+
+
+async def build_variant(key: str, url: str, width, quality, fmt, fut: asyncio.Future):
+    """
+    Resize into a new cache entry. A source Pillow cannot decode gets an
+    entry pointing at the original object, so it is served unchanged.
+    """
+    try:
+        source = await original_meta(url)
+        variant = {"w": width, "q": quality, "fmt": fmt}
+
+        fd, tmp_name = tempfile.mkstemp(dir=OBJECTS_DIR, suffix=".part")
+        os.close(fd)
+        try:
+            async with _resize_slots:
+                content_type = await asyncio.get_running_loop().run_in_executor(
+                    get_resize_pool(),
+                    resize_image,
+                    str(OBJECTS_DIR / source["object"]),
+                    tmp_name,
+                    width,
+                    quality,
+                    fmt,
+                )
+
+            digest = hashlib.sha256()
+            with open(tmp_name, "rb") as f:
+                for block in iter(lambda: f.read(1 << 16), b""):
+                    digest.update(block)
+            object_name = digest.hexdigest()
+            size = os.path.getsize(tmp_name)
+            os.replace(tmp_name, OBJECTS_DIR / object_name)
+        except UndecodableImage as e:
+            log.info("image not resizable, serving the original: %s", e, extra={"url": url})
+            object_name, content_type, size = source["object"], source["content_type"], source["size"]
+        finally:
+            pathlib.Path(tmp_name).unlink(missing_ok=True)
+
+        now = time.time()
+        meta = {
+            "url": url,
+            "variant": variant,
+            "object": object_name,
+            "content_type": content_type,
+            "etag": None,
+            "last_modified": None,
+            "size": size,
+            "fetched_at": now,
+            "last_access": now,
+        }
+        write_meta(key, meta)
+        evict()
+        fut.set_result(meta)
+        return meta
+
+    except Exception as e:
+        fut.set_exception(e)
+        raise
+
+    finally:
+        if not fut.done():
+            # Cancelled (client went away): let the next request retry
+            fut.set_exception(HTTPException(status_code=502, detail="Image resize aborted"))
+
+
+async def proxy_variant(url: str, width: int = None, quality: int = None, fmt: str = None):
+    """
+    Serve a resized / re-encoded variant of `url`. Falls back to the original
+    when no transform is requested or Pillow is not installed.
+    """
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    if width is not None:
+        width = max(16, min(int(width), MAX_WIDTH))
+    quality = max(1, min(int(quality or 80), 95))
+
+    if not PIL_AVAILABLE or not (width or fmt):
+        return await proxy(url)
+
+    key = url_key(f"{url}|w={width}|q={quality}|fmt={fmt}")
+    meta = _index.get(key)
+    if meta and time.time() - meta["fetched_at"] < FRESH_S:
+        touch(key, meta)
+        return file_response(meta)
+
+    fut = _inflight.get(key)
+    if fut is None:
+        fut = asyncio.get_running_loop().create_future()
+        _inflight[key] = fut
+        fut.add_done_callback(lambda _: _inflight.pop(key, None))
+        fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+        meta = await build_variant(key, url, width, quality, fmt, fut)
+    else:
+        try:
+            meta = await asyncio.wait_for(asyncio.shield(fut), FOLLOWER_WAIT_S)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Image resize timed out")
+
+    touch(key, meta)
+    return file_response(meta)
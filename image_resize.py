@@ -0,0 +1,64 @@
+# image_resize.py
+"""
+CPU-bound image resizing for the /img proxy.
+
+Kept free of app imports so process-pool workers start quickly.
+"""
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "jpg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+
+
+class UndecodableImage(Exception):
+    """
+    The source is not an image Pillow can read (SVG, an HTML error page,
+    a truncated file...).
+    """
+
+
+def resize_image(src_path: str, dst_path: str, width: int = None, quality: int = 80, fmt: str = None):
+    """
+    Resize `src_path` to at most `width` px wide (never upscales), re-encode
+    as `fmt` and write it to `dst_path`. Returns the output content type.
+    Raises UndecodableImage when the source cannot be decoded.
+    """
+    try:
+        img = Image.open(src_path)
+        img.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise UndecodableImage(str(e)) from None
+
+    with img:
+        pil_format = img.format or "JPEG"
+        content_type = Image.MIME.get(pil_format, "image/jpeg")
+        if fmt:
+            pil_format, content_type = FORMATS[fmt]
+
+        if width and img.width > width:
+            height = max(1, round(img.height * width / img.width))
+            img = img.resize((width, height), Image.LANCZOS)
+
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        elif img.mode == "P":
+            img = img.convert("RGBA")
+
+        options = {}
+        if pil_format in ("JPEG", "WEBP"):
+            options["quality"] = quality
+        if pil_format in ("JPEG", "PNG"):
+            options["optimize"] = True
+
+        img.save(dst_path, format=pil_format, **options)
+
+    return content_type
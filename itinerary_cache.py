@@ -0,0 +1,73 @@
+# itinerary_cache.py
+"""
+Exact-match cache for /chat/experiences itineraries.
+
+Keyed on the normalized ExperienceRequest plus the prompt template version,
+with a TTL and LRU eviction. Only complete itineraries (LLM or composed
+from POIs) are stored, never canned fallbacks.
+"""
+import copy
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+
+from geocoding import normalize_place
+
+TTL_S = float(os.getenv("ITINERARY_CACHE_TTL_S", str(6 * 3600)))
+MAX_ENTRIES = int(os.getenv("ITINERARY_CACHE_SIZE", "1000"))
+
+# key -> {"location": normalized location, "expires": ts, "stops": [...]}
+_entries = OrderedDict()
+
+
+def _norm(text) -> str:
+    return re.sub(r"\s+", " ", str(text or "").casefold()).strip()
+
+
+def make_key(location, budget, activity, motivation, duration, days, prompt_version) -> str:
+    payload = json.dumps([
+        prompt_version,
+        normalize_place(location),
+        _norm(budget),
+        _norm(activity),
+        _norm(motivation),
+        _norm(duration),
+        days,
+    ])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get(key: str):
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+    if entry["expires"] < time.time():
+        _entries.pop(key, None)
+        return None
+    _entries.move_to_end(key)
+    return copy.deepcopy(entry["stops"])
+
+
+def put(key: str, location: str, stops):
+    _entries[key] = {
+        "location": normalize_place(location),
+        "expires": time.time() + TTL_S,
+        "stops": copy.deepcopy(stops),
+    }
+    _entries.move_to_end(key)
+    while len(_entries) > MAX_ENTRIES:
+        _entries.popitem(last=False)
+
+
+def purge_location(location: str) -> int:
+    """
+    Drop every cached itinerary for a location. Returns how many were removed.
+    """
+    target = normalize_place(location)
+    keys = [k for k, e in _entries.items() if e["location"] == target]
+    for k in keys:
+        _entries.pop(k, None)
+    return len(keys)
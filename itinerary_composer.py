@@ -0,0 +1,306 @@
+# itinerary_composer.py
+"""
+Deterministic itinerary composer: /chat/experiences without the LLM.
+
+Builds the same stops schema (day, title, intro, top_places) from real POIs
+we already know about: the local POI index around the city (filled by
+earlier village / Geoapify searches), topped up by those searches when the
+index is thin. Only sights, food and leisure places count (never hotels,
+clinics or car parks). They are themed from their categories, picked
+with the user's activity / motivation themes first (mixed with the rest
+for variety), split into days by direction from the centre so each day
+stays in one part of town, and grouped by theme into items.
+
+compose() returns None when there are not enough distinct named places;
+the caller then asks the LLM instead.
+
+    ITINERARY_COMPOSER=0          always use the LLM
+    ITINERARY_COMPOSER_ENRICH=1   let the LLM rewrite titles / intros / tips
+                                  of a composed itinerary (places are kept)
+    ITINERARY_COMPOSER_RADIUS_M   how far from the centre places may be (30 km)
+    ITINERARY_COMPOSER_TOPUP_S    how long compose() waits for the top-up
+                                  searches (1.5 s); slower ones finish in
+                                  the background and only warm the index
+"""
+import asyncio
+import logging
+import math
+import os
+import re
+
+import metrics
+import poi_index
+import providers
+from itinerary_parser import PLACES_PER_ITEM, validate_item
+
+ENABLED = os.getenv("ITINERARY_COMPOSER", "1") == "1"
+ENRICH = os.getenv("ITINERARY_COMPOSER_ENRICH", "0") == "1"
+RADIUS_M = float(os.getenv("ITINERARY_COMPOSER_RADIUS_M", "30000"))
+TOPUP_S = float(os.getenv("ITINERARY_COMPOSER_TOPUP_S", "1.5"))
+
+village_sources = providers.lazy("village")
+experience_sources = providers.lazy("experiences")
+
+log = logging.getLogger(__name__)
+
+# Top-up searches still running after TOPUP_S
+_background = set()
+
+# A POI belongs to the first theme one of its categories falls under:
+# Geoapify categories are matched by prefix ("religion" matches
+# "religion.place_of_worship"), Yelp aliases ("indpak") exactly. Places in
+# none of them (hotels, clinics, parking, offices) are never stops. Whole
+# words of the name only refine the catch-all "sights".
+THEMES = {
+    "spiritual": {
+        "categories": [
+            "religion", "tourism.sights.place_of_worship", "tourism.sights.monastery",
+            "hindu_temples", "buddhist_temples", "sikh_temples", "churches", "mosques",
+        ],
+        "names": ["temple", "church", "mosque", "gurudwara", "monastery", "shrine", "ashram", "mandir", "masjid"],
+        "title": "Temples & Quiet Corners",
+        "intro": "Peaceful places of worship and reflection loved by locals and visitors in {location}.",
+        "tip": "Dress modestly and visit early for a calm experience.",
+    },
+    "food": {
+        "categories": ["catering", "restaurants", "food", "cafes", "coffee", "bakeries", "indpak", "streetvendors"],
+        "names": ["restaurant", "cafe", "bakery", "dhaba"],
+        "title": "Food & Local Flavours",
+        "intro": "Where people in {location} go for local dishes, snacks and a good cup of something.",
+        "tip": "Ask for the house speciality.",
+    },
+    "culture": {
+        "categories": [
+            "heritage", "building.historic", "entertainment.museum", "entertainment.culture",
+            "tourism.sights.castle", "tourism.sights.fort", "tourism.sights.memorial",
+            "tourism.sights.archaeological_site", "tourism.sights.city_gate", "tourism.sights.ruines",
+            "museums", "galleries", "landmarks",
+        ],
+        "names": ["museum", "gallery", "fort", "palace", "castle", "monument", "memorial", "heritage", "tomb"],
+        "title": "Heritage & Culture",
+        "intro": "History, architecture and museums that tell the story of {location}.",
+        "tip": "Check opening hours and go before the afternoon rush.",
+    },
+    "nature": {
+        "categories": [
+            "natural", "national_park", "beach", "leisure.park", "entertainment.zoo",
+            "tourism.attraction.viewpoint", "parks", "gardens", "beaches", "hiking", "lakes", "zoos",
+        ],
+        "names": ["park", "garden", "gardens", "beach", "lake", "river", "falls", "hill", "forest", "zoo"],
+        "title": "Parks & Open Air",
+        "intro": "Green spaces, water and views around {location} for a slower pace.",
+        "tip": "Best in the morning or around sunset.",
+    },
+    "shopping": {
+        "categories": [
+            "commercial.marketplace", "commercial.shopping_mall",
+            "publicmarkets", "fleamarkets", "shoppingcenters",
+        ],
+        "names": ["market", "bazaar", "mall"],
+        "title": "Markets & Shopping",
+        "intro": "Bazaars and shops in {location} for crafts, souvenirs and people watching.",
+        "tip": "Compare a few stalls before you buy.",
+    },
+    "leisure": {
+        "categories": ["entertainment", "leisure", "amusementparks", "movietheaters"],
+        "names": [],
+        "title": "Fun & Leisure",
+        "intro": "Easygoing entertainment spots popular in {location}.",
+        "tip": "Weekends get busy; weekdays are quieter.",
+    },
+    "sights": {
+        "categories": ["tourism.sights", "tourism.attraction"],
+        "names": [],
+        "title": "Local Sights",
+        "intro": "Well-known spots worth a stop while you are in {location}.",
+        "tip": "Combine with nearby places to save travel time.",
+    },
+}
+
+# What poi_index.radius() is asked for
+CATEGORIES = sorted({c for spec in THEMES.values() for c in spec["categories"]})
+
+# Words in the activity / motivation that pull a theme forward
+KEYWORDS = {
+    "spiritual": ["spiritual", "temple", "peace", "mindful", "religio", "meditat", "pilgrim", "calm"],
+    "food": ["food", "eating", "cuisine", "culinary", "restaurant", "cafe", "dining", "taste"],
+    "culture": ["culture", "history", "heritage", "museum", "architecture", "sightseeing", "learn"],
+    "nature": ["nature", "outdoor", "park", "hike", "trek", "adventure", "beach", "relax", "wildlife", "scenic"],
+    "shopping": ["shop", "market", "bazaar", "souvenir"],
+    "leisure": ["fun", "nightlife", "family", "kids", "entertainment", "party"],
+}
+
+GENERIC_NAMES = {"", "local attraction", "unknown place"}
+
+
+def normalize(name: str) -> str:
+    return " ".join(re.sub(r"[^\w]+", " ", (name or "").casefold()).split())
+
+
+def theme_of(poi: dict):
+    """
+    The POI's theme, or None when it is not a place to visit.
+    """
+    theme = next((t for t, spec in THEMES.items() if poi_index.matches(poi, spec["categories"])), None)
+    if theme == "sights":
+        words = set(normalize(poi.get("name")).split())
+        theme = next((t for t, spec in THEMES.items() if words & set(spec["names"])), theme)
+    return theme
+
+
+def preferred_themes(activity: str, motivation: str):
+    text = f"{activity or ''} {motivation or ''}".lower()
+    return [theme for theme, words in KEYWORDS.items() if any(word in text for word in words)]
+
+
+def bearing(lat: float, lon: float, poi: dict) -> float:
+    return math.atan2(poi["lat"] - lat, (poi["lon"] - lon) * math.cos(math.radians(lat)))
+
+
+# -----------------------------
+# POIS
+# -----------------------------
+def candidates(pois):
+    """
+    One entry per distinct named place (nearest copy wins), with its theme;
+    places without a theme are left out.
+    """
+    seen, found = set(), []
+    for poi in sorted(pois, key=lambda p: p["distance_m"]):
+        key = normalize(poi.get("name"))
+        theme = theme_of(poi)
+        if key in GENERIC_NAMES or key in seen or theme is None:
+            continue
+        seen.add(key)
+        found.append({**poi, "theme": theme})
+    return found
+
+
+async def gather_pois(location: str, activity: str, needed: int):
+    """
+    (lat, lon, candidates) around the city; the searches only run when
+    the index does not already hold `needed` places, and are waited for at
+    most TOPUP_S so a miss does not hold up the LLM answer.
+    """
+    try:
+        lat, lon = await village_sources.geocode_location(location)
+    except Exception as e:
+        log.warning("composer geocode failed: %s", e, extra={"location": location})
+        return None, None, []
+    if lat is None or lon is None:
+        return None, None, []
+
+    found = candidates(poi_index.radius(lat, lon, RADIUS_M, CATEGORIES))
+    if len(found) >= needed:
+        return lat, lon, found
+
+    def report(task):
+        _background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning("composer POI search failed: %s", task.exception(), extra={"location": location})
+
+    # Both searches add what they find to the index, also after the timeout
+    searches = [
+        asyncio.create_task(village_sources.search_village_experiences(lat, lon)),
+        asyncio.create_task(experience_sources.search_geoapify(location, activity or "tourist attractions")),
+    ]
+    for task in searches:
+        _background.add(task)
+        task.add_done_callback(report)
+    await asyncio.wait(searches, timeout=TOPUP_S)
+    return lat, lon, candidates(poi_index.radius(lat, lon, RADIUS_M, CATEGORIES))
+
+
+# -----------------------------
+# COMPOSITION
+# -----------------------------
+def pick(found, preferred, needed: int):
+    """
+    `needed` places, nearest first within each theme, taking two from each
+    preferred theme for every one from the others so the trip keeps variety.
+    """
+    by_theme = {}
+    for poi in found:
+        by_theme.setdefault(poi["theme"], []).append(poi)
+    order = sorted(by_theme, key=lambda t: (t not in preferred, -len(by_theme[t])))
+
+    picked = []
+    while len(picked) < needed and any(by_theme.values()):
+        for theme in order:
+            take = 2 if theme in preferred else 1
+            picked.extend(by_theme[theme][:take])
+            by_theme[theme] = by_theme[theme][take:]
+    return picked[:needed]
+
+
+def make_item(day: int, places, location: str):
+    themes = [p["theme"] for p in places]
+    theme = max(THEMES, key=lambda t: (themes.count(t), -list(THEMES).index(t)))
+    spec = THEMES[theme]
+    item = {
+        "day": day,
+        "title": f"{spec['title']} around {places[0]['name']}",
+        "intro": spec["intro"].format(location=location),
+        "top_places": [
+            {
+                "name": p["name"],
+                "tip": f"{p.get('type') or THEMES[p['theme']]['title']}, "
+                       f"{p['distance_m'] / 1000:.1f} km from the centre. {THEMES[p['theme']]['tip']}",
+            }
+            for p in places
+        ],
+    }
+    valid, error = validate_item(item)
+    if valid is None:
+        raise ValueError(f"composed item is invalid: {error}")
+    return valid
+
+
+def compose_from(found, lat: float, lon: float, location: str, activity: str, motivation: str, days: int, per_day: int):
+    """
+    Pure part of compose(): the itinerary for these candidates, or None when
+    there are too few of them.
+    """
+    needed = days * per_day * PLACES_PER_ITEM
+    if len(found) < needed:
+        return None
+
+    preferred = preferred_themes(activity, motivation)
+    picked = pick(found, preferred, needed)
+    theme_rank = {theme: i for i, theme in enumerate(THEMES)}
+
+    # Days are slices of the compass around the centre, items are same-theme
+    # groups inside a day
+    picked.sort(key=lambda p: bearing(lat, lon, p))
+    per_day_places = per_day * PLACES_PER_ITEM
+    items = []
+    for d in range(days):
+        day_places = picked[d * per_day_places:(d + 1) * per_day_places]
+        day_places.sort(key=lambda p: (theme_rank[p["theme"]], p["distance_m"]))
+        for i in range(0, len(day_places), PLACES_PER_ITEM):
+            items.append(make_item(d + 1, day_places[i:i + PLACES_PER_ITEM], location))
+    return items
+
+
+@metrics.timed("compose_itinerary", fallback=lambda r: r is None)
+async def compose(location: str, activity: str, motivation: str, days: int, per_day: int):
+    """
+    Itinerary items built from known POIs, or None when they are too sparse
+    (or anything goes wrong) and the LLM should answer instead.
+    """
+    needed = days * per_day * PLACES_PER_ITEM
+    try:
+        lat, lon, found = await gather_pois(location, activity, needed)
+        if lat is None:
+            return None
+        items = compose_from(found, lat, lon, location, activity, motivation, days, per_day)
+    except Exception:
+        log.exception("itinerary composer failed", extra={"location": location})
+        return None
+
+    if items is None:
+        log.info(
+            "too few POIs to compose an itinerary",
+            extra={"location": location, "found": len(found), "needed": needed},
+        )
+    return items
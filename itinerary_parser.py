@@ -0,0 +1,253 @@
+# itinerary_parser.py
+"""
+Incremental parser for streamed LLM itineraries.
+
+ItineraryParser consumes the token stream and returns each top-level JSON
+object as soon as its closing brace arrives, validated against
+ItineraryItem. Anything outside objects (the surrounding "[", commas, ```
+fences, chatter) is ignored. Objects are repaired where that is safe:
+
+  * JSON:   trailing commas, smart quotes, raw newlines inside strings, and
+            an object cut off at the end of the stream between two fields
+            (closed up; one cut inside a value stays broken, since a
+            half place name would pass validation)
+  * fields: "Day 2" -> 2, a missing day taken from the object's position,
+            "description" / "name" used for a missing intro / title,
+            places given as plain strings, more than 3 places trimmed
+
+Objects that still fail validation are reported with the error so the
+caller can re-request just that item; valid ones are never thrown away.
+"""
+import json
+import re
+from typing import List
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+PLACES_PER_ITEM = 3
+
+
+# -----------------------------
+# SCHEMA
+# -----------------------------
+class Place(BaseModel):
+    name: str = Field(min_length=1)
+    tip: str = ""
+
+    @field_validator("name", "tip", mode="before")
+    @classmethod
+    def strip(cls, value):
+        return value.strip() if isinstance(value, str) else value
+
+
+class ItineraryItem(BaseModel):
+    day: int = Field(ge=1)
+    title: str = Field(min_length=1)
+    intro: str = Field(min_length=1)
+    top_places: List[Place] = Field(min_length=PLACES_PER_ITEM, max_length=PLACES_PER_ITEM)
+
+    @field_validator("title", "intro", mode="before")
+    @classmethod
+    def strip(cls, value):
+        return value.strip() if isinstance(value, str) else value
+
+
+# -----------------------------
+# REPAIRS
+# -----------------------------
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"'})
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+DAY_NUMBER = re.compile(r"\d+")
+DANGLING_KEY = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+DANGLING_SEPARATOR = re.compile(r"[,:]\s*$")
+# A number / true / false / null the cut may have shortened
+DANGLING_LITERAL = re.compile(r"[:\[,]\s*[\w.+-]+$")
+
+
+def repair_json(text: str) -> str:
+    """
+    Fix the mistakes LLMs make most in otherwise well-formed JSON: smart
+    quotes, trailing commas, raw control characters inside strings, and
+    unclosed brackets at the end (a truncated stream). A stream cut inside
+    a value (a string or a literal) cannot be repaired and raises
+    ValueError; a cut inside a key just drops the key.
+    """
+    text = TRAILING_COMMA.sub(r"\1", text.translate(SMART_QUOTES))
+
+    out, stack = [], []
+    in_string = escaped = in_key = False
+    last = ""  # last character outside strings, ignoring whitespace
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch in "\n\r\t":
+                ch = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}[ch]
+        elif ch == '"':
+            in_string = True
+            in_key = bool(stack) and stack[-1] == "}" and last in "{,"
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+        if not in_string and not ch.isspace():
+            last = ch
+        out.append(ch)
+
+    if in_string:
+        if not in_key:
+            raise ValueError("cut off inside a string value")
+        out.append('"')
+    text = "".join(out).rstrip()
+    if stack and DANGLING_LITERAL.search(text):
+        raise ValueError("cut off inside a value")
+    # Drop what the cut left dangling: a key without its value, a ":" or ","
+    if stack and stack[-1] == "}":
+        text = DANGLING_KEY.sub(r"\1", text)
+    text = DANGLING_SEPARATOR.sub("", text)
+    return TRAILING_COMMA.sub(r"\1", text + "".join(reversed(stack)))
+
+
+def coerce_item(obj: dict, expected_day: int = None) -> dict:
+    """
+    Field-level repairs before validation; returns a new dict.
+    """
+    item = dict(obj)
+
+    day = item.get("day")
+    if isinstance(day, str):
+        match = DAY_NUMBER.search(day)
+        day = int(match.group()) if match else None
+    if not isinstance(day, int) or isinstance(day, bool):
+        day = expected_day
+    item["day"] = day
+
+    if not item.get("title") and item.get("name"):
+        item["title"] = item["name"]
+    if not item.get("intro") and item.get("description"):
+        item["intro"] = item["description"]
+
+    places = item.get("top_places")
+    if isinstance(places, list):
+        places = [{"name": p} if isinstance(p, str) else p for p in places]
+        item["top_places"] = places[:PLACES_PER_ITEM]
+
+    return {key: item.get(key) for key in ("day", "title", "intro", "top_places")}
+
+
+def validate_item(obj, expected_day: int = None):
+    """
+    (item dict, None) when `obj` is (or can be coerced into) a valid
+    itinerary item, else (None, error message).
+    """
+    if not isinstance(obj, dict):
+        return None, f"expected a JSON object, got {type(obj).__name__}"
+    try:
+        item = ItineraryItem.model_validate(coerce_item(obj, expected_day))
+    except ValidationError as e:
+        errors = "; ".join(
+            f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+        )
+        return None, errors
+    return item.model_dump(), None
+
+
+def parse_object(raw: str, expected_day: int = None):
+    """
+    (item, None) or (None, error) for the text of one JSON object.
+    """
+    try:
+        obj = json.loads(raw)
+    except ValueError:
+        try:
+            obj = json.loads(repair_json(raw))
+        except ValueError as e:
+            return None, f"invalid JSON: {e}"
+    return validate_item(obj, expected_day)
+
+
+# -----------------------------
+# INCREMENTAL PARSER
+# -----------------------------
+class ItineraryParser:
+    """
+    Feed it text deltas; feed() and close() return events, in stream order:
+
+        {"index": 0, "item": {...}}                      valid (maybe repaired)
+        {"index": 1, "item": None, "raw": "...", "error": "..."}   broken
+
+    `index` counts top-level objects; with `per_day` set, an object missing
+    its day gets index // per_day + 1.
+    """
+
+    def __init__(self, per_day: int = None):
+        self.per_day = per_day
+        self.index = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.buffer = []
+
+    def expected_day(self, index: int):
+        return index // self.per_day + 1 if self.per_day else None
+
+    def _emit(self, raw: str):
+        index = self.index
+        self.index += 1
+        item, error = parse_object(raw, self.expected_day(index))
+        if item is not None:
+            return {"index": index, "item": item}
+        return {"index": index, "item": None, "raw": raw, "error": error}
+
+    def feed(self, text: str):
+        events = []
+        for ch in text:
+            if self.depth == 0:
+                if ch == "{":
+                    self.depth = 1
+                    self.buffer = [ch]
+                continue
+
+            self.buffer.append(ch)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                continue
+
+            if ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    events.append(self._emit("".join(self.buffer)))
+                    self.buffer = []
+        return events
+
+    def close(self):
+        """
+        End of stream: an object still open was cut off; try to close it.
+        """
+        if self.depth == 0 or not self.buffer:
+            return []
+        raw = "".join(self.buffer)
+        self.depth, self.in_string, self.escaped, self.buffer = 0, False, False, []
+        return [self._emit(raw)]
+
+
+def parse_itinerary(text: str, per_day: int = None):
+    """
+    Parse a complete response at once; returns the same events.
+    """
+    parser = ItineraryParser(per_day)
+    return parser.feed(text) + parser.close()
@@ -1,58 +1,185 @@
 # llm.py
 import os
-import requests
+import asyncio
+import copy
 import json
+import logging
+from contextlib import aclosing
 from dotenv import load_dotenv
+from http_clients import get_client
+from itinerary_parser import ItineraryParser
+import metrics
 
 load_dotenv()
 
 VY_GROQ_API_KEY = os.getenv("VY_GROQ_API_KEY")
 
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+log = logging.getLogger(__name__)
 
+GROQ_URL = "/openai/v1/chat/completions"
 
-def extract_json(text: str):
+# Bump whenever ITINERARY_PROMPT changes so cached itineraries are not reused
+ITINERARY_PROMPT_VERSION = "2"
+
+MAX_TOKENS = int(os.getenv("GROQ_MAX_TOKENS", "800"))
+# Room for one item (3 places with tips); longer itineraries get more tokens
+TOKENS_PER_ITEM = int(os.getenv("GROQ_TOKENS_PER_ITEM", "180"))
+# The model's output limit; Groq rejects calls that ask for more
+MODEL_MAX_TOKENS = int(os.getenv("GROQ_MODEL_MAX_TOKENS", "8192"))
+
+# Broken or missing items are re-requested one by one, not the whole itinerary
+ITEM_RETRY_ATTEMPTS = int(os.getenv("ITINERARY_ITEM_RETRY_ATTEMPTS", "1"))
+ITEM_RETRY_MAX = int(os.getenv("ITINERARY_ITEM_RETRY_MAX", "3"))
+
+# Long trips are generated as day-range shards, several at a time
+SHARD_DAYS = int(os.getenv("ITINERARY_SHARD_DAYS", "2"))
+SHARD_CONCURRENCY = int(os.getenv("ITINERARY_SHARD_CONCURRENCY", "4"))
+
+ITINERARY_PROMPT = """
+You are Voyayaha AI Travel Guide.
+
+The user is visiting: {location}
+
+User preferences:
+Budget: {budget}
+Activity: {activity}
+Motivation: {motivation}
+Trip duration: {days} days
+
+Your task:
+Generate a multi-day itinerary in CITY GUIDE style.
+
+Rules:
+- For each day, generate exactly {experiences_per_day} recommendations.
+- Total items must be exactly {total_experiences}.
+- Each item MUST include:
+    - day: day number (1, 2, 3...)
+    - title: short heading for that experience block
+    - intro: 1–2 lines describing what people enjoy
+    - top_places: array of exactly 3 objects:
+        - name
+        - tip
+
+Example format:
+
+[
+  {{
+    "day": 1,
+    "title": "Bangkok Relaxation Day",
+    "intro": "Unwind in Bangkok’s green and wellness spots.",
+    "top_places": [
+      {{"name": "Lumphini Park", "tip": "Relax with a walk and lake views."}},
+      {{"name": "Suan Rot Fai Park", "tip": "Enjoy gardens and cycling tracks."}},
+      {{"name": "Mandara Spa", "tip": "Rejuvenate with a traditional Thai massage."}}
+    ]
+  }}
+]
+
+IMPORTANT:
+- Use REAL places in {location}.
+- Return ONLY valid JSON array. No extra text.
+"""
+
+ITEM_RETRY_PROMPT = """{prompt}
+
+Only item {number} of {total} (day {day}) is needed now.
+Items already planned (do not repeat them): {planned}
+A previous answer for this item was rejected: {error}
+Return ONLY that one JSON object with day, title, intro and exactly 3 top_places. No array, no extra text.
+"""
+
+SHARD_PROMPT = """{prompt}
+
+This part of the plan covers only days {first} to {last} of a {days}-day trip; the other days are planned separately.
+Number the days here 1 to {count}.
+These places are already planned on other days, do NOT use them again: {used}
+"""
+
+ENRICH_PROMPT = """
+You are Voyayaha AI Travel Guide.
+
+Below is a {days}-day itinerary for {location}, built from real places.
+Traveller preferences: activity {activity}, motivation {motivation}.
+
+Rewrite each item's title and intro, and each place's tip, so they are vivid and specific to that place.
+Keep every item's day and its top_places names EXACTLY as given, in the same order.
+Return ONLY the JSON array, same length and order. No extra text.
+
+{itinerary}
+"""
+
+
+class FallbackItinerary(list):
     """
-    Safely extract JSON from LLM output even if extra text is present.
+    Marker type for the canned itineraries returned when Groq is unavailable
+    or its output cannot be parsed. Serializes like a normal list, but callers
+    can tell it apart (e.g. to avoid caching it).
     """
-    try:
-        # If already pure JSON
-        return json.loads(text)
-    except:
-        pass
 
-    # Try to extract first JSON block
-    try:
-        start = text.find("[")
-        end = text.rfind("]") + 1
-        if start != -1 and end != -1:
-            cleaned = text[start:end]
-            return json.loads(cleaned)
-    except:
-        pass
-
-    # Final fallback
-    return [
-        {
-            "title": "AI Suggestion",
-            "description": text.strip()
-        }
-    ]
+
+class RepeatingItinerary(list):
+    """
+    Marker type for a sharded itinerary in which some items still reuse
+    places from other days. Good enough to serve, not to cache.
+    """
+
+
+def build_itinerary_prompt(location, budget, activity, motivation, days, experiences_per_day):
+    return ITINERARY_PROMPT.format(
+        location=location,
+        budget=budget,
+        activity=activity,
+        motivation=motivation,
+        days=days,
+        experiences_per_day=experiences_per_day,
+        total_experiences=days * experiences_per_day,
+    )
 
 
-def generate_itinerary(prompt: str):
+# Canned itineraries so the frontend never breaks
+MISSING_KEY_FALLBACK = [
+    {
+        "title": "Explore the City",
+        "description": "Visit popular attractions and local highlights."
+    },
+    {
+        "title": "Food Experience",
+        "description": "Try famous local cuisine and street food."
+    }
+]
+
+ERROR_FALLBACK = [
+    {
+        "title": "City Highlights",
+        "description": "Top places to visit in your selected destination."
+    },
+    {
+        "title": "Local Experience",
+        "description": "Cultural and food experiences recommended for you."
+    }
+]
+
+
+def fallback_itinerary():
     if not VY_GROQ_API_KEY:
-        # Safe fallback if key missing
-        return [
-            {
-                "title": "Explore the City",
-                "description": "Visit popular attractions and local highlights."
-            },
-            {
-                "title": "Food Experience",
-                "description": "Try famous local cuisine and street food."
-            }
-        ]
+        return FallbackItinerary(copy.deepcopy(MISSING_KEY_FALLBACK))
+    return FallbackItinerary(copy.deepcopy(ERROR_FALLBACK))
+
+
+class LLMUnavailable(RuntimeError):
+    pass
+
+
+# -----------------------------
+# ASYNC GROQ CLIENT (streaming)
+# -----------------------------
+async def stream_completion(prompt: str, max_tokens: int = MAX_TOKENS):
+    """
+    Yield content deltas from Groq's streaming chat completions (SSE).
+    Runs on the shared pooled client, so it never blocks the event loop.
+    """
+    if not VY_GROQ_API_KEY:
+        raise LLMUnavailable("VY_GROQ_API_KEY not set")
 
     headers = {
         "Authorization": f"Bearer {VY_GROQ_API_KEY}",
@@ -64,7 +191,7 @@ def generate_itinerary(prompt: str):
         "messages": [
             {
                 "role": "system",
-                "content": "You are a travel planner. Always output a JSON array of objects with title and description only. No extra text."
+                "content": "You are a travel planner. Output only JSON in exactly the format the user asks for. No extra text."
             },
             {
                 "role": "user",
@@ -72,29 +199,495 @@ def generate_itinerary(prompt: str):
             }
         ],
         "temperature": 0.4,
-        "max_tokens": 800
+        "max_tokens": max_tokens,
+        "stream": True
     }
 
-    try:
-        r = requests.post(GROQ_URL, json=body, headers=headers, timeout=30)
-
+    async with get_client("groq").stream("POST", GROQ_URL, json=body, headers=headers) as r:
         if r.status_code != 200:
-            raise ValueError(f"Groq API error: {r.text}")
+            text = (await r.aread()).decode(errors="replace")
+            raise ValueError(f"Groq API error: {text}")
+
+        async for line in r.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
 
-        content = r.json()["choices"][0]["message"]["content"]
+            chunk = json.loads(data)
+            choices = chunk.get("choices") or [{}]
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+
+
+# -----------------------------
+# ITEM REPAIR
+# -----------------------------
+async def request_item(prompt: str, index: int, total: int, day: int, error: str, planned):
+    """
+    Ask Groq again for the single item at `index`; None if it stays invalid.
+    """
+    for _ in range(ITEM_RETRY_ATTEMPTS):
+        retry_prompt = ITEM_RETRY_PROMPT.format(
+            prompt=prompt.strip(),
+            number=index + 1,
+            total=total or index + 1,
+            day=day or "any",
+            planned=", ".join(planned) or "none",
+            error=error,
+        )
+        parser = ItineraryParser()
+        events = []
+        async for delta in stream_completion(retry_prompt, max_tokens=TOKENS_PER_ITEM * 2):
+            events.extend(parser.feed(delta))
+        events.extend(parser.close())
+
+        for event in events:
+            if event["item"] is not None:
+                item = event["item"]
+                if day:
+                    item["day"] = day
+                return item
+        error = events[0]["error"] if events else "no JSON object in the answer"
+
+    log.warning("itinerary item still invalid after retry: %s", error, extra={"provider": "groq", "index": index})
+    return None
+
+
+def retry_targets(broken: dict, items: dict, total: int):
+    """
+    {index: error} for broken items plus any that never arrived, capped at
+    ITEM_RETRY_MAX.
+    """
+    targets = dict(broken)
+    for index in range(total or 0):
+        if index not in items and index not in targets:
+            targets[index] = "item missing from the answer"
+    return dict(sorted(targets.items())[:ITEM_RETRY_MAX])
 
-        # Robust JSON extraction
-        return extract_json(content)
 
+async def repair_items(prompt: str, targets: dict, items: dict, parser: ItineraryParser, total: int):
+    """
+    Re-request every target concurrently; returns {index: item} for the
+    ones that came back valid.
+    """
+    planned = [item["title"] for item in items.values()]
+    indexes = list(targets)
+    results = await asyncio.gather(
+        *(
+            request_item(prompt, i, total, parser.expected_day(i), targets[i], planned)
+            for i in indexes
+        ),
+        return_exceptions=True,
+    )
+    repaired = {}
+    for index, result in zip(indexes, results):
+        if isinstance(result, Exception):
+            log.warning("itinerary item retry failed: %s", result, extra={"provider": "groq", "index": index})
+        elif result is not None:
+            repaired[index] = result
+    return repaired
+
+
+def max_tokens_for(total: int) -> int:
+    return min(MODEL_MAX_TOKENS, max(MAX_TOKENS, TOKENS_PER_ITEM * (total or 0)))
+
+
+# -----------------------------
+# ITINERARIES
+# -----------------------------
+async def itinerary_items(prompt: str, per_day: int = None, total: int = None):
+    """
+    {index: item} of the validated items in Groq's answer. Items that arrive
+    broken (or not at all) are re-requested one by one; the valid rest is
+    always kept. Empty when not a single usable item came back.
+    """
+    if not VY_GROQ_API_KEY:
+        return {}
+
+    parser = ItineraryParser(per_day)
+    items, broken = {}, {}
+
+    def collect(events):
+        for event in events:
+            if event["item"] is not None:
+                items[event["index"]] = event["item"]
+            else:
+                broken[event["index"]] = event["error"]
+
+    try:
+        async for delta in stream_completion(prompt, max_tokens=max_tokens_for(total)):
+            collect(parser.feed(delta))
+        # An object cut off by the end of the stream may come back repaired
+        collect(parser.close())
     except Exception as e:
+        if not items:
+            log.warning("groq error, no itinerary items: %s", e, extra={"provider": "groq"})
+            return {}
+        log.warning("groq stream failed after %d items: %s", len(items), e, extra={"provider": "groq"})
+
+    if broken:
+        log.info(
+            "itinerary items rejected",
+            extra={"provider": "groq", "rejected": {i: broken[i] for i in sorted(broken)}},
+        )
+
+    targets = retry_targets(broken, items, total)
+    if targets and items:
+        items.update(await repair_items(prompt, targets, items, parser, total))
+    return items
+
+
+@metrics.timed("generate_itinerary", fallback=lambda r: isinstance(r, FallbackItinerary))
+async def generate_itinerary(prompt: str, per_day: int = None, total: int = None):
+    """
+    Validated itinerary items in order (see itinerary_items). Only an answer
+    without a single usable item falls back to the canned itinerary.
+    """
+    if not VY_GROQ_API_KEY:
+        # Safe fallback if key missing
+        return fallback_itinerary()
+
+    items = await itinerary_items(prompt, per_day, total)
+    if not items:
         # Hard fallback so frontend never breaks
-        return [
-            {
-                "title": "City Highlights",
-                "description": "Top places to visit in your selected destination."
-            },
-            {
-                "title": "Local Experience",
-                "description": "Cultural and food experiences recommended for you."
-            }
-        ]
+        log.warning("no usable itinerary items, serving fallback", extra={"provider": "groq"})
+        return fallback_itinerary()
+    return [items[i] for i in sorted(items)]
+
+
+async def stream_items(prompt: str, per_day: int = None, total: int = None):
+    """
+    Yield (index, item) for validated itinerary items while Groq is still
+    generating. Broken items are re-requested in the background as soon as
+    they are seen and yielded (with any missing ones) after the stream ends.
+    """
+    parser = ItineraryParser(per_day)
+    items, broken, retries = {}, {}, {}
+
+    async def request(index: int, error: str, planned):
+        return index, await request_item(prompt, index, total, parser.expected_day(index), error, planned)
+
+    def retry(index: int, error: str):
+        if len(retries) < ITEM_RETRY_MAX:
+            planned = [item["title"] for item in items.values()]
+            retries[index] = asyncio.create_task(request(index, error, planned))
+
+    def handle(events):
+        valid = []
+        for event in events:
+            if event["item"] is not None:
+                items[event["index"]] = event["item"]
+                valid.append((event["index"], event["item"]))
+            else:
+                broken[event["index"]] = event["error"]
+                retry(event["index"], event["error"])
+        return valid
+
+    try:
+        async for delta in stream_completion(prompt, max_tokens=max_tokens_for(total)):
+            for valid in handle(parser.feed(delta)):
+                yield valid
+        # An object cut off by the end of the stream may come back repaired
+        for valid in handle(parser.close()):
+            yield valid
+
+        for index, error in retry_targets(broken, items, total).items():
+            if index not in retries:
+                retry(index, error)
+
+        for task in asyncio.as_completed(list(retries.values())):
+            try:
+                index, item = await task
+            except Exception as e:
+                log.warning("itinerary item retry failed: %s", e, extra={"provider": "groq"})
+                continue
+            if item is not None:
+                yield index, item
+    finally:
+        for task in retries.values():
+            task.cancel()
+
+
+async def stream_itinerary(prompt: str, per_day: int = None, total: int = None):
+    """
+    Yield validated itinerary items while Groq is still generating (see
+    stream_items).
+    """
+    async with aclosing(stream_items(prompt, per_day, total)) as items:
+        async for _, item in items:
+            yield item
+
+
+# -----------------------------
+# SHARDED ITINERARIES
+# -----------------------------
+def shard_ranges(days: int):
+    """
+    [(first_day, last_day), ...] covering days 1..days, SHARD_DAYS at a time.
+    """
+    size = max(1, SHARD_DAYS)
+    return [(first, min(days, first + size - 1)) for first in range(1, days + 1, size)]
+
+
+def place_key(place: dict) -> str:
+    return " ".join(place["name"].casefold().split())
+
+
+def shard_prompt(location, budget, activity, motivation, first, last, days, per_day, used: dict) -> str:
+    count = last - first + 1
+    return SHARD_PROMPT.format(
+        prompt=build_itinerary_prompt(location, budget, activity, motivation, count, per_day).strip(),
+        first=first,
+        last=last,
+        days=days,
+        count=count,
+        used=", ".join(used.values()) or "none",
+    )
+
+
+def repeats_places(items) -> bool:
+    """
+    True when some place appears in more than one item.
+    """
+    keys = [place_key(place) for item in items for place in item["top_places"]]
+    return len(keys) != len(set(keys))
+
+
+async def generate_shard(location, budget, activity, motivation, first, last, days, per_day, used: dict):
+    """
+    (prompt, {index: item}) for days first..last. Days come from each
+    item's position in the answer (per_day items a day), counted from
+    `first`, whatever the model numbered them. `used` ({place key: name},
+    shared by all shards) is read when the prompt is built and extended with
+    this shard's places; items is empty when the shard fell back.
+    """
+    prompt = shard_prompt(location, budget, activity, motivation, first, last, days, per_day, used)
+    total = (last - first + 1) * per_day
+    # Extra items would land on another shard's days
+    items = {i: item for i, item in (await itinerary_items(prompt, per_day, total)).items() if i < total}
+
+    for index, item in items.items():
+        item["day"] = first + index // per_day
+        for place in item["top_places"]:
+            used.setdefault(place_key(place), place["name"])
+    return prompt, items
+
+
+async def replace_repeats(repeats, merged):
+    """
+    Re-request (concurrently, at most ITEM_RETRY_MAX) the items in `repeats`
+    that reuse a place from an earlier day. A replacement is only taken when
+    it repeats nothing; otherwise the original item stays. Returns how many
+    items still repeat a place.
+    """
+    skipped = max(0, len(repeats) - ITEM_RETRY_MAX)
+    repeats = repeats[:ITEM_RETRY_MAX]
+    planned = [item["title"] for item in merged]
+    planned += [place["name"] for item in merged for place in item["top_places"]]
+
+    async def replace(position, prompt, index, total, first, names):
+        day = merged[position]["day"] - first + 1
+        error = "it repeats places planned on other days: " + ", ".join(names)
+        item = await request_item(prompt, index, total, day, error, planned)
+        if item is None:
+            return False
+        others = {
+            place_key(place)
+            for i, other in enumerate(merged) if i != position
+            for place in other["top_places"]
+        }
+        if any(place_key(place) in others for place in item["top_places"]):
+            return False
+        item["day"] = first + day - 1
+        merged[position] = item
+        return True
+
+    results = await asyncio.gather(*(replace(*repeat) for repeat in repeats), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            log.warning("itinerary item retry failed: %s", result, extra={"provider": "groq"})
+    return skipped + sum(result is not True for result in results)
+
+
+def merge_shards(ranges, shards, per_day: int, merged: list):
+    """
+    Append the shards' items to `merged` in day order; returns the repeats
+    (see replace_repeats) of places already in `merged`.
+    """
+    repeats = []
+    seen = {place_key(place) for item in merged for place in item["top_places"]}
+    for (first, last), shard in zip(ranges, shards):
+        if isinstance(shard, Exception):
+            log.warning("itinerary shard failed: %s", shard, extra={"provider": "groq", "days": [first, last]})
+            continue
+        prompt, items = shard
+        if not items:
+            log.warning("itinerary shard fell back", extra={"provider": "groq", "days": [first, last]})
+        total = (last - first + 1) * per_day
+        for index in sorted(items):
+            item = items[index]
+            keys = [place_key(place) for place in item["top_places"]]
+            names = [place["name"] for place, key in zip(item["top_places"], keys) if key in seen]
+            if names:
+                repeats.append((len(merged), prompt, index, total, first, names))
+            seen.update(keys)
+            merged.append(item)
+    return repeats
+
+
+@metrics.timed("generate_itinerary_sharded", fallback=lambda r: isinstance(r, FallbackItinerary))
+async def generate_itinerary_sharded(location, budget, activity, motivation, days: int, per_day: int):
+    """
+    A `days`-day itinerary generated as day-range shards of SHARD_DAYS,
+    up to SHARD_CONCURRENCY at once, so a week takes about as long as a
+    two-day trip and no single answer is long enough to get truncated.
+
+    Shards share the places used so far, but a shard only sees the places
+    of shards that finished before it started. With the defaults every
+    shard of a trip up to SHARD_DAYS * SHARD_CONCURRENCY days starts at
+    once, so the list only helps longer trips (or a lower concurrency).
+    Repeats are therefore fixed after the fact: after merging in day order,
+    items that repeat an earlier place are re-requested with the full list.
+    When some remain, the result is a RepeatingItinerary so it is not
+    cached. A failed shard only leaves its own days out; the canned
+    fallback is served only when every shard failed.
+    """
+    ranges = shard_ranges(days)
+    if len(ranges) == 1:
+        prompt = build_itinerary_prompt(location, budget, activity, motivation, days, per_day)
+        return await generate_itinerary(prompt, per_day, days * per_day)
+
+    if not VY_GROQ_API_KEY:
+        return fallback_itinerary()
+
+    used = {}
+    semaphore = asyncio.Semaphore(max(1, SHARD_CONCURRENCY))
+
+    async def run(first, last):
+        async with semaphore:
+            return await generate_shard(location, budget, activity, motivation, first, last, days, per_day, used)
+
+    shards = await asyncio.gather(*(run(first, last) for first, last in ranges), return_exceptions=True)
+
+    merged = []
+    repeats = merge_shards(ranges, shards, per_day, merged)
+
+    if not merged:
+        log.warning("every itinerary shard failed, serving fallback", extra={"provider": "groq"})
+        return fallback_itinerary()
+
+    if repeats:
+        log.info("itinerary items repeat places", extra={"provider": "groq", "count": len(repeats)})
+        unresolved = await replace_repeats(repeats, merged)
+        if unresolved:
+            log.info("itinerary items still repeat places", extra={"provider": "groq", "count": unresolved})
+            return RepeatingItinerary(merged)
+    return merged
+
+
+async def stream_itinerary_sharded(location, budget, activity, motivation, days: int, per_day: int):
+    """
+    Streaming counterpart of generate_itinerary_sharded(). The first shard
+    is streamed item by item while the others are generated alongside it
+    (up to SHARD_CONCURRENCY in all); their items follow in day order once
+    the first shard is done, with repeats re-requested as in the JSON path.
+    Yields nothing when every shard failed, so the caller can fall back.
+    """
+    ranges = shard_ranges(days)
+    if len(ranges) == 1:
+        prompt = build_itinerary_prompt(location, budget, activity, motivation, days, per_day)
+        async with aclosing(stream_itinerary(prompt, per_day, days * per_day)) as items:
+            async for item in items:
+                yield item
+        return
+
+    used = {}
+    semaphore = asyncio.Semaphore(max(1, SHARD_CONCURRENCY - 1))
+
+    async def run(first, last):
+        async with semaphore:
+            return await generate_shard(location, budget, activity, motivation, first, last, days, per_day, used)
+
+    rest = [asyncio.create_task(run(first, last)) for first, last in ranges[1:]]
+    try:
+        first, last = ranges[0]
+        prompt = shard_prompt(location, budget, activity, motivation, first, last, days, per_day, used)
+        total = (last - first + 1) * per_day
+        streamed = {}
+        try:
+            async with aclosing(stream_items(prompt, per_day, total)) as items:
+                async for index, item in items:
+                    # Days from the position, as in generate_shard()
+                    if index >= total:
+                        continue
+                    item["day"] = first + index // per_day
+                    for place in item["top_places"]:
+                        used.setdefault(place_key(place), place["name"])
+                    streamed[index] = item
+                    yield item
+        except Exception as e:
+            # Only its own days are lost; the other shards still follow
+            log.warning("itinerary shard failed: %s", e, extra={"provider": "groq", "days": [first, last]})
+
+        merged = [streamed[i] for i in sorted(streamed)]
+        sent = len(merged)
+        shards = await asyncio.gather(*rest, return_exceptions=True)
+        repeats = merge_shards(ranges[1:], shards, per_day, merged)
+        if repeats:
+            log.info("itinerary items repeat places", extra={"provider": "groq", "count": len(repeats)})
+            await replace_repeats(repeats, merged)
+        for item in merged[sent:]:
+            yield item
+    finally:
+        for task in rest:
+            task.cancel()
+
+
+# -----------------------------
+# ENRICHMENT (composed itineraries)
+# -----------------------------
+def same_places(a: dict, b: dict) -> bool:
+    return [place_key(p) for p in a["top_places"]] == [place_key(p) for p in b["top_places"]]
+
+
+@metrics.timed("enrich_itinerary", fallback=lambda r: not r[1])
+async def enrich_itinerary(items, location, activity, motivation):
+    """
+    (items, enriched): the composed itinerary with titles, intros and tips
+    rewritten by Groq. A rewritten item is only taken when it kept its day
+    and places; on any failure the composed items come back unchanged.
+    """
+    if not VY_GROQ_API_KEY or not items:
+        return items, False
+
+    prompt = ENRICH_PROMPT.format(
+        days=max(item["day"] for item in items),
+        location=location,
+        activity=activity or "any",
+        motivation=motivation or "any",
+        itinerary=json.dumps(items, ensure_ascii=False, indent=1),
+    )
+    parser = ItineraryParser()
+    rewritten = {}
+    try:
+        async for delta in stream_completion(prompt, max_tokens=max_tokens_for(len(items))):
+            for event in parser.feed(delta):
+                if event["item"] is not None:
+                    rewritten[event["index"]] = event["item"]
+    except Exception as e:
+        log.warning("groq enrichment failed: %s", e, extra={"provider": "groq"})
+        return items, False
+
+    enriched = [
+        rewritten[i] if i in rewritten and rewritten[i]["day"] == item["day"] and same_places(item, rewritten[i])
+        else item
+        for i, item in enumerate(items)
+    ]
+    taken = sum(a is not b for a, b in zip(enriched, items))
+    if taken < len(items):
+        log.info("enrichment kept composed items", extra={"provider": "groq", "kept": len(items) - taken})
+    return enriched, taken > 0
@@ -0,0 +1,236 @@
+# logs.py
+"""
+Structured, non-blocking logging.
+
+Modules log through the standard library (`log = logging.getLogger(__name__)`).
+setup() routes the root logger into a bounded queue; a background thread
+drains it and writes one JSON object per line to stdout, so a log call on the
+event loop costs a record copy and a queue put, never a blocking write.
+
+Every record carries ts, level, logger, msg, the current request id (set by
+the middleware in main) and any `extra=` fields, e.g.
+
+    log.info("yelp results", extra={"provider": "yelp", "count": 10})
+
+Settings (env, and at runtime through configure() / POST /admin/logging):
+  LOG_LEVEL      root level (default INFO)
+  LOG_LEVELS     per-logger levels, "experiences=DEBUG,http_clients=WARNING"
+  LOG_SAMPLE     per-logger sampling of records below WARNING,
+                 "access=0.1,experiences=0.5"; warnings and errors are
+                 always kept
+  LOG_QUEUE_SIZE records buffered before new ones are dropped (default 10000)
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+
+# Set per request by main's middleware; copied onto every record
+request_id = contextvars.ContextVar("request_id", default=None)
+
+# Third-party loggers that would log every upstream request at INFO
+QUIET_LOGGERS = {"httpx": "WARNING", "httpcore": "WARNING"}
+
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
+
+def parse_pairs(text: str) -> dict:
+    """
+    "a=DEBUG,b.c=0.5" -> {"a": "DEBUG", "b.c": "0.5"}
+    """
+    pairs = {}
+    for item in (text or "").split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            pairs[name.strip()] = value.strip()
+    return pairs
+
+
+# -----------------------------
+# FORMATTING (writer thread)
+# -----------------------------
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        rid = getattr(record, "request_id", None)
+        if rid is not None:
+            entry["request_id"] = rid
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and key != "request_id":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+# -----------------------------
+# SAMPLING (caller side)
+# -----------------------------
+class Sampler(logging.Filter):
+    """
+    Keeps a `rate` share of below-WARNING records per logger; the most
+    specific configured ancestor name wins ("a.b" covers "a.b.c").
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = dict(rates)
+        self.dropped = 0
+
+    def rate_for(self, name: str) -> float:
+        while name:
+            rate = self.rates.get(name)
+            if rate is not None:
+                return rate
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        if random.random() < self.rate_for(record.name):
+            return True
+        self.dropped += 1
+        return False
+
+
+# -----------------------------
+# QUEUE HANDLER
+# -----------------------------
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread. Formatting happens there; here the
+    record only gets its message resolved and the request id attached. When
+    the queue is full the record is dropped (and counted) instead of waiting.
+    """
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id.get()
+        # Resolve %-args now: they may be mutated by the time the thread runs
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_handler = None
+_sampler = Sampler({})
+_listener = None
+_queue = None
+
+
+def setup():
+    """
+    Install the queue handler on the root logger and start the writer
+    thread. Safe to call more than once.
+    """
+    global _handler, _listener, _queue
+    with _lock:
+        if _handler is not None:
+            return
+        # Read here, not at import: main loads .env after importing modules
+        _queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter())
+        _listener = logging.handlers.QueueListener(_queue, stream, respect_handler_level=False)
+        _listener.start()
+
+        _handler = NonBlockingQueueHandler(_queue)
+        _handler.addFilter(_sampler)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(_handler)
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    configure(
+        levels={**QUIET_LOGGERS, **parse_pairs(os.getenv("LOG_LEVELS", ""))},
+        sampling=parse_pairs(os.getenv("LOG_SAMPLE", "")),
+    )
+
+
+def shutdown():
+    """
+    Stop the writer thread after it has written everything queued.
+    """
+    global _handler, _listener
+    with _lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        _listener, _handler = None, None
+
+
+# -----------------------------
+# RUNTIME CONFIGURATION
+# -----------------------------
+def configure(levels: dict = None, sampling: dict = None):
+    """
+    levels:   {"experiences": "DEBUG", "": "WARNING"} ("" or "root" is the root)
+    sampling: {"access": 0.1}; a rate of 1 (or None) removes sampling
+    Raises ValueError on an unknown level or a rate outside 0..1.
+    """
+    parsed_levels = {}
+    for name, level in (levels or {}).items():
+        value = logging.getLevelName(str(level).upper())
+        if not isinstance(value, int):
+            raise ValueError(f"unknown log level {level!r}")
+        parsed_levels["" if name == "root" else name] = value
+
+    parsed_rates = {}
+    for name, rate in (sampling or {}).items():
+        rate = 1.0 if rate is None else float(rate)
+        if not 0 <= rate <= 1:
+            raise ValueError(f"sample rate for {name!r} must be between 0 and 1")
+        parsed_rates[name] = rate
+
+    for name, value in parsed_levels.items():
+        logging.getLogger(name or None).setLevel(value)
+
+    rates = dict(_sampler.rates)
+    for name, rate in parsed_rates.items():
+        if rate >= 1:
+            rates.pop(name, None)
+        else:
+            rates[name] = rate
+    _sampler.rates = rates
+
+
+def snapshot():
+    manager = logging.Logger.manager
+    levels = {"root": logging.getLevelName(logging.getLogger().level)}
+    for name, logger in sorted(manager.loggerDict.items()):
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+            levels[name] = logging.getLevelName(logger.level)
+    return {
+        "running": _listener is not None,
+        "queued": _queue.qsize() if _queue is not None else 0,
+        "dropped_queue_full": _handler.dropped if _handler is not None else 0,
+        "dropped_sampled": _sampler.dropped,
+        "levels": levels,
+        "sampling": dict(_sampler.rates),
+    }
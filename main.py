@@ -1,43 +1,91 @@
-from fastapi import FastAPI, HTTPException, Query
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from urllib.parse import unquote
-import httpx
 from dotenv import load_dotenv
 import os
-import copy
+import asyncio
+import time
 import json
-import requests
-import pymysql
-import os
-from typing import List
-
-from hotels import search_hotels
-from social import get_youtube_posts, get_reddit_posts
-from experiences import get_combined_experiences
-from llm import generate_itinerary
-from weather import get_weather_and_risk
-
-from pydantic import BaseModel
+import logging
+import uuid
+from typing import Dict, List
+
+import db
+import http_clients
+import logs
+import metrics
+import geocoding
+import singleflight
+import env_cache
+import poi_index
+import prewarm
+import providers
+import rate_limit
+import itinerary_cache
+import itinerary_composer
+
+from pydantic import BaseModel, Field
 from typing import Optional
-from villageexperiences import get_village_experiences
-from weather_openmeteo import (
-    get_weather_16_days,
-    get_lat_lon_from_city,
-    get_aqi
-)
 from traveler_advice import build_traveler_advice
-from traffic_tomtom import get_traffic_status
 
 
+# -----------------------------
+# PROVIDERS (imported on first use or by the background warm-up)
+# -----------------------------
+groq = providers.lazy("groq")
+openmeteo = providers.lazy("openmeteo")
+tomtom = providers.lazy("tomtom")
+travelpayouts = providers.lazy("travelpayouts")
+weatherapi = providers.lazy("weatherapi")
+image_proxy = providers.lazy("images")
+social_sources = providers.lazy("social")
+experience_sources = providers.lazy("experiences")
+village_sources = providers.lazy("village")
 
 
+load_dotenv()
+logs.setup()
 
+log = logging.getLogger(__name__)
+access_log = logging.getLogger("access")
 
+# Token for POST /admin/logging and DELETE /chat/experiences/cache; both
+# endpoints are disabled while unset
+LOG_ADMIN_TOKEN = os.getenv("LOG_ADMIN_TOKEN")
 
-load_dotenv()
 
-app = FastAPI(title="Voyayaha – AI Travel Concierge")
+def require_admin(request: Request):
+    token = request.headers.get("X-Admin-Token")
+    if not LOG_ADMIN_TOKEN or token != LOG_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+# -----------------------------
+# LIFESPAN (shared upstream clients)
+# -----------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logs.setup()
+    await http_clients.startup()
+    await asyncio.to_thread(db.writer.start)
+    await asyncio.to_thread(poi_index.load)
+    prewarm_task = asyncio.create_task(prewarm.run_forever())
+    # Traffic is accepted right away; integrations load behind it
+    warmup_task = asyncio.create_task(providers.warm_up()) if providers.WARMUP else None
+    yield
+    prewarm_task.cancel()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await prewarm.flush()
+    providers.shutdown()
+    await http_clients.shutdown()
+    await db.shutdown()
+    logs.shutdown()
+
+
+app = FastAPI(title="Voyayaha – AI Travel Concierge", lifespan=lifespan)
 
 
 # -----------------------------
@@ -59,120 +107,283 @@ app.add_middleware(
 )
 
 
+# -----------------------------
+# HOT LOCATIONS (prewarming)
+# -----------------------------
+@app.middleware("http")
+async def track_hot_locations(request: Request, call_next):
+    """
+    Count requests per location for the prewarmer; requests sent by the
+    prewarm worker refresh soon-to-expire cache entries instead. Anything
+    carrying X-Prewarm is never counted, valid token or not, so a warmer
+    cannot keep its own locations hot.
+    """
+    token = request.headers.get("X-Prewarm")
+    if token is None:
+        prewarm.record(request.url.path, request.query_params)
+    elif prewarm.PREWARM_TOKEN and token == prewarm.PREWARM_TOKEN:
+        env_cache.refresh_ahead_s.set(prewarm.LEAD_S)
+        rate_limit.priority.set(rate_limit.BACKGROUND)
+    return await call_next(request)
+
+
+# -----------------------------
+# METRICS / TRACING
+# -----------------------------
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """
+    Endpoint latency and size histograms plus one access log record; with
+    X-Trace: 1 the response also gets a Server-Timing header with every
+    provider call and upstream request. X-Request-ID is taken from the
+    client (or generated) and tagged onto every log record of the request.
+    """
+    rid = request.headers.get("X-Request-ID", "")[:64] or uuid.uuid4().hex[:16]
+    logs.request_id.set(rid)
+
+    trace = None
+    if metrics.TRACE_ALL or request.headers.get("X-Trace") == "1":
+        trace = metrics.start_trace()
+
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = request.scope.get("route")
+        route = route.path if route is not None else "unmatched"
+        elapsed = time.perf_counter() - started
+        metrics.http_duration.observe(elapsed, request.method, route, status)
+        access_log.log(
+            logging.WARNING if status >= 500 else logging.INFO,
+            "%s %s %s", request.method, request.url.path, status,
+            extra={"route": route, "status": status, "duration_ms": round(elapsed * 1000, 1)},
+        )
+
+    size = response.headers.get("content-length")
+    if size is not None:
+        metrics.http_bytes.observe(int(size), route)
+    if trace is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(trace)
+    response.headers["X-Request-ID"] = rid
+    return response
+
 
 # -----------------------------
 # MODELS
 # -----------------------------
+# Longest trip /chat/experiences plans; every SHARD_DAYS of it is a Groq call
+MAX_TRIP_DAYS = int(os.getenv("MAX_TRIP_DAYS", "14"))
+
+
 class ExperienceRequest(BaseModel):
     location: str
     budget: Optional[str] = ""
     activity: Optional[str] = ""
     duration: str                # half_day | full_day | multi_day
     motivation: Optional[str] = ""
-    num_days: Optional[int] = 1  # only used if multi_day
+    num_days: Optional[int] = Field(1, le=MAX_TRIP_DAYS)  # only used if multi_day
+    conversation_id: Optional[str] = None  # store request + answer in history
 
 
 # -----------------------------
 # CHAT / FRONTEND RECOMMENDATIONS
 # -----------------------------
+def itinerary_shape(data: ExperienceRequest):
+    """
+    🧠 Decide (days, experiences_per_day) for a request
+    """
+    if data.duration in ["half_day", "full_day"]:
+        return 1, 3
+    return max(1, data.num_days or 1), 2
+
+
+async def save_conversation_turn(data: ExperienceRequest, stops):
+    request = data.model_dump(exclude={"conversation_id"})
+    await db.save_message_async("user", json.dumps(request), data.conversation_id)
+    await db.save_message_async("assistant", json.dumps(stops), data.conversation_id)
+
+
 @app.post("/chat/experiences")
-async def chat_experiences_post(data: ExperienceRequest):
+async def chat_experiences_post(data: ExperienceRequest, response: Response):
     try:
         location = data.location
         budget = data.budget or ""
         activity = data.activity or ""
         duration = data.duration
         motivation = data.motivation or ""
-        num_days = data.num_days or 1
-
-        # 🧠 Decide experiences per day
-        if duration in ["half_day", "full_day"]:
-            experiences_per_day = 3
-            days = 1
-        else:
-            experiences_per_day = 2
-            days = max(1, num_days)
 
+        days, experiences_per_day = itinerary_shape(data)
         total_experiences = days * experiences_per_day
 
-        print("RECEIVED:", data)
-        print("TOTAL EXPERIENCES:", total_experiences)
-
-        prompt = f"""
-You are Voyayaha AI Travel Guide.
-
-The user is visiting: {location}
-
-User preferences:
-Budget: {budget}
-Activity: {activity}
-Motivation: {motivation}
-Trip duration: {days} days
-
-Your task:
-Generate a multi-day itinerary in CITY GUIDE style.
-
-Rules:
-- For each day, generate exactly {experiences_per_day} recommendations.
-- Total items must be exactly {total_experiences}.
-- Each item MUST include:
-    - day: day number (1, 2, 3...)
-    - title: short heading for that experience block
-    - intro: 1–2 lines describing what people enjoy
-    - top_places: array of exactly 3 objects:
-        - name
-        - tip
-
-Example format:
-
-[
-  {{
-    "day": 1,
-    "title": "Bangkok Relaxation Day",
-    "intro": "Unwind in Bangkok’s green and wellness spots.",
-    "top_places": [
-      {{"name": "Lumphini Park", "tip": "Relax with a walk and lake views."}},
-      {{"name": "Suan Rot Fai Park", "tip": "Enjoy gardens and cycling tracks."}},
-      {{"name": "Mandara Spa", "tip": "Rejuvenate with a traditional Thai massage."}}
-    ]
-  }}
-]
-
-IMPORTANT:
-- Use REAL places in {location}.
-- Return ONLY valid JSON array. No extra text.
-"""
-
-        llm_output = generate_itinerary(prompt)
+        log.debug(
+            "itinerary request",
+            extra={"location": location, "duration": duration, "total_experiences": total_experiences},
+        )
 
-        # -----------------------------
-        # Parse LLM output safely
-        # -----------------------------
-        if isinstance(llm_output, list):
-            experiences = llm_output
+        cache_key = itinerary_cache.make_key(
+            location, budget, activity, motivation, duration, days,
+            groq.ITINERARY_PROMPT_VERSION,
+        )
+        cached = itinerary_cache.get(cache_key)
+        if cached is not None:
+            response.headers["X-Itinerary-Cache"] = "HIT"
+            response.headers["X-Itinerary-Path"] = "cache"
+            if data.conversation_id:
+                await save_conversation_turn(data, cached)
+            return {"stops": cached}
+
+        response.headers["X-Itinerary-Cache"] = "MISS"
+
+        # Composed from known POIs in milliseconds when there are enough of
+        # them; the LLM only polishes the text (if enabled) or fills in
+        composed = None
+        if itinerary_composer.ENABLED:
+            composed = await itinerary_composer.compose(
+                location, activity, motivation, days, experiences_per_day
+            )
+
+        if composed is not None:
+            llm_output, path = composed, "composer"
+            if itinerary_composer.ENRICH:
+                llm_output, enriched = await groq.enrich_itinerary(composed, location, activity, motivation)
+                if enriched:
+                    path = "composer+llm"
         else:
-            cleaned = llm_output.strip()
-
-            if cleaned.startswith("```"):
-                cleaned = cleaned.split("```")[1]
-
-            experiences = json.loads(cleaned)
+            # Validated items, parsed while streaming; broken ones re-requested.
+            # Long trips are generated as concurrent day-range shards.
+            llm_output = await groq.generate_itinerary_sharded(
+                location, budget, activity, motivation, days, experiences_per_day
+            )
+            path = "fallback" if isinstance(llm_output, groq.FallbackItinerary) else "llm"
+        response.headers["X-Itinerary-Path"] = path
 
         # -----------------------------
         # 🔒 Enforce exact count WITHOUT repeating same object
         # -----------------------------
-        if len(experiences) > total_experiences:
-            experiences = experiences[:total_experiences]
+        experiences = llm_output[:total_experiences]
+
+        # Canned fallbacks, incomplete itineraries and ones that still repeat
+        # places must never be served from cache
+        complete = len(experiences) == total_experiences
+        if complete and not isinstance(llm_output, (groq.FallbackItinerary, groq.RepeatingItinerary)):
+            itinerary_cache.put(cache_key, location, experiences)
 
-       
+        if data.conversation_id:
+            await save_conversation_turn(data, experiences)
 
         return {"stops": experiences}
 
     except Exception as e:
-        print("ERROR in /chat/experiences:", e)
+        log.exception("/chat/experiences failed")
         return {"stops": [], "error": str(e)}
 
 
+@app.post("/chat/experiences/stream")
+async def chat_experiences_stream(data: ExperienceRequest):
+    """
+    NDJSON variant of /chat/experiences: one itinerary object per line,
+    sent as soon as the LLM closes it (or all at once when composed from
+    POIs), then {"done": true, ...}.
+    """
+    days, experiences_per_day = itinerary_shape(data)
+    total_experiences = days * experiences_per_day
+
+    cache_key = itinerary_cache.make_key(
+        data.location, data.budget, data.activity, data.motivation,
+        data.duration, days, groq.ITINERARY_PROMPT_VERSION,
+    )
+    cached = itinerary_cache.get(cache_key)
+
+    composed = None
+    if cached is None and itinerary_composer.ENABLED:
+        composed = await itinerary_composer.compose(
+            data.location, data.activity or "", data.motivation or "", days, experiences_per_day,
+        )
+    if cached is not None:
+        path = "cache"
+    else:
+        path = "composer" if composed is not None else "llm"
+
+    async def ndjson():
+        if cached is not None:
+            for item in cached:
+                yield json.dumps(item) + "\n"
+            if data.conversation_id:
+                await save_conversation_turn(data, cached)
+            yield json.dumps({"done": True, "count": len(cached), "cache": "HIT", "path": path}) + "\n"
+            return
+
+        if composed is not None:
+            # Already complete: no enrichment here, streaming is about speed
+            for item in composed:
+                yield json.dumps(item) + "\n"
+            itinerary_cache.put(cache_key, data.location, composed)
+            if data.conversation_id:
+                await save_conversation_turn(data, composed)
+            yield json.dumps({"done": True, "count": len(composed), "cache": "MISS", "path": path}) + "\n"
+            return
+
+        sent = []
+        error = None
+        try:
+            # Long trips are streamed shard by shard, like the JSON endpoint
+            stream = groq.stream_itinerary_sharded(
+                data.location, data.budget or "", data.activity or "",
+                data.motivation or "", days, experiences_per_day,
+            )
+            async with aclosing(stream) as items:
+                async for item in items:
+                    sent.append(item)
+                    yield json.dumps(item) + "\n"
+                    if len(sent) >= total_experiences:
+                        break
+        except Exception as e:
+            log.exception("/chat/experiences/stream failed")
+            error = str(e)
+
+        if not sent:
+            # Nothing usable came through: fall back like the JSON endpoint
+            for item in groq.fallback_itinerary():
+                yield json.dumps(item) + "\n"
+        elif error is None and len(sent) == total_experiences and not groq.repeats_places(sent):
+            # Re-requested items arrive last: cache in day order
+            itinerary_cache.put(cache_key, data.location, sorted(sent, key=lambda item: item["day"]))
+
+        if data.conversation_id and sent:
+            await save_conversation_turn(data, sent)
+
+        done = {"done": True, "count": len(sent), "cache": "MISS", "path": path if sent else "fallback"}
+        if error:
+            done["error"] = error
+        yield json.dumps(done) + "\n"
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"X-Itinerary-Cache": "HIT" if cached is not None else "MISS", "X-Itinerary-Path": path},
+    )
+
+
+@app.get("/chat/history")
+async def chat_history(conversation_id: str, limit: int = Query(50, ge=1, le=500)):
+    return {
+        "conversation_id": conversation_id,
+        "messages": await db.get_history(conversation_id, limit),
+    }
+
+
+@app.delete("/chat/experiences/cache")
+def purge_itinerary_cache(location: str, request: Request):
+    """
+    Drop a location's cached itineraries. Needs X-Admin-Token equal to
+    LOG_ADMIN_TOKEN.
+    """
+    require_admin(request)
+    return {"location": location, "purged": itinerary_cache.purge_location(location)}
+
+
 # -----------------------------
 # ROOT
 # -----------------------------
@@ -181,22 +392,112 @@ def root():
     return {"status": "Voyayaha backend running"}
 
 
+# -----------------------------
+# METRICS
+# -----------------------------
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# -----------------------------
+# UPSTREAM POOL STATS
+# -----------------------------
+@app.get("/stats/http-pools")
+def http_pool_stats():
+    return http_clients.pool_stats()
+
+
+@app.get("/stats/geocoding")
+def geocoding_stats():
+    return geocoding.cache_stats()
+
+
+@app.get("/stats/singleflight")
+def singleflight_stats():
+    return singleflight.stats()
+
+
+@app.get("/stats/env-cache")
+def env_cache_stats():
+    return env_cache.cache_stats()
+
+
+@app.get("/stats/poi-index")
+def poi_index_stats():
+    return poi_index.stats()
+
+
+@app.get("/stats/img-cache")
+def img_cache_stats():
+    return image_proxy.stats()
+
+
+@app.get("/stats/circuit-breakers")
+def circuit_breaker_stats():
+    return http_clients.breaker_stats()
+
+
+@app.get("/stats/rate-limits")
+def rate_limit_stats():
+    return rate_limit.usage()
+
+
+@app.get("/stats/db-writer")
+def db_writer_stats():
+    return db.writer.snapshot()
+
+
+@app.get("/stats/prewarm")
+async def prewarm_stats():
+    return {**prewarm.snapshot(), "hot": await prewarm.hot_locations()}
+
+
+@app.get("/stats/providers")
+def provider_stats():
+    return providers.snapshot()
+
+
+@app.get("/stats/logging")
+def logging_stats():
+    return logs.snapshot()
+
+
+# -----------------------------
+# RUNTIME LOG CONFIGURATION
+# -----------------------------
+class LoggingConfig(BaseModel):
+    levels: Dict[str, str] = {}                # logger -> level ("root" for the root)
+    sampling: Dict[str, Optional[float]] = {}  # logger -> share of sub-WARNING records kept
+
+
+@app.post("/admin/logging")
+def configure_logging(config: LoggingConfig, request: Request):
+    """
+    Change log levels and sampling without a restart. Needs X-Admin-Token
+    equal to LOG_ADMIN_TOKEN.
+    """
+    require_admin(request)
+    try:
+        logs.configure(levels=config.levels, sampling=config.sampling)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    log.info("logging reconfigured", extra={"levels": config.levels, "sampling": config.sampling})
+    return logs.snapshot()
+
+
 # -----------------------------
 # IMAGE PROXY
 # -----------------------------
 @app.get("/img")
-async def proxy_image(url: str):
+async def proxy_image(
+    url: str,
+    w: Optional[int] = Query(None, description="Max width in px"),
+    q: Optional[int] = Query(None, description="Quality 1-95 (jpeg/webp)"),
+    fmt: Optional[str] = Query(None, description="webp | jpeg | png"),
+):
     decoded = unquote(url)
-
-    async with httpx.AsyncClient(timeout=15, follow_redirects=True) as client:
-        r = await client.get(decoded)
-        r.raise_for_status()
-
-        return Response(
-            content=r.content,
-            media_type=r.headers.get("content-type", "image/jpeg"),
-            headers={"Cache-Control": "public, max-age=86400"}
-        )
+    return await image_proxy.proxy_variant(decoded, width=w, quality=q, fmt=fmt)
 
 
 # -----------------------------
@@ -207,7 +508,7 @@ async def experiences(location: str, query: str = "tourist"):
     """
     Returns weather, Yelp results, Geoapify fallback results.
     """
-    return await get_combined_experiences(location, query)
+    return await experience_sources.get_combined_experiences(location, query)
 
 
 # -----------------------------
@@ -215,7 +516,7 @@ async def experiences(location: str, query: str = "tourist"):
 # -----------------------------
 @app.get("/hotels")
 async def hotels(city: str, check_in: str, check_out: str, limit: int = 6):
-    return await search_hotels(city, check_in, check_out, limit)
+    return await travelpayouts.search_hotels(city, check_in, check_out, limit)
 
 
 # -----------------------------
@@ -223,7 +524,7 @@ async def hotels(city: str, check_in: str, check_out: str, limit: int = 6):
 # -----------------------------
 @app.get("/weather")
 async def weather(location: str):
-    return await get_weather_and_risk(location)
+    return await weatherapi.get_weather_and_risk(location)
 
 
 # -----------------------------
@@ -231,8 +532,10 @@ async def weather(location: str):
 # -----------------------------
 @app.get("/social")
 async def social(location: str = "Mumbai", limit: int = 5):
-    reddit_posts = await get_reddit_posts(location, limit)
-    youtube_posts = await get_youtube_posts(location, limit)
+    reddit_posts, youtube_posts = await asyncio.gather(
+        social_sources.with_deadline(social_sources.get_reddit_posts(location, limit)),
+        social_sources.with_deadline(social_sources.get_youtube_posts(location, limit)),
+    )
     return youtube_posts + reddit_posts
 
 
@@ -242,7 +545,11 @@ async def social(location: str = "Mumbai", limit: int = 5):
 @app.get("/trends")
 async def trends(location: str = "Pune"):
     query = f"{location} travel OR {location} places OR {location} itinerary"
-    return await get_reddit_posts(query, limit=8)
+    reddit_posts, youtube_posts = await asyncio.gather(
+        social_sources.with_deadline(social_sources.get_reddit_posts(query, limit=8)),
+        social_sources.with_deadline(social_sources.get_youtube_posts(f"{location} travel", limit=4)),
+    )
+    return reddit_posts + youtube_posts
 
 @app.get("/village/experiences")
 async def village_experiences(
@@ -254,7 +561,7 @@ async def village_experiences(
     """
 
     try:
-        result = await get_village_experiences(location)
+        result = await village_sources.get_village_experiences(location)
         return result
 
     except Exception as e:
@@ -264,15 +571,29 @@ async def village_experiences(
             "experiences": []
         }
 
-@app.get("/travel-intel")
-def travel_intel(city: str):
-    lat, lon = get_lat_lon_from_city(city)
-    if not lat or not lon:
-        raise HTTPException(status_code=404, detail="City not found")
+TRAVEL_INTEL_BATCH_MAX = int(os.getenv("TRAVEL_INTEL_BATCH_MAX", "25"))
+TRAVEL_INTEL_BATCH_CONCURRENCY = int(os.getenv("TRAVEL_INTEL_BATCH_CONCURRENCY", "4"))
+
 
-    weather = get_weather_16_days(lat, lon)
-    aqi = get_aqi(city=city, lat=lat, lon=lon)
-    traffic = get_traffic_status(lat, lon)
+class TravelIntelBatchRequest(BaseModel):
+    cities: List[str]
+
+
+def build_travel_intel(city, lat, lon, weather, aqi, traffic):
+    """
+    Assemble one /travel-intel answer; each failed section falls back on its own.
+    """
+    if isinstance(weather, Exception):
+        log.warning("forecast error: %s", weather, extra={"provider": "openmeteo", "city": city})
+        weather = []
+
+    if isinstance(aqi, Exception):
+        log.warning("aqi error: %s", aqi, extra={"provider": "openweather", "city": city})
+        aqi = {"aqi": "N/A", "health_note": "AQI service unavailable"}
+
+    if isinstance(traffic, Exception):
+        log.warning("traffic error: %s", traffic, extra={"provider": "tomtom", "city": city})
+        traffic = {"status": "Unavailable"}
 
     traveler_advice = build_traveler_advice(traffic)
 
@@ -288,3 +609,81 @@ def travel_intel(city: str):
         "traveler_advice": traveler_advice
     }
 
+
+@app.get("/travel-intel")
+async def travel_intel(city: str):
+    try:
+        lat, lon = await openmeteo.get_lat_lon_from_city(city)
+    except Exception as e:
+        log.warning("geocoding error: %s", e, extra={"provider": "openmeteo_geocoding", "city": city})
+        raise HTTPException(status_code=503, detail="Geocoding unavailable")
+
+    if not lat or not lon:
+        raise HTTPException(status_code=404, detail="City not found")
+
+    # Forecast, AQI and traffic only need coordinates: run them together
+    # and let each section fall back on its own.
+    weather, aqi, traffic = await asyncio.gather(
+        openmeteo.get_weather_16_days(lat, lon),
+        openmeteo.get_aqi(city=city, lat=lat, lon=lon),
+        tomtom.get_traffic_status(lat, lon),
+        return_exceptions=True,
+    )
+
+    return build_travel_intel(city, lat, lon, weather, aqi, traffic)
+
+
+@app.post("/travel-intel/batch")
+async def travel_intel_batch(data: TravelIntelBatchRequest):
+    """
+    /travel-intel for every city of a multi-city trip: concurrent geocoding,
+    one multi-location forecast call, bounded AQI / traffic fan-out.
+    Cities that fail come back with an "error" instead of failing the batch.
+    """
+    cities = [c.strip() for c in data.cities if c and c.strip()]
+    if not cities:
+        raise HTTPException(status_code=422, detail="cities must not be empty")
+    if len(cities) > TRAVEL_INTEL_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"At most {TRAVEL_INTEL_BATCH_MAX} cities per batch")
+
+    for city in cities:
+        prewarm.record("/travel-intel", {"city": city})
+
+    geocoded = await asyncio.gather(
+        *(openmeteo.get_lat_lon_from_city(city) for city in cities), return_exceptions=True
+    )
+
+    results = [None] * len(cities)
+    located = []
+    for i, (city, coords) in enumerate(zip(cities, geocoded)):
+        if isinstance(coords, Exception):
+            log.warning("geocoding error: %s", coords, extra={"provider": "openmeteo_geocoding", "city": city})
+            results[i] = {"city": city, "error": "Geocoding unavailable"}
+        elif not coords[0] or not coords[1]:
+            results[i] = {"city": city, "error": "City not found"}
+        else:
+            located.append(i)
+
+    if located:
+        coords = [geocoded[i] for i in located]
+        semaphore = asyncio.Semaphore(TRAVEL_INTEL_BATCH_CONCURRENCY)
+
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
+
+        forecasts, *side = await asyncio.gather(
+            openmeteo.get_weather_16_days_many(coords),
+            *(bounded(openmeteo.get_aqi(city=cities[i], lat=lat, lon=lon)) for i, (lat, lon) in zip(located, coords)),
+            *(bounded(tomtom.get_traffic_status(lat, lon)) for lat, lon in coords),
+            return_exceptions=True,
+        )
+        if isinstance(forecasts, Exception):
+            forecasts = [forecasts] * len(located)
+        aqis, traffics = side[:len(located)], side[len(located):]
+
+        for n, i in enumerate(located):
+            lat, lon = coords[n]
+            results[i] = build_travel_intel(cities[i], lat, lon, forecasts[n], aqis[n], traffics[n])
+
+    return {"count": len(results), "results": results}
@@ -0,0 +1,197 @@
+# metrics.py
+"""
+In-process metrics in the Prometheus text format, plus optional per-request
+trace spans.
+
+Three layers are measured:
+  * endpoints   - http_request_duration_seconds / http_response_bytes (middleware)
+  * provider calls - provider_call_duration_seconds{call, outcome} and
+    provider_fallbacks_total, via @timed("search_yelp", fallback=...)
+  * raw upstream HTTP - upstream_request_duration_seconds{provider, status}
+    and upstream_response_bytes, recorded by http_clients.PooledTransport
+
+When a request is traced (X-Trace: 1, or METRICS_TRACE_ALL=1), every provider
+call and upstream request becomes a span and the response carries a
+Server-Timing header breaking it down.
+"""
+import asyncio
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import time
+from collections import defaultdict
+
+TRACE_ALL = os.getenv("METRICS_TRACE_ALL", "0") == "1"
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+# -----------------------------
+# PRIMITIVES
+# -----------------------------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.values = defaultdict(float)
+        REGISTRY.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        self.values[label_values] += amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for values, total in sorted(self.values.items()):
+            yield f"{self.name}{_labels_text(self.labels, values)} {total}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, *label_values):
+        row = self.values.get(label_values)
+        if row is None:
+            row = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for values, row in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), row[:-1]):
+                cumulative += count
+                labels = _labels_text((*self.labels, "le"), (*values, bound))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels_text(self.labels, values)
+            yield f"{self.name}_sum{labels} {row[-1]}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+REGISTRY = []
+
+http_duration = Histogram(
+    "http_request_duration_seconds", "Endpoint latency", ("method", "route", "status")
+)
+http_bytes = Histogram(
+    "http_response_bytes", "Endpoint response size", ("route",), SIZE_BUCKETS
+)
+call_duration = Histogram(
+    "provider_call_duration_seconds", "Provider function latency (including caches)", ("call", "outcome")
+)
+call_fallbacks = Counter(
+    "provider_fallbacks_total", "Provider calls answered by a fallback value", ("call",)
+)
+upstream_duration = Histogram(
+    "upstream_request_duration_seconds", "Upstream HTTP latency to response headers", ("provider", "status")
+)
+upstream_bytes = Histogram(
+    "upstream_response_bytes", "Upstream response body size", ("provider",), SIZE_BUCKETS
+)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# TRACING
+# -----------------------------
+# {"start": perf_counter, "spans": [...]} for traced requests, else None
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def start_trace():
+    trace = {"start": time.perf_counter(), "spans": []}
+    current_trace.set(trace)
+    return trace
+
+
+def add_span(name: str, started: float, duration_s: float, status: str):
+    trace = current_trace.get()
+    if trace is not None:
+        trace["spans"].append({
+            "name": name,
+            "start_ms": round((started - trace["start"]) * 1000, 1),
+            "duration_ms": round(duration_s * 1000, 1),
+            "status": status,
+        })
+
+
+def server_timing(trace) -> str:
+    """
+    Server-Timing header value: one entry per span, in start order.
+    """
+    entries = []
+    for i, span in enumerate(sorted(trace["spans"], key=lambda s: s["start_ms"])):
+        desc = f'{span["name"]} {span["status"]} @{span["start_ms"]}ms'
+        entries.append(f'{i}-{span["name"]};dur={span["duration_ms"]};desc="{desc}"')
+    total = (time.perf_counter() - trace["start"]) * 1000
+    entries.append(f"total;dur={total:.1f}")
+    return ", ".join(entries)
+
+
+# -----------------------------
+# PROVIDER CALLS
+# -----------------------------
+def timed(call: str, fallback=None):
+    """
+    Decorator for async provider functions. `fallback(result)` tells whether
+    the function answered with its fallback value (empty list, "Unavailable").
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                result = await fn(*args, **kwargs)
+                if fallback is not None and fallback(result):
+                    outcome = "fallback"
+                    call_fallbacks.inc(call)
+                return result
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            except BaseException:
+                outcome = "error"
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                call_duration.observe(elapsed, call, outcome)
+                add_span(call, started, elapsed, outcome)
+                log.debug(
+                    "provider call",
+                    extra={"call": call, "outcome": outcome, "duration_ms": round(elapsed * 1000, 1)},
+                )
+        return wrapper
+    return decorator
+
+
+def is_empty(result) -> bool:
+    return not result
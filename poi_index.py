@@ -0,0 +1,272 @@
+# poi_index.py
+"""
+Local spatial index of every POI the providers have returned to us.
+
+POIs live in fixed lat/lon grid buckets in memory (persisted to the SQLite
+database), so radius and k-nearest queries with category filters are answered
+locally. A coverage table records which regions were fetched from upstream,
+how far out from the centre the fetch was complete, and when, so callers
+only go upstream when a region is missing or stale.
+
+POIs no provider has returned for POI_TTL_S (closed places, one-off search
+hits) are pruned, as are the least recently seen ones past POI_INDEX_MAX.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import defaultdict
+
+from db import DB_PATH
+from env_cache import refresh_ahead_s
+from geo import geohash, grid_cell, grid_cells_around, haversine_m
+
+BUCKET_DEG = 0.05            # ~5.5 km buckets
+COVERAGE_PRECISION = 5       # coverage is tracked per ~5 km geohash cell
+COVERAGE_TTL_S = float(os.getenv("POI_COVERAGE_TTL_S", str(7 * 24 * 3600)))
+POI_TTL_S = float(os.getenv("POI_TTL_S", str(30 * 24 * 3600)))
+POI_MAX = int(os.getenv("POI_INDEX_MAX", "200000"))
+PRUNE_INTERVAL_S = 3600
+
+# (row, col) -> {poi_id: poi}
+_buckets = defaultdict(dict)
+# poi_id -> (last time a provider returned it, bucket)
+_seen = {}
+_last_prune = 0.0
+_pruned = 0
+# (kind, cell) -> {"radius_m", "fetched_at", "lat", "lon"}
+_coverage = {}
+_loaded = False
+
+log = logging.getLogger(__name__)
+
+
+# -----------------------------
+# PERSISTENCE
+# -----------------------------
+def _init_tables(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS poi_index (
+        id TEXT PRIMARY KEY,
+        lat REAL,
+        lon REAL,
+        data TEXT,
+        updated_at REAL)
+    """)
+    conn.execute("""CREATE TABLE IF NOT EXISTS poi_coverage (
+        kind TEXT,
+        cell TEXT,
+        radius_m REAL,
+        fetched_at REAL,
+        PRIMARY KEY (kind, cell))
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(poi_coverage)")}
+    for column in ("lat", "lon"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE poi_coverage ADD COLUMN {column} REAL")
+
+
+def load():
+    """
+    Load the persisted index into memory (called once at startup).
+    """
+    global _loaded
+    with sqlite3.connect(DB_PATH) as conn:
+        _init_tables(conn)
+        for poi_id, data, updated_at in conn.execute("SELECT id, data, updated_at FROM poi_index"):
+            poi = json.loads(data)
+            cell = grid_cell(poi["lat"], poi["lon"], BUCKET_DEG)
+            _buckets[cell][poi_id] = poi
+            _seen[poi_id] = (updated_at or 0.0, cell)
+        for kind, cell, radius_m, fetched_at, lat, lon in conn.execute(
+            "SELECT kind, cell, radius_m, fetched_at, lat, lon FROM poi_coverage"
+        ):
+            _coverage[(kind, cell)] = {"radius_m": radius_m, "fetched_at": fetched_at, "lat": lat, "lon": lon}
+    _loaded = True
+    _delete(*prune())
+
+
+def _persist(pois: dict, coverage=None):
+    with sqlite3.connect(DB_PATH) as conn:
+        _init_tables(conn)
+        now = time.time()
+        conn.executemany(
+            "INSERT OR REPLACE INTO poi_index (id, lat, lon, data, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [(poi_id, p["lat"], p["lon"], json.dumps(p), now) for poi_id, p in pois.items()],
+        )
+        if coverage:
+            conn.execute(
+                "INSERT OR REPLACE INTO poi_coverage (kind, cell, radius_m, fetched_at, lat, lon)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                coverage,
+            )
+
+
+def _delete(poi_ids, coverage_before: float):
+    with sqlite3.connect(DB_PATH) as conn:
+        _init_tables(conn)
+        conn.executemany("DELETE FROM poi_index WHERE id = ?", [(pid,) for pid in poi_ids])
+        conn.execute("DELETE FROM poi_coverage WHERE fetched_at < ?", (coverage_before,))
+
+
+def prune(now: float = None):
+    """
+    Drop POIs not returned within POI_TTL_S, then the least recently seen
+    ones beyond POI_MAX, and expired coverage, from memory. Returns
+    (removed poi ids, coverage cutoff) for _delete().
+    """
+    global _last_prune, _pruned
+    now = now or time.time()
+    _last_prune = now
+
+    cutoff = now - POI_TTL_S
+    removed = [pid for pid, (seen_at, _) in _seen.items() if seen_at < cutoff]
+    overflow = len(_seen) - len(removed) - POI_MAX
+    if overflow > 0:
+        live = sorted((seen_at, pid) for pid, (seen_at, _) in _seen.items() if seen_at >= cutoff)
+        removed += [pid for _, pid in live[:overflow]]
+
+    for pid in removed:
+        _, cell = _seen.pop(pid)
+        bucket = _buckets.get(cell)
+        if bucket is not None:
+            bucket.pop(pid, None)
+            if not bucket:
+                del _buckets[cell]
+    _pruned += len(removed)
+
+    coverage_before = now - COVERAGE_TTL_S
+    for key in [k for k, entry in _coverage.items() if entry["fetched_at"] < coverage_before]:
+        del _coverage[key]
+
+    if removed:
+        log.info("poi index pruned", extra={"removed": len(removed), "remaining": len(_seen)})
+    return removed, coverage_before
+
+
+# -----------------------------
+# INGEST
+# -----------------------------
+def poi_id(poi: dict) -> str:
+    raw = f'{poi.get("source")}|{(poi.get("name") or "").casefold()}|{poi["lat"]:.5f}|{poi["lon"]:.5f}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def categories_of(poi: dict):
+    return poi.get("category") or poi.get("categories") or []
+
+
+async def add(pois, coverage_kind: str = None, lat: float = None, lon: float = None, radius_m: float = None):
+    """
+    Index provider results (dicts with lat/lon/name/category/source).
+    If `coverage_kind` is given, also record that every place of that kind
+    within radius_m of (lat, lon) was fetched.
+    """
+    fresh = {}
+    now = time.time()
+    for poi in pois:
+        if poi.get("lat") is None or poi.get("lon") is None:
+            continue
+        stored = {k: v for k, v in poi.items() if k != "distance_m"}
+        pid = poi_id(stored)
+        cell = grid_cell(stored["lat"], stored["lon"], BUCKET_DEG)
+        _buckets[cell][pid] = stored
+        _seen[pid] = (now, cell)
+        fresh[pid] = stored
+
+    coverage = None
+    if coverage_kind is not None:
+        cell = geohash(lat, lon, COVERAGE_PRECISION)
+        _coverage[(coverage_kind, cell)] = {"radius_m": radius_m, "fetched_at": now, "lat": lat, "lon": lon}
+        coverage = (coverage_kind, cell, radius_m, now, lat, lon)
+
+    if fresh or coverage:
+        try:
+            await asyncio.to_thread(_persist, fresh, coverage)
+        except sqlite3.Error as e:
+            log.error("poi index persist failed: %s", e)
+
+    if now - _last_prune > PRUNE_INTERVAL_S or len(_seen) > POI_MAX:
+        stale = prune(now)
+        try:
+            await asyncio.to_thread(_delete, *stale)
+        except sqlite3.Error as e:
+            log.error("poi index prune failed: %s", e)
+
+
+def covered_radius(kind: str, lat: float, lon: float) -> float:
+    """
+    How far from (lat, lon) the index holds every place of this kind; 0 when
+    the region was never fetched or the fetch is stale.
+    """
+    entry = _coverage.get((kind, geohash(lat, lon, COVERAGE_PRECISION)))
+    # The prewarmer treats coverage that is about to expire as missing
+    max_age = COVERAGE_TTL_S - refresh_ahead_s.get()
+    if not entry or time.time() - entry["fetched_at"] >= max_age:
+        return 0.0
+    if entry["lat"] is None or entry["lon"] is None:
+        return entry["radius_m"]
+    # Another point in the same cell sees the fetched circle off-centre
+    return max(0.0, entry["radius_m"] - haversine_m(lat, lon, entry["lat"], entry["lon"]))
+
+
+def is_covered(kind: str, lat: float, lon: float, radius_m: float) -> bool:
+    return covered_radius(kind, lat, lon) >= radius_m
+
+
+# -----------------------------
+# QUERIES
+# -----------------------------
+def matches(poi: dict, categories) -> bool:
+    if not categories:
+        return True
+    # Geoapify categories are hierarchical: "natural" matches "natural.water"
+    return any(
+        c == wanted or c.startswith(wanted + ".")
+        for c in categories_of(poi)
+        for wanted in categories
+    )
+
+
+def radius(lat: float, lon: float, radius_m: float, categories=None, limit: int = None):
+    """
+    POIs within radius_m of (lat, lon), nearest first, each with distance_m.
+    """
+    found = []
+    for cell in grid_cells_around(lat, lon, radius_m, BUCKET_DEG):
+        bucket = _buckets.get(cell)
+        if not bucket:
+            continue
+        for poi in bucket.values():
+            if not matches(poi, categories):
+                continue
+            distance = haversine_m(lat, lon, poi["lat"], poi["lon"])
+            if distance <= radius_m:
+                found.append({**poi, "distance_m": round(distance)})
+
+    found.sort(key=lambda p: p["distance_m"])
+    return found[:limit] if limit else found
+
+
+def nearest(lat: float, lon: float, k: int = 10, categories=None, max_radius_m: float = 100000):
+    """
+    k nearest POIs, growing the search radius until k are found.
+    """
+    search_m = 2000
+    while True:
+        found = radius(lat, lon, search_m, categories)
+        if len(found) >= k or search_m >= max_radius_m:
+            return found[:k]
+        search_m = min(search_m * 2, max_radius_m)
+
+
+def stats():
+    return {
+        "pois": sum(len(b) for b in _buckets.values()),
+        "pruned": _pruned,
+        "buckets": len(_buckets),
+        "covered_regions": len(_coverage),
+        "loaded": _loaded,
+    }
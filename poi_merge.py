@@ -0,0 +1,250 @@
+# poi_merge.py
+"""
+Cross-provider POI deduplication.
+
+Candidates from Yelp, Geoapify, Foursquare and OpenTripMap are bucketed on a
+grid sized to the match radius, so only points in neighbouring buckets are
+ever compared. Distances inside a bucket neighbourhood are computed with a
+vectorized (numpy) haversine, and names are only compared for pairs that are
+already close. Matches are grouped with union-find into one canonical POI per
+real place, with every source attribution kept.
+"""
+import math
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from geo import EARTH_RADIUS_M
+
+# Two candidates are the same place if they are very close with similar
+# names, or a bit further apart with near-identical names.
+NEAR_M = 60
+NEAR_SIMILARITY = 0.6
+MAX_MATCH_M = 250
+FAR_SIMILARITY = 0.9
+# Shared tokens needed before one name containing the other counts as a match
+MIN_SHARED_TOKENS = 2
+
+SOURCE_PRIORITY = ["geoapify", "yelp", "foursquare", "opentripmap"]
+STOPWORDS = {"the", "a", "an", "of", "and"}
+# Normalized names providers fill in for unnamed places; like an OpenTripMap
+# title that fell back to its kinds, they never identify a place
+PLACEHOLDER_NAMES = {"unknown place", "local attraction", "attraction", "unnamed"}
+FILL_FIELDS = ["address", "rating", "image", "url", "type"]
+
+# Own bucket plus the "forward" half of its 8 neighbours: each bucket pair
+# is visited exactly once.
+FORWARD_NEIGHBOURS = [(0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+# -----------------------------
+# NAMES
+# -----------------------------
+def normalize_name(name: str) -> str:
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    tokens = re.sub(r"[^\w]+", " ", text).split()
+    return " ".join(t for t in tokens if t not in STOPWORDS)
+
+
+def is_placeholder(poi: dict, key: str) -> bool:
+    name = poi.get("name") or poi.get("title")
+    return key in PLACEHOLDER_NAMES or (poi.get("kinds") is not None and name == poi.get("kinds"))
+
+
+def name_similarity(a: str, b: str) -> float:
+    """
+    0..1 similarity of two normalized names: the better of a character-level
+    ratio and token overlap. Containment ("gateway india" vs "gateway india
+    mumbai" -> 1.0) only counts with at least MIN_SHARED_TOKENS in common;
+    otherwise it is Jaccard, and a lone name inside a longer one scores just
+    that ("park" vs "central park" -> 0.5).
+    """
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    ta, tb = set(a.split()), set(b.split())
+    shared = len(ta & tb)
+    if shared >= MIN_SHARED_TOKENS:
+        overlap = shared / min(len(ta), len(tb))
+    else:
+        overlap = shared / len(ta | tb)
+        if ta < tb or tb < ta:
+            # A bare generic name inside a longer one ("temple" / "golden
+            # temple"): the character ratio would call these a match too
+            return overlap
+    return max(SequenceMatcher(None, a, b).ratio(), overlap)
+
+
+# -----------------------------
+# GEOMETRY
+# -----------------------------
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    """
+    Pairwise great-circle distances in metres, shape (len(lat1), len(lat2)).
+    """
+    lat1 = np.radians(lat1)[:, None]
+    lon1 = np.radians(lon1)[:, None]
+    lat2 = np.radians(lat2)[None, :]
+    lon2 = np.radians(lon2)[None, :]
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def bucket_points(lat, lon):
+    """
+    Group point indices by grid bucket. Buckets are at least MAX_MATCH_M wide
+    in both directions, so any match lies in the same or a neighbouring bucket.
+    """
+    cell_lat = MAX_MATCH_M / 111320.0
+    widest = math.cos(math.radians(min(float(np.abs(lat).max()), 89.0)))
+    cell_lon = MAX_MATCH_M / (111320.0 * widest)
+
+    rows = np.floor(lat / cell_lat).astype(np.int64)
+    cols = np.floor(lon / cell_lon).astype(np.int64)
+
+    buckets = {}
+    for i, key in enumerate(zip(rows.tolist(), cols.tolist())):
+        buckets.setdefault(key, []).append(i)
+    return {key: np.array(idx) for key, idx in buckets.items()}
+
+
+# -----------------------------
+# UNION-FIND
+# -----------------------------
+def find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def union(parent, a, b):
+    ra, rb = find(parent, a), find(parent, b)
+    if ra != rb:
+        parent[max(ra, rb)] = min(ra, rb)
+
+
+# -----------------------------
+# MERGE
+# -----------------------------
+def candidate_pairs(lat, lon, buckets):
+    """
+    Yield (i, j, distance_m) for every pair within MAX_MATCH_M, i != j,
+    each pair once.
+    """
+    for (row, col), idx in buckets.items():
+        if len(idx) > 1:
+            d = haversine_matrix(lat[idx], lon[idx], lat[idx], lon[idx])
+            ii, jj = np.nonzero(np.triu(d <= MAX_MATCH_M, k=1))
+            for a, b in zip(ii.tolist(), jj.tolist()):
+                yield int(idx[a]), int(idx[b]), float(d[a, b])
+
+        for dr, dc in FORWARD_NEIGHBOURS:
+            other = buckets.get((row + dr, col + dc))
+            if other is None:
+                continue
+            d = haversine_matrix(lat[idx], lon[idx], lat[other], lon[other])
+            ii, jj = np.nonzero(d <= MAX_MATCH_M)
+            for a, b in zip(ii.tolist(), jj.tolist()):
+                yield int(idx[a]), int(other[b]), float(d[a, b])
+
+
+def source_rank(poi: dict) -> int:
+    source = poi.get("source")
+    return SOURCE_PRIORITY.index(source) if source in SOURCE_PRIORITY else len(SOURCE_PRIORITY)
+
+
+def canonical(group: list) -> dict:
+    group = sorted(group, key=lambda p: (source_rank(p), -sum(v is not None for v in p.values())))
+    best = group[0]
+
+    merged = {k: v for k, v in best.items() if k not in ("title", "categories")}
+    merged["name"] = best.get("name") or best.get("title")
+
+    coords = [(p["lat"], p["lon"]) for p in group if p.get("lat") is not None]
+    if coords:
+        merged["lat"] = sum(c[0] for c in coords) / len(coords)
+        merged["lon"] = sum(c[1] for c in coords) / len(coords)
+
+    for field in FILL_FIELDS:
+        if merged.get(field) in (None, "", "n/a"):
+            merged[field] = next(
+                (p[field] for p in group if p.get(field) not in (None, "", "n/a")),
+                merged.get(field),
+            )
+
+    categories = []
+    for p in group:
+        for c in p.get("category") or p.get("categories") or []:
+            if c and c not in categories:
+                categories.append(c)
+    merged["category"] = categories
+
+    merged["sources"] = sorted(
+        {p.get("source") for p in group if p.get("source")},
+        key=lambda s: (source_rank({"source": s}), s),
+    )
+    merged["attributions"] = [
+        {
+            "source": p.get("source"),
+            "name": p.get("name") or p.get("title"),
+            "url": p.get("url"),
+        }
+        for p in group
+    ]
+    return merged
+
+
+def merge_pois(candidates) -> list:
+    """
+    One canonical POI per real place, keeping the input order of first
+    appearance. Candidates without coordinates are matched on exact
+    normalized name only; placeholder names never match anything.
+    """
+    items = [c for c in candidates if (c.get("name") or c.get("title"))]
+    if not items:
+        return []
+
+    keys = [normalize_name(c.get("name") or c.get("title")) for c in items]
+    placeholder = [is_placeholder(c, key) for c, key in zip(items, keys)]
+    parent = list(range(len(items)))
+
+    located = [i for i, c in enumerate(items) if c.get("lat") is not None and c.get("lon") is not None]
+    if located:
+        lat = np.array([float(items[i]["lat"]) for i in located])
+        lon = np.array([float(items[i]["lon"]) for i in located])
+
+        for a, b, distance in candidate_pairs(lat, lon, bucket_points(lat, lon)):
+            ia, ib = located[a], located[b]
+            if placeholder[ia] or placeholder[ib] or find(parent, ia) == find(parent, ib):
+                continue
+            similarity = name_similarity(keys[ia], keys[ib])
+            if (distance <= NEAR_M and similarity >= NEAR_SIMILARITY) or similarity >= FAR_SIMILARITY:
+                union(parent, ia, ib)
+
+    # Coordinate-less candidates only join a place with exactly the same name
+    by_name = {}
+    for i in located:
+        if not placeholder[i]:
+            by_name.setdefault(keys[i], i)
+    located_set = set(located)
+    for i, key in enumerate(keys):
+        if i in located_set or placeholder[i]:
+            continue
+        if key in by_name:
+            union(parent, by_name[key], i)
+        else:
+            by_name[key] = i
+
+    groups = {}
+    for i in range(len(items)):
+        groups.setdefault(find(parent, i), []).append(items[i])
+
+    return [canonical(group) for group in groups.values()]
@@ -0,0 +1,388 @@
+# prewarm.py
+"""
+Background cache prewarming for the most requested locations.
+
+Every request to /travel-intel, /experiences, /village/experiences and
+/social is counted per location (exponentially decayed, persisted to the
+SQLite database so every worker process contributes). On each cycle the top
+locations are re-fetched with env_cache.refresh_ahead_s set, so entries that
+would stop being fresh before the next cycle are refreshed now, while users
+keep getting cache hits.
+
+Prewarming has its own concurrency cap and an hourly upstream-call budget,
+and backs off whenever live requests are queueing for an upstream
+connection, so it never starves live traffic.
+
+Runs in-process (PREWARM_ENABLED=1) or as a separate worker that warms a
+running server over HTTP (needs the server's PREWARM_TOKEN):
+
+    python prewarm.py --target http://127.0.0.1:8000
+    python prewarm.py --target http://127.0.0.1:8000 --once
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+import env_cache
+import http_clients
+import logs
+import providers
+import rate_limit
+from db import DB_PATH
+from singleflight import normalize_arg
+
+load_dotenv()
+
+experience_sources = providers.lazy("experiences")
+village_sources = providers.lazy("village")
+social_sources = providers.lazy("social")
+openmeteo = providers.lazy("openmeteo")
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "0") == "1"
+INTERVAL_S = float(os.getenv("PREWARM_INTERVAL_S", "300"))
+# Refresh anything that would stop being fresh before the next cycle
+LEAD_S = float(os.getenv("PREWARM_LEAD_S", str(INTERVAL_S + 60)))
+TOP_N = int(os.getenv("PREWARM_TOP_N", "20"))
+CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", "2"))
+BUDGET_PER_HOUR = float(os.getenv("PREWARM_BUDGET_PER_HOUR", "600"))
+
+log = logging.getLogger(__name__)
+HALF_LIFE_S = float(os.getenv("PREWARM_HALF_LIFE_S", str(24 * 3600)))
+# Locations whose decayed score drops below this are forgotten, and at most
+# MAX_HOT_ROWS (the highest scoring) are kept
+MIN_SCORE = float(os.getenv("PREWARM_MIN_SCORE", "0.1"))
+MAX_HOT_ROWS = int(os.getenv("PREWARM_MAX_HOT_ROWS", "10000"))
+SEED_LOCATIONS = [
+    s.strip() for s in os.getenv("PREWARM_SEED_LOCATIONS", "").split(",") if s.strip()
+]
+# Requests carrying "X-Prewarm: <token>" are treated as prewarm requests
+PREWARM_TOKEN = os.getenv("PREWARM_TOKEN")
+
+# path -> (kind, location parameter, extra parameters that change the answer)
+TRACKED_PATHS = {
+    "/travel-intel": ("travel_intel", "city", []),
+    "/experiences": ("experiences", "location", ["query"]),
+    "/village/experiences": ("village", "location", []),
+    "/social": ("social", "location", ["limit"]),
+}
+PATH_OF = {kind: path for path, (kind, _, _) in TRACKED_PATHS.items()}
+
+# Rough upstream calls per warm job, charged against the budget
+JOB_COST = {"travel_intel": 3, "experiences": 6, "village": 2, "social": 2}
+
+# (kind, location_key, params_json) -> {"location", "hits", "seen_at"}
+_pending = {}
+
+stats = {
+    "cycles": 0, "jobs": 0, "errors": 0, "pruned": 0,
+    "skipped_budget": 0, "skipped_busy": 0, "last_cycle_s": None,
+}
+
+
+# -----------------------------
+# HOT LOCATIONS
+# -----------------------------
+def decayed(score: float, seen_at: float, now: float) -> float:
+    return score * 0.5 ** (max(0.0, now - seen_at) / HALF_LIFE_S)
+
+
+def record(path: str, query_params) -> None:
+    """
+    Count one request (called from the HTTP middleware).
+    """
+    tracked = TRACKED_PATHS.get(path)
+    if tracked is None:
+        return
+    kind, location_param, extra = tracked
+    location = (query_params.get(location_param) or "").strip()
+    if not location:
+        return
+
+    params = json.dumps({p: query_params[p] for p in extra if p in query_params}, sort_keys=True)
+    key = (kind, normalize_arg(location), params)
+    entry = _pending.setdefault(key, {"location": location, "hits": 0})
+    entry["hits"] += 1
+    entry["seen_at"] = time.time()
+
+
+def _init_table(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS prewarm_hot (
+        kind TEXT,
+        location_key TEXT,
+        params TEXT,
+        location TEXT,
+        score REAL,
+        seen_at REAL,
+        PRIMARY KEY (kind, location_key, params))
+    """)
+
+
+def _prune(conn, now: float) -> int:
+    """
+    Delete rows below MIN_SCORE and all but the MAX_HOT_ROWS best.
+    """
+    rows = conn.execute("SELECT kind, location_key, params, score, seen_at FROM prewarm_hot").fetchall()
+    ranked = sorted(rows, key=lambda r: decayed(r[3], r[4], now), reverse=True)
+    drop = [
+        row[:3] for i, row in enumerate(ranked)
+        if i >= MAX_HOT_ROWS or decayed(row[3], row[4], now) < MIN_SCORE
+    ]
+    conn.executemany(
+        "DELETE FROM prewarm_hot WHERE kind = ? AND location_key = ? AND params = ?", drop
+    )
+    return len(drop)
+
+
+def _flush(pending: dict) -> int:
+    with sqlite3.connect(DB_PATH) as conn:
+        _init_table(conn)
+        for (kind, location_key, params), entry in pending.items():
+            row = conn.execute(
+                "SELECT score, seen_at FROM prewarm_hot WHERE kind = ? AND location_key = ? AND params = ?",
+                (kind, location_key, params),
+            ).fetchone()
+            score = entry["hits"]
+            if row:
+                score += decayed(row[0], row[1], entry["seen_at"])
+            conn.execute(
+                "INSERT OR REPLACE INTO prewarm_hot VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, location_key, params, entry["location"], score, entry["seen_at"]),
+            )
+        return _prune(conn, time.time())
+
+
+async def flush():
+    """
+    Merge this process's request counts into the shared table.
+    """
+    global _pending
+    if not _pending:
+        return
+    pending, _pending = _pending, {}
+    try:
+        stats["pruned"] += await asyncio.to_thread(_flush, pending)
+    except sqlite3.Error as e:
+        log.error("prewarm flush failed: %s", e)
+
+
+def _hot_locations(limit: int):
+    now = time.time()
+    with sqlite3.connect(DB_PATH) as conn:
+        _init_table(conn)
+        rows = conn.execute(
+            "SELECT kind, location, params, score, seen_at FROM prewarm_hot"
+        ).fetchall()
+
+    ranked = sorted(
+        ((decayed(score, seen_at, now), kind, location, json.loads(params))
+         for kind, location, params, score, seen_at in rows),
+        key=lambda r: r[0],
+        reverse=True,
+    )
+    return [
+        {"score": round(score, 3), "kind": kind, "location": location, "params": params}
+        for score, kind, location, params in ranked[:limit]
+    ]
+
+
+async def hot_locations(limit: int = TOP_N):
+    """
+    Top `limit` (kind, location, params) by decayed request count, with
+    PREWARM_SEED_LOCATIONS filling in on a cold start.
+    """
+    hot = await asyncio.to_thread(_hot_locations, limit)
+    if len(hot) < limit:
+        known = {(h["kind"], normalize_arg(h["location"])) for h in hot}
+        for location in SEED_LOCATIONS:
+            for kind in PATH_OF:
+                if (kind, normalize_arg(location)) not in known:
+                    hot.append({"score": 0.0, "kind": kind, "location": location, "params": {}})
+    return hot[:limit]
+
+
+# -----------------------------
+# BUDGET
+# -----------------------------
+class Budget:
+    """
+    Token bucket of upstream calls: BUDGET_PER_HOUR spread evenly, with at
+    most one cycle's worth saved up.
+    """
+    def __init__(self, per_hour: float):
+        self.rate = per_hour / 3600
+        self.capacity = max(1.0, per_hour * INTERVAL_S / 3600)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, cost: float) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+
+def upstream_busy(pools: dict) -> bool:
+    """
+    True when live requests are waiting for an upstream connection.
+    """
+    return any(p.get("waiting", 0) > 0 for p in pools.values())
+
+
+# -----------------------------
+# WARMERS
+# -----------------------------
+async def warm_local(kind: str, location: str, params: dict):
+    """
+    Warm this process's caches by calling the providers directly.
+    """
+    env_cache.refresh_ahead_s.set(LEAD_S)
+    rate_limit.priority.set(rate_limit.BACKGROUND)
+
+    if kind == "travel_intel":
+        lat, lon = await openmeteo.get_lat_lon_from_city(location)
+        if lat and lon:
+            await asyncio.gather(
+                openmeteo.get_weather_16_days(lat, lon),
+                openmeteo.get_aqi(city=location, lat=lat, lon=lon),
+            )
+    elif kind == "experiences":
+        await experience_sources.get_combined_experiences(location, params.get("query", "tourist"))
+    elif kind == "village":
+        await village_sources.get_village_experiences(location)
+    elif kind == "social":
+        limit = int(params.get("limit", 5))
+        await asyncio.gather(
+            social_sources.get_reddit_posts(location, limit),
+            social_sources.get_youtube_posts(location, limit),
+        )
+
+
+def remote_warmer(client: httpx.AsyncClient):
+    """
+    Warm a running server by requesting its endpoints with X-Prewarm.
+    Without PREWARM_TOKEN the server would take these for user traffic.
+    """
+    if not PREWARM_TOKEN:
+        raise RuntimeError("PREWARM_TOKEN must be set to warm a remote server")
+
+    async def warm(kind: str, location: str, params: dict):
+        path = PATH_OF[kind]
+        location_param = TRACKED_PATHS[path][1]
+        res = await client.get(
+            path,
+            params={location_param: location, **params},
+            headers={"X-Prewarm": PREWARM_TOKEN},
+        )
+        res.raise_for_status()
+    return warm
+
+
+async def local_pools():
+    return http_clients.pool_stats()
+
+
+def remote_pools(client: httpx.AsyncClient):
+    async def pools():
+        res = await client.get("/stats/http-pools")
+        res.raise_for_status()
+        return res.json()
+    return pools
+
+
+# -----------------------------
+# SCHEDULER
+# -----------------------------
+async def run_cycle(warm, pools, budget: Budget):
+    """
+    Warm the current top locations once, within the concurrency cap and
+    budget, stopping early if live traffic starts queueing.
+    """
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    hot = await hot_locations()
+
+    async def job(item):
+        async with semaphore:
+            if upstream_busy(await pools()):
+                stats["skipped_busy"] += 1
+                return
+            if not budget.take(JOB_COST[item["kind"]]):
+                stats["skipped_budget"] += 1
+                return
+            try:
+                await warm(item["kind"], item["location"], item["params"])
+                stats["jobs"] += 1
+            except Exception as e:
+                stats["errors"] += 1
+                log.warning("prewarm job failed: %s", e, extra={"kind": item["kind"], "location": item["location"]})
+
+    await asyncio.gather(*(job(item) for item in hot))
+    stats["cycles"] += 1
+    stats["last_cycle_s"] = round(time.monotonic() - started, 3)
+
+
+async def run_forever(warm=None, pools=None, warm_enabled: bool = PREWARM_ENABLED):
+    """
+    In-process loop started from the app lifespan: always flushes request
+    counts, and also warms when PREWARM_ENABLED=1.
+    """
+    warm = warm or warm_local
+    pools = pools or local_pools
+    budget = Budget(BUDGET_PER_HOUR)
+    while True:
+        await asyncio.sleep(INTERVAL_S)
+        try:
+            await flush()
+            if warm_enabled:
+                await run_cycle(warm, pools, budget)
+        except Exception:
+            log.exception("prewarm cycle failed")
+
+
+def snapshot():
+    return {
+        **stats,
+        "enabled": PREWARM_ENABLED,
+        "pending_locations": len(_pending),
+        "budget_per_hour": BUDGET_PER_HOUR,
+        "concurrency": CONCURRENCY,
+    }
+
+
+# -----------------------------
+# CLI WORKER
+# -----------------------------
+async def main(target: str, once: bool):
+    async with httpx.AsyncClient(base_url=target, timeout=60) as client:
+        warm, pools = remote_warmer(client), remote_pools(client)
+        budget = Budget(BUDGET_PER_HOUR)
+        while True:
+            await run_cycle(warm, pools, budget)
+            log.info("prewarm cycle done", extra={"stats": dict(stats)})
+            if once:
+                return
+            await asyncio.sleep(INTERVAL_S)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prewarm caches for hot locations")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="base URL of the running API")
+    parser.add_argument("--once", action="store_true", help="run a single cycle and exit")
+    args = parser.parse_args()
+    if not PREWARM_TOKEN:
+        raise SystemExit("PREWARM_TOKEN must be set (the same value as the server's)")
+    logs.setup()
+    try:
+        asyncio.run(main(args.target, args.once))
+    finally:
+        logs.shutdown()
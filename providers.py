@@ -0,0 +1,148 @@
+# providers.py
+"""
+Lazy registry of provider integrations.
+
+Importing main used to import every integration up front: PRAW (and with it
+requests / aiohttp), numpy for POI merging, Pillow for image resizing...
+Here each integration module is imported, and its startup hook run, the
+first time something uses it, or earlier by warm_up(), which the app
+lifespan starts in the background once it is already accepting traffic.
+
+    groq = providers.lazy("groq")        # nothing imported yet
+    await groq.generate_itinerary(...)   # imports llm on first attribute access
+
+    PROVIDERS_WARMUP=0 disables the background warm-up (import on first use only)
+"""
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import time
+
+WARMUP = os.getenv("PROVIDERS_WARMUP", "1") == "1"
+
+log = logging.getLogger(__name__)
+
+# name -> module, the upstreams behind it, and optional startup / shutdown
+# hooks (names of functions in the module, run once after import / at exit)
+PROVIDERS = {
+    "social": {"module": "social", "upstreams": ("reddit", "youtube"), "shutdown": "shutdown"},
+    "experiences": {
+        "module": "experiences",
+        "upstreams": ("yelp", "geoapify", "foursquare", "opentripmap", "weatherapi"),
+    },
+    "village": {"module": "villageexperiences", "upstreams": ("geoapify",)},
+    "groq": {"module": "llm", "upstreams": ("groq",)},
+    "tomtom": {"module": "traffic_tomtom", "upstreams": ("tomtom",)},
+    "travelpayouts": {"module": "hotels", "upstreams": ("travelpayouts",)},
+    "weatherapi": {"module": "weather", "upstreams": ("weatherapi",)},
+    "openmeteo": {
+        "module": "weather_openmeteo",
+        "upstreams": ("openmeteo", "openmeteo_geocoding", "openweather"),
+    },
+    "images": {
+        "module": "image_proxy",
+        "upstreams": ("images",),
+        "startup": "load_index",
+        "shutdown": "shutdown_resize_pool",
+    },
+}
+
+# One lock per integration: loading one never waits behind another's import
+_locks = {name: threading.RLock() for name in PROVIDERS}
+_loaded = {}        # name -> module
+_load_ms = {}       # name -> import + startup time
+
+
+def get(name: str):
+    """
+    The integration's module, imported (and started) on first call.
+    Thread safe; the warm-up calls this from a worker thread.
+    """
+    module = _loaded.get(name)
+    if module is not None:
+        return module
+
+    spec = PROVIDERS[name]
+    with _locks[name]:
+        module = _loaded.get(name)
+        if module is not None:
+            return module
+        started = time.perf_counter()
+        module = importlib.import_module(spec["module"])
+        if spec.get("startup"):
+            getattr(module, spec["startup"])()
+        _load_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+        _loaded[name] = module
+
+    log.info("provider loaded", extra={"provider": name, "duration_ms": _load_ms[name]})
+    return module
+
+
+def loaded(name: str) -> bool:
+    return name in _loaded
+
+
+class LazyProvider:
+    """
+    Module stand-in: the first attribute access imports the integration.
+    """
+
+    def __init__(self, name: str):
+        if name not in PROVIDERS:
+            raise KeyError(f"unknown provider {name!r}")
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get(self._name), attr)
+
+    def __repr__(self):
+        state = "loaded" if loaded(self._name) else "not loaded"
+        return f"<provider {self._name} ({state})>"
+
+
+def lazy(name: str) -> LazyProvider:
+    return LazyProvider(name)
+
+
+async def warm_up(names=None):
+    """
+    Import every not-yet-loaded integration in a worker thread, one at a
+    time, so the event loop keeps serving while the rest of the app loads.
+    """
+    started = time.perf_counter()
+    for name in names or PROVIDERS:
+        if loaded(name):
+            continue
+        try:
+            await asyncio.to_thread(get, name)
+        except Exception:
+            # Left for first use, which will raise where it can be handled
+            log.exception("provider warm-up failed", extra={"provider": name})
+    log.info("providers warmed up", extra={"duration_ms": round((time.perf_counter() - started) * 1000, 1)})
+
+
+def shutdown():
+    """
+    Run the shutdown hook of every integration that was loaded.
+    """
+    for name, module in list(_loaded.items()):
+        hook = PROVIDERS[name].get("shutdown")
+        if hook:
+            try:
+                getattr(module, hook)()
+            except Exception:
+                log.exception("provider shutdown failed", extra={"provider": name})
+
+
+def snapshot():
+    return {
+        name: {
+            "module": spec["module"],
+            "upstreams": list(spec["upstreams"]),
+            "loaded": loaded(name),
+            "load_ms": _load_ms.get(name),
+        }
+        for name, spec in PROVIDERS.items()
+    }
@@ -0,0 +1,387 @@
+# rate_limit.py
+"""
+Central per-provider rate limiting and daily quota tracking.
+
+Every pooled upstream request (and every Reddit search) takes a token from
+its provider's bucket first. When the bucket is empty, callers queue by
+priority: interactive requests are always served before prewarm / background
+refreshes. Each caller either waits up to a deadline or fails fast with
+RateLimited, which provider modules already treat like any other upstream
+error. A 429 from the upstream drains the bucket until its Retry-After.
+
+Daily quotas are counted per UTC day in the SQLite database, shared by every
+worker process (so N workers do not each get the full quota). Each process
+leases a few requests at a time rather than writing per request; if the
+database cannot be reached it falls back to daily / WEB_CONCURRENCY on its
+own. Background work may only spend BACKGROUND_QUOTA_SHARE of a daily quota.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import httpx
+
+from db import DB_PATH
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+DEFAULT_MAX_WAIT_S = {
+    INTERACTIVE: float(os.getenv("RATE_LIMIT_MAX_WAIT_S", "2")),
+    BACKGROUND: float(os.getenv("RATE_LIMIT_BACKGROUND_MAX_WAIT_S", "30")),
+}
+BACKGROUND_QUOTA_SHARE = float(os.getenv("RATE_LIMIT_BACKGROUND_QUOTA_SHARE", "0.8"))
+# Requests of a daily quota a worker claims from the database at once
+QUOTA_LEASE = int(os.getenv("RATE_LIMIT_QUOTA_LEASE", "10"))
+# Worker processes sharing the quota; only used when the database is down
+QUOTA_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+log = logging.getLogger(__name__)
+
+# provider -> requests per second, burst size, requests per UTC day (None = unlimited).
+# Defaults follow each provider's free tier; override with
+# <PROVIDER>_RATE_PER_S, <PROVIDER>_BURST and <PROVIDER>_DAILY_QUOTA.
+LIMITS = {
+    "groq": {"rate": 0.5, "burst": 5, "daily": 14400},
+    "geoapify": {"rate": 5, "burst": 5, "daily": 3000},
+    "yelp": {"rate": 5, "burst": 10, "daily": 5000},
+    "weatherapi": {"rate": 10, "burst": 20, "daily": 30000},
+    "openmeteo": {"rate": 10, "burst": 20, "daily": 10000},
+    "openmeteo_geocoding": {"rate": 10, "burst": 20, "daily": 10000},
+    "openweather": {"rate": 1, "burst": 10, "daily": None},
+    "tomtom": {"rate": 5, "burst": 5, "daily": 2500},
+    # A YouTube search costs 100 of the 10,000 daily quota units
+    "youtube": {"rate": 1, "burst": 3, "daily": 100},
+    "reddit": {"rate": 1.5, "burst": 10, "daily": None},
+    "gnews": {"rate": 1, "burst": 1, "daily": 100},
+    "travelpayouts": {"rate": 1, "burst": 5, "daily": None},
+    "foursquare": {"rate": 10, "burst": 20, "daily": None},
+    "opentripmap": {"rate": 10, "burst": 10, "daily": None},
+    "klimapi": {"rate": 5, "burst": 5, "daily": None},
+}
+
+
+def _env_limits(name: str, config: dict) -> dict:
+    prefix = name.upper()
+    daily = os.getenv(f"{prefix}_DAILY_QUOTA")
+    return {
+        "rate": float(os.getenv(f"{prefix}_RATE_PER_S", config["rate"])),
+        "burst": float(os.getenv(f"{prefix}_BURST", config["burst"])),
+        "daily": (int(daily) or None) if daily is not None else config["daily"],
+    }
+
+
+# Set per request / task: who is asking and how long they will wait
+priority = contextvars.ContextVar("rate_limit_priority", default=INTERACTIVE)
+max_wait_s = contextvars.ContextVar("rate_limit_max_wait_s", default=None)
+
+
+@contextmanager
+def policy(priority_level: int = None, wait_s: float = None):
+    """
+    Run a block with a different priority and/or wait deadline;
+    wait_s=0 fails fast instead of queueing.
+    """
+    tokens = []
+    if priority_level is not None:
+        tokens.append((priority, priority.set(priority_level)))
+    if wait_s is not None:
+        tokens.append((max_wait_s, max_wait_s.set(wait_s)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class RateLimited(httpx.TransportError):
+    """
+    Raised instead of calling the upstream when its budget is exhausted.
+    """
+
+
+def utc_day(now: float) -> int:
+    return int(now // 86400)
+
+
+# -----------------------------
+# DAILY QUOTAS (shared by all workers)
+# -----------------------------
+def _init_quota_table(conn):
+    conn.execute("""CREATE TABLE IF NOT EXISTS rate_quota (
+        provider TEXT,
+        day INTEGER,
+        used INTEGER,
+        used_background INTEGER,
+        PRIMARY KEY (provider, day))
+    """)
+
+
+def _claim(provider: str, day: int, want: int, daily: int, background_cap: float = None):
+    """
+    Atomically move up to `want` requests of today's quota to the caller,
+    also counting them against `background_cap` when given. Returns
+    (granted, used, used_background) as of the claim, across all workers.
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=5, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _init_quota_table(conn)
+        conn.execute("DELETE FROM rate_quota WHERE day < ?", (day - 1,))
+        conn.execute("INSERT OR IGNORE INTO rate_quota VALUES (?, ?, 0, 0)", (provider, day))
+        used, used_background = conn.execute(
+            "SELECT used, used_background FROM rate_quota WHERE provider = ? AND day = ?",
+            (provider, day),
+        ).fetchone()
+
+        granted = min(want, daily - used)
+        if background_cap is not None:
+            granted = min(granted, int(background_cap) - used_background)
+        granted = max(0, granted)
+        background = granted if background_cap is not None else 0
+        if granted:
+            conn.execute(
+                "UPDATE rate_quota SET used = used + ?, used_background = used_background + ? "
+                "WHERE provider = ? AND day = ?",
+                (granted, background, provider, day),
+            )
+        conn.execute("COMMIT")
+        return granted, used + granted, used_background + background
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+class DailyQuota:
+    """
+    One provider's daily quota. Requests are spent from a local lease that
+    is refilled from the shared counter QUOTA_LEASE (at most 1% of the
+    quota) at a time; whatever is leased but unused when the day ends is
+    lost, at most one lease per worker.
+    """
+
+    def __init__(self, name: str, daily: int):
+        self.name = name
+        self.daily = daily
+        self.lease_size = max(1, min(QUOTA_LEASE, daily // 100))
+        self.day = utc_day(time.time())
+        self.leased = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.used_today = 0                 # this worker
+        self.used_background_today = 0
+        self.shared_used = 0                # every worker, as of the last claim
+        self.local_only = False
+        self._lock = asyncio.Lock()
+
+    def _rollover(self):
+        today = utc_day(time.time())
+        if today != self.day:
+            self.day = today
+            self.leased = {INTERACTIVE: 0, BACKGROUND: 0}
+            self.used_today = self.used_background_today = self.shared_used = 0
+
+    def _local_lease(self, level: int) -> int:
+        # Database unavailable: stay within this worker's share
+        limit = self.daily // QUOTA_WORKERS
+        left = limit - self.used_today - sum(self.leased.values())
+        if level == BACKGROUND:
+            left = min(left, int(limit * BACKGROUND_QUOTA_SHARE) - self.used_background_today - self.leased[BACKGROUND])
+        return max(0, min(self.lease_size, left))
+
+    async def _lease(self, level: int):
+        cap = self.daily * BACKGROUND_QUOTA_SHARE if level == BACKGROUND else None
+        try:
+            granted, self.shared_used, _ = await asyncio.to_thread(
+                _claim, self.name, self.day, self.lease_size, self.daily, cap
+            )
+            self.local_only = False
+        except sqlite3.Error as e:
+            if not self.local_only:
+                log.warning("shared quota unavailable, counting locally: %s", e, extra={"provider": self.name})
+            self.local_only = True
+            granted = self._local_lease(level)
+        self.leased[level] += granted
+
+    async def take(self, level: int) -> bool:
+        self._rollover()
+        if self.leased[level] <= 0:
+            async with self._lock:
+                if self.leased[level] <= 0:
+                    await self._lease(level)
+        if self.leased[level] <= 0:
+            return False
+        self.leased[level] -= 1
+        self.used_today += 1
+        if level == BACKGROUND:
+            self.used_background_today += 1
+        return True
+
+    def refund(self, level: int):
+        """
+        The request was never sent (rate limit wait failed): give it back.
+        """
+        self.leased[level] += 1
+        self.used_today -= 1
+        if level == BACKGROUND:
+            self.used_background_today -= 1
+
+
+# -----------------------------
+# LIMITERS
+# -----------------------------
+class ProviderLimiter:
+    def __init__(self, name: str, rate: float, burst: float, daily: int = None):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.daily = daily
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.quota = DailyQuota(name, daily) if daily else None
+        self._waiters = []          # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._timer = None
+        self.stats = {"granted": 0, "queued": 0, "rejected": 0, "quota_rejected": 0, "upstream_429": 0}
+
+    # -- bookkeeping --
+    def _refill(self):
+        now = time.monotonic()
+        if now < self.blocked_until:
+            self.tokens = 0
+        else:
+            since = max(self.updated, self.blocked_until)
+            self.tokens = min(self.burst, self.tokens + (now - since) * self.rate)
+        self.updated = now
+
+    def _take(self):
+        self.tokens -= 1
+        self.stats["granted"] += 1
+
+    # -- queue --
+    def _schedule(self):
+        if self._timer is not None or not self._waiters:
+            return
+        now = time.monotonic()
+        delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate, 0.0)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._grant)
+
+    def _grant(self):
+        self._timer = None
+        self._refill()
+        while self._waiters and self.tokens >= 1:
+            level, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._take()
+            future.set_result(None)
+        # Drop waiters that gave up
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        self._schedule()
+
+    async def acquire(self):
+        level = priority.get()
+        wait_s = max_wait_s.get()
+        if wait_s is None:
+            wait_s = DEFAULT_MAX_WAIT_S[level]
+
+        if self.quota is not None and not await self.quota.take(level):
+            self.stats["quota_rejected"] += 1
+            raise RateLimited(f"{self.name} daily quota exhausted")
+        try:
+            await self._wait_for_token(level, wait_s)
+        except BaseException:
+            if self.quota is not None:
+                self.quota.refund(level)
+            raise
+
+    async def _wait_for_token(self, level: int, wait_s: float):
+        self._refill()
+        # Take a token directly unless someone at least as important is queued
+        if self.tokens >= 1 and not (self._waiters and self._waiters[0][0] <= level):
+            self._take()
+            return
+
+        if wait_s <= 0:
+            self.stats["rejected"] += 1
+            raise RateLimited(f"{self.name} rate limit reached")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._seq), future))
+        self.stats["queued"] += 1
+        self._schedule()
+        try:
+            await asyncio.wait_for(future, wait_s)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            raise RateLimited(f"{self.name} rate limit wait exceeded {wait_s}s") from None
+
+    def throttled(self, retry_after_s: float):
+        """
+        The upstream answered 429: stop sending until Retry-After.
+        """
+        self.stats["upstream_429"] += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after_s)
+        self.tokens = 0
+
+    def usage(self):
+        self._refill()
+        quota = self.quota
+        waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+        for level, _, future in self._waiters:
+            if not future.done():
+                waiting[PRIORITY_NAMES[level]] += 1
+        return {
+            **self.stats,
+            "rate_per_s": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "daily_quota": self.daily,
+            "used_today": quota.used_today if quota else 0,
+            "used_background_today": quota.used_background_today if quota else 0,
+            "used_today_all_workers": quota.shared_used if quota else 0,
+            "quota_shared": bool(quota) and not quota.local_only,
+            "waiting": waiting,
+            "blocked_for_s": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+        }
+
+
+_limiters = {name: ProviderLimiter(name, **_env_limits(name, config)) for name, config in LIMITS.items()}
+
+
+async def acquire(provider: str):
+    """
+    Wait for (or fail fast on) one request's worth of `provider` budget.
+    Providers without configured limits pass straight through.
+    """
+    limiter = _limiters.get(provider)
+    if limiter is not None:
+        await limiter.acquire()
+
+
+def retry_after_s(response: httpx.Response, default: float = 30.0) -> float:
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else default
+    except ValueError:
+        return default
+
+
+def observe(provider: str, response: httpx.Response):
+    limiter = _limiters.get(provider)
+    if limiter is not None and response.status_code == 429:
+        limiter.throttled(retry_after_s(response))
+
+
+def usage():
+    return {name: limiter.usage() for name, limiter in _limiters.items()}
@@ -0,0 +1,87 @@
+# singleflight.py
+"""
+Process-wide request coalescing for identical upstream calls.
+
+Providers opt in with @coalesce("name"). While a call with the same provider
+and normalized arguments is in flight, later callers await that same call
+instead of hitting the upstream again.
+"""
+import asyncio
+import copy
+import functools
+import re
+from collections import defaultdict
+
+
+def normalize_arg(value):
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value.casefold()).strip()
+    if isinstance(value, float):
+        return round(value, 5)
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_arg(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_arg(v)) for k, v in value.items()))
+    return value
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.stats = defaultdict(lambda: {"calls": 0, "upstream": 0, "coalesced": 0})
+
+    async def do(self, provider: str, key, fn):
+        """
+        Run `fn()` once per (provider, key) at a time and share the result.
+        The shared call keeps running even if the caller that started it
+        is cancelled, so the other waiters still get an answer.
+        """
+        stats = self.stats[provider]
+        stats["calls"] += 1
+        full_key = (provider, key)
+
+        task = self._calls.get(full_key)
+        if task is not None:
+            stats["coalesced"] += 1
+            result = await asyncio.shield(task)
+            # Followers get their own copy so nobody mutates a shared result
+            return copy.deepcopy(result)
+
+        stats["upstream"] += 1
+        task = asyncio.ensure_future(fn())
+        self._calls[full_key] = task
+        task.add_done_callback(lambda _: self._calls.pop(full_key, None))
+        return await asyncio.shield(task)
+
+    def snapshot(self):
+        inflight = defaultdict(int)
+        for provider, _ in self._calls:
+            inflight[provider] += 1
+        return {
+            provider: {**stats, "inflight": inflight.get(provider, 0)}
+            for provider, stats in self.stats.items()
+        }
+
+
+flights = SingleFlight()
+
+
+def coalesce(provider: str, key=None):
+    """
+    Decorator for async provider calls. `key(*args, **kwargs)` picks the
+    identity of a call; by default every argument is normalized and used.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if key is not None:
+                call_key = normalize_arg(key(*args, **kwargs))
+            else:
+                call_key = (normalize_arg(args), normalize_arg(kwargs))
+            return await flights.do(provider, call_key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def stats():
+    return flights.snapshot()
@@ -1,9 +1,16 @@
 # social.py
 import os
-import httpx
-import praw
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from urllib.parse import quote_plus
+from http_clients import get_client
+from singleflight import normalize_arg
+import env_cache
+import rate_limit
+import metrics
 
 load_dotenv()
 
@@ -15,36 +22,75 @@ REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
 REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
 REDDIT_USER_AGENT = os.getenv("REDDIT_USER_AGENT")
 
+# Each source gets this long before /social and /trends give up on it
+SOURCE_DEADLINE_S = float(os.getenv("SOCIAL_SOURCE_DEADLINE_S", "5"))
+
+log = logging.getLogger(__name__)
+
 # -----------------------------
 # REDDIT CLIENT (optional)
 # -----------------------------
-reddit = None
-if all([REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT]):
-    reddit = praw.Reddit(
-        client_id=REDDIT_CLIENT_ID,
-        client_secret=REDDIT_CLIENT_SECRET,
-        user_agent=REDDIT_USER_AGENT
-    )
+# PRAW is synchronous and not thread safe: searches run in a small bounded
+# pool, with one Reddit instance per worker thread.
+REDDIT_CONFIGURED = all([REDDIT_CLIENT_ID, REDDIT_CLIENT_SECRET, REDDIT_USER_AGENT])
+REDDIT_WORKERS = int(os.getenv("REDDIT_WORKERS", "4"))
+
+reddit_executor = ThreadPoolExecutor(max_workers=REDDIT_WORKERS, thread_name_prefix="reddit")
+_reddit_local = threading.local()
+
+
+def get_reddit():
+    if not hasattr(_reddit_local, "client"):
+        # Imported here: PRAW (and requests under it) is slow to import and
+        # only needed once Reddit is actually searched
+        import praw
+        _reddit_local.client = praw.Reddit(
+            client_id=REDDIT_CLIENT_ID,
+            client_secret=REDDIT_CLIENT_SECRET,
+            user_agent=REDDIT_USER_AGENT
+        )
+    return _reddit_local.client
+
+
+def shutdown():
+    reddit_executor.shutdown(wait=False, cancel_futures=True)
 
 # -----------------------------
 # IMAGE PROXY
 # -----------------------------
 API_BASE = os.getenv("API_BASE", "https://backend-eqzz.onrender.com")
 
-def proxify(url: str):
-    return f"{API_BASE}/img?url={quote_plus(url)}" if url else None
+# Cards render at ~300 px on mobile; ask for 2x for high-DPI screens
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "600"))
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp")
+
+def proxify(url: str, width: int = None, quality: int = None, fmt: str = None):
+    if not url:
+        return None
+    proxied = f"{API_BASE}/img?url={quote_plus(url)}"
+    if width:
+        proxied += f"&w={width}"
+    if quality:
+        proxied += f"&q={quality}"
+    if fmt:
+        proxied += f"&fmt={fmt}"
+    return proxied
+
+
+def proxify_thumbnail(url: str):
+    return proxify(url, width=THUMBNAIL_WIDTH, fmt=THUMBNAIL_FORMAT)
 
 # -----------------------------
 # REDDIT
 # -----------------------------
-async def get_reddit_posts(query: str, limit: int = 5):
-    if not reddit:
-        return []  # Safe fallback if Reddit not configured
-
+def search_reddit(query: str, limit: int = 5):
+    """
+    Blocking PRAW search. Only call from reddit_executor.
+    """
     results = []
 
     try:
-        for post in reddit.subreddit("travel").search(query, limit=limit, sort="relevance"):
+        for post in get_reddit().subreddit("travel").search(query, limit=limit, sort="relevance"):
             image = None
 
             if hasattr(post, "preview"):
@@ -59,7 +105,7 @@ async def get_reddit_posts(query: str, limit: int = 5):
                 "source": "reddit",
                 "title": post.title,
                 "description": post.selftext[:200] if post.selftext else f"From r/{post.subreddit}",
-                "image": proxify(image),
+                "image": proxify_thumbnail(image),
                 "url": f"https://www.reddit.com{post.permalink}"
             })
 
@@ -69,25 +115,56 @@ async def get_reddit_posts(query: str, limit: int = 5):
 
     return results
 
+
+@metrics.timed("get_reddit_posts", fallback=metrics.is_empty)
+async def get_reddit_posts(query: str, limit: int = 5):
+    if not REDDIT_CONFIGURED:
+        return []  # Safe fallback if Reddit not configured
+
+    # Empty answers are usually errors swallowed by search_reddit: not cached
+    return await env_cache.get_keyed(
+        "social", ("reddit", normalize_arg(query), limit),
+        lambda: fetch_reddit_posts(query, limit),
+    )
+
+
+async def fetch_reddit_posts(query: str, limit: int = 5):
+    # PRAW has its own HTTP session, so Reddit is limited here
+    try:
+        await rate_limit.acquire("reddit")
+    except rate_limit.RateLimited as e:
+        log.info("reddit skipped: %s", e, extra={"provider": "reddit"})
+        return []
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(reddit_executor, search_reddit, query, limit)
+
 # -----------------------------
 # YOUTUBE
 # -----------------------------
+@metrics.timed("get_youtube_posts", fallback=metrics.is_empty)
 async def get_youtube_posts(query: str, limit: int = 5):
     if not YOUTUBE_API_KEY:
         return []  # Safe fallback if key missing
 
+    return await env_cache.get_keyed(
+        "social", ("youtube", normalize_arg(query), limit),
+        lambda: fetch_youtube_posts(query, limit),
+    )
+
+
+async def fetch_youtube_posts(query: str, limit: int = 5):
     q = quote_plus(query)
     url = (
-        "https://www.googleapis.com/youtube/v3/search"
+        "/youtube/v3/search"
         f"?part=snippet&type=video&maxResults={limit}"
         f"&q={q}&key={YOUTUBE_API_KEY}"
     )
 
     try:
-        async with httpx.AsyncClient(timeout=15) as client:
-            r = await client.get(url)
-            r.raise_for_status()
-            data = r.json()
+        r = await get_client("youtube").get(url)
+        r.raise_for_status()
+        data = r.json()
 
         results = []
         for item in data.get("items", []):
@@ -98,7 +175,7 @@ async def get_youtube_posts(query: str, limit: int = 5):
                 "source": "youtube",
                 "title": s["title"],
                 "description": s["description"][:200],
-                "image": proxify(s["thumbnails"]["medium"]["url"]),
+                "image": proxify_thumbnail(s["thumbnails"]["medium"]["url"]),
                 "url": f"https://www.youtube.com/watch?v={vid}"
             })
 
@@ -107,3 +184,19 @@ async def get_youtube_posts(query: str, limit: int = 5):
     except Exception:
         # Never crash API because of YouTube
         return []
+
+
+# -----------------------------
+# DEADLINES
+# -----------------------------
+async def with_deadline(coro, seconds: float = SOURCE_DEADLINE_S):
+    """
+    Await one social source, giving up with [] after `seconds`.
+    A timed-out Reddit search keeps its worker until PRAW returns, but the
+    request no longer waits for it.
+    """
+    try:
+        return await asyncio.wait_for(coro, seconds)
+    except asyncio.TimeoutError:
+        log.info("social source timed out", extra={"timeout_s": seconds})
+        return []
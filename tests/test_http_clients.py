@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import circuit_breaker
+import http_clients
+import rate_limit
+
+
+def half_open_transport():
+    breaker = circuit_breaker.CircuitBreaker("tomtom")
+    breaker.state = circuit_breaker.OPEN
+    breaker.opened_at = time.monotonic() - circuit_breaker.OPEN_S - 1
+    transport = http_clients.PooledTransport(
+        "tomtom",
+        limits=httpx.Limits(max_connections=1),
+        http2=False,
+        dns_backend=http_clients.CachingDNSBackend(),
+        breaker=breaker,
+    )
+    return transport, breaker
+
+
+def request():
+    return httpx.Request("GET", "http://127.0.0.1:9/")
+
+
+def test_rate_limited_probe_frees_half_open_slot(monkeypatch):
+    transport, breaker = half_open_transport()
+
+    async def limited(name):
+        raise rate_limit.RateLimited(f"{name} daily quota exhausted")
+
+    monkeypatch.setattr(rate_limit, "acquire", limited)
+    with pytest.raises(rate_limit.RateLimited):
+        asyncio.run(transport.handle_async_request(request()))
+
+    assert breaker.state == circuit_breaker.HALF_OPEN
+    assert breaker.probing is False
+    breaker.allow()  # the next call may probe instead of hitting CircuitOpen
+
+
+def test_cancelled_while_queued_frees_half_open_slot(monkeypatch):
+    transport, breaker = half_open_transport()
+
+    async def queued(name):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(rate_limit, "acquire", queued)
+
+    async def run():
+        task = asyncio.create_task(transport.handle_async_request(request()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert breaker.probing is False
+    breaker.allow()
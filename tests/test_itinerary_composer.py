@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import itinerary_composer as composer
+
+
+def poi(name, *categories, distance_m=100):
+    return {"name": name, "category": list(categories), "lat": 27.17, "lon": 78.04, "distance_m": distance_m}
+
+
+def test_places_outside_the_themes_are_not_candidates():
+    found = composer.candidates([
+        poi("Comfort Inn", "accommodation.hotel"),
+        poi("City Clinic", "healthcare.clinic_or_praxis"),
+        poi("Fort Parking", "parking.cars"),
+        poi("Taj Mahal", "tourism.sights", "heritage"),
+    ])
+    assert [p["name"] for p in found] == ["Taj Mahal"]
+    assert found[0]["theme"] == "culture"
+
+
+def test_categories_match_by_prefix_not_substring():
+    assert composer.theme_of(poi("Lodi Garden", "leisure.park")) == "nature"
+    assert composer.theme_of(poi("Dosa Corner", "catering.restaurant.indian")) == "food"
+    assert composer.theme_of(poi("Bangla Sahib", "religion.place_of_worship.sikhism")) == "spiritual"
+    assert composer.theme_of(poi("Saket Mall", "commercial.shopping_mall")) == "shopping"
+    assert composer.theme_of(poi("Corner Shop", "commercial.supermarket")) is None
+
+
+def test_name_words_only_refine_generic_sights():
+    assert composer.theme_of(poi("Red Fort", "tourism.sights")) == "culture"
+    assert composer.theme_of(poi("Comfort Point", "tourism.sights")) == "sights"
+    assert composer.theme_of(poi("Parkview Tower", "tourism.attraction")) == "sights"
+    # A category theme wins over a word in the name
+    assert composer.theme_of(poi("Temple View Cafe", "catering.cafe")) == "food"
+
+
+def test_slow_top_up_does_not_hold_up_the_llm_fallback(monkeypatch):
+    class Sources:
+        async def geocode_location(self, location):
+            return 27.17, 78.04
+
+        async def search_village_experiences(self, lat, lon):
+            await asyncio.sleep(5)
+
+        async def search_geoapify(self, location, query):
+            await asyncio.sleep(5)
+
+    monkeypatch.setattr(composer, "village_sources", Sources())
+    monkeypatch.setattr(composer, "experience_sources", Sources())
+    monkeypatch.setattr(composer, "TOPUP_S", 0.05)
+    monkeypatch.setattr(composer.poi_index, "radius", lambda *args, **kwargs: [])
+
+    async def run():
+        started = time.monotonic()
+        result = await composer.compose("Agra", "culture", "", 2, 2)
+        elapsed = time.monotonic() - started
+        # Still warming the index in the background
+        assert len(composer._background) == 2
+        for task in list(composer._background):
+            task.cancel()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(run())
+    assert result is None
+    assert elapsed < 1
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from itinerary_parser import ItineraryParser, parse_itinerary, repair_json
+
+
+def item(day, title, places=("A", "B", "C")):
+    return {"day": day, "title": title, "intro": "Nice.", "top_places": [{"name": p, "tip": "Go."} for p in places]}
+
+
+def feed_in_chunks(parser, text, size=7):
+    events = []
+    for i in range(0, len(text), size):
+        events.extend(parser.feed(text[i:i + size]))
+    return events
+
+
+def test_items_are_emitted_as_each_object_closes():
+    text = "```json\n" + json.dumps([item(1, "One"), item(1, "Two")]) + "\n```"
+    parser = ItineraryParser(per_day=2)
+    events = feed_in_chunks(parser, text)
+    assert [e["item"]["title"] for e in events] == ["One", "Two"]
+    assert [e["index"] for e in events] == [0, 1]
+    assert parser.close() == []
+
+
+def test_object_cut_between_fields_is_repaired_on_close():
+    text = json.dumps([item(1, "One"), item(2, "Two")])
+    cut = text[:text.rindex('"Go."') + len('"Go."')]
+    parser = ItineraryParser(per_day=1)
+    assert len(feed_in_chunks(parser, cut)) == 1
+
+    events = parser.close()
+    assert len(events) == 1
+    assert events[0]["index"] == 1
+    assert events[0]["item"]["title"] == "Two"
+    assert events[0]["item"]["top_places"][2] == {"name": "C", "tip": "Go."}
+    assert "error" not in events[0]
+
+
+def test_object_cut_inside_a_value_is_broken():
+    text = json.dumps([item(1, "One"), item(2, "Two", places=("A", "B", "Mandara Sky"))])
+    for cut in (text[:text.rindex("Sky")] + "S", text[:text.rindex('"Go."') + 3]):
+        events = parse_itinerary(cut, per_day=1)
+        assert events[0]["item"]["title"] == "One"
+        assert events[1]["item"] is None
+        assert "cut off" in events[1]["error"]
+
+
+def test_invalid_object_is_reported_with_error():
+    events = parse_itinerary(json.dumps([item(1, "One", places=("A",))]))
+    assert events[0]["item"] is None
+    assert "top_places" in events[0]["error"]
+    assert events[0]["raw"]
+
+
+def test_missing_day_comes_from_position():
+    broken = item(1, "Three")
+    del broken["day"]
+    events = parse_itinerary(json.dumps([item(1, "One"), item(1, "Two"), broken]), per_day=2)
+    assert events[2]["item"]["day"] == 2
+
+
+def test_repair_json_fixes_common_llm_mistakes():
+    assert json.loads(repair_json('{“a”: [1, 2,], "b": "x\ny",}')) == {"a": [1, 2], "b": "x\ny"}
+    assert json.loads(repair_json('{"a": 1, "b')) == {"a": 1}
+    assert json.loads(repair_json('{"a": 1, "b": ')) == {"a": 1}
+    assert json.loads(repair_json('{"a": [1, 2], "b": "x"')) == {"a": [1, 2], "b": "x"}
+
+
+def test_repair_json_refuses_values_cut_short():
+    for text in ('{"a": "hal', '{"a": ["x", "y', '{"a": 12'):
+        with pytest.raises(ValueError):
+            repair_json(text)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+import llm
+
+
+def item(day, title):
+    places = [{"name": f"{title} {i}", "tip": "Go."} for i in range(3)]
+    return {"day": day, "title": title, "intro": "Nice.", "top_places": places}
+
+
+TRUNCATED = json.dumps([item(1, "One"), item(2, "Two")])[:-4]   # cut right after the last tip
+
+
+@pytest.fixture
+def groq(monkeypatch):
+    monkeypatch.setattr(llm, "VY_GROQ_API_KEY", "test")
+
+    async def stream_completion(prompt, max_tokens=llm.MAX_TOKENS):
+        for i in range(0, len(TRUNCATED), 10):
+            yield TRUNCATED[i:i + 10]
+
+    async def request_item(*args, **kwargs):
+        raise AssertionError("a repaired item must not be re-requested")
+
+    monkeypatch.setattr(llm, "stream_completion", stream_completion)
+    monkeypatch.setattr(llm, "request_item", request_item)
+
+
+def test_generate_itinerary_keeps_item_repaired_on_close(groq):
+    items = asyncio.run(llm.generate_itinerary("prompt", per_day=1, total=2))
+    assert not isinstance(items, llm.FallbackItinerary)
+    assert [i["title"] for i in items] == ["One", "Two"]
+
+
+def test_stream_itinerary_yields_item_repaired_on_close(groq):
+    async def collect():
+        return [i async for i in llm.stream_itinerary("prompt", per_day=1, total=2)]
+
+    assert [i["title"] for i in asyncio.run(collect())] == ["One", "Two"]
+
+
+def sharded(monkeypatch, answer):
+    monkeypatch.setattr(llm, "VY_GROQ_API_KEY", "test")
+    monkeypatch.setattr(llm, "SHARD_DAYS", 2)
+
+    async def stream_completion(prompt, max_tokens=llm.MAX_TOKENS):
+        first, last = map(int, re.search(r"covers only days (\d+) to (\d+)", prompt).groups())
+        yield json.dumps(answer(first, last))
+
+    async def request_item(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(llm, "stream_completion", stream_completion)
+    monkeypatch.setattr(llm, "request_item", request_item)
+    return asyncio.run(llm.generate_itinerary_sharded("Agra", "low", "culture", "fun", 4, 1))
+
+
+def test_shard_days_follow_position_not_model_numbering(monkeypatch):
+    # The model numbers the days of the trip, not of its shard
+    items = sharded(monkeypatch, lambda first, last: [item(d, f"Day {d}") for d in range(first, last + 1)])
+    assert [i["day"] for i in items] == [1, 2, 3, 4]
+    assert not isinstance(items, llm.RepeatingItinerary)
+
+
+def test_unresolved_repeats_are_marked(monkeypatch):
+    items = sharded(monkeypatch, lambda first, last: [item(1, "Same"), item(2, f"Other {first}")])
+    assert len(items) == 4
+    assert isinstance(items, llm.RepeatingItinerary)
+
+
+def test_max_tokens_never_exceed_the_model_limit():
+    assert llm.max_tokens_for(1) == llm.MAX_TOKENS
+    assert llm.max_tokens_for(10_000) == llm.MODEL_MAX_TOKENS
+
+
+def test_long_trips_stream_shard_by_shard(monkeypatch):
+    monkeypatch.setattr(llm, "VY_GROQ_API_KEY", "test")
+    monkeypatch.setattr(llm, "SHARD_DAYS", 2)
+    asked = []
+
+    async def stream_completion(prompt, max_tokens=llm.MAX_TOKENS):
+        first, last = map(int, re.search(r"covers only days (\d+) to (\d+)", prompt).groups())
+        asked.append((first, max_tokens))
+        yield json.dumps([item(d, f"Day {d}") for d in range(first, last + 1)])
+
+    monkeypatch.setattr(llm, "stream_completion", stream_completion)
+
+    async def collect():
+        stream = llm.stream_itinerary_sharded("Agra", "low", "culture", "fun", 5, 1)
+        return [i async for i in stream]
+
+    items = asyncio.run(collect())
+    assert [i["day"] for i in items] == [1, 2, 3, 4, 5]
+    assert sorted(first for first, _ in asked) == [1, 3, 5]
+    assert not llm.repeats_places(items)
@@ -0,0 +1,27 @@
+from poi_merge import merge_pois
+
+
+def poi(name, lat, lon, source="geoapify", **extra):
+    return {"name": name, "lat": lat, "lon": lon, "source": source, **extra}
+
+
+def test_same_place_from_two_providers_is_merged():
+    merged = merge_pois([
+        poi("Gateway of India", 18.9220, 72.8347),
+        poi("Gateway Of India Mumbai", 18.9221, 72.8346, source="yelp"),
+    ])
+    assert len(merged) == 1
+    assert merged[0]["sources"] == ["geoapify", "yelp"]
+
+
+def test_placeholder_names_never_match():
+    kinds = "interesting_places,cultural,museums"
+    merged = merge_pois([
+        poi("Unknown place", 18.9220, 72.8347),
+        poi("Unknown place", 18.9222, 72.8347),
+        {"title": kinds, "kinds": kinds, "lat": 18.9221, "lon": 72.8348, "source": "opentripmap"},
+        {"title": kinds, "kinds": kinds, "lat": 18.9223, "lon": 72.8348, "source": "opentripmap"},
+        poi("Unknown place", None, None),
+    ])
+    assert len(merged) == 5
+    assert [(m["lat"], m["lon"]) for m in merged[:2]] == [(18.9220, 72.8347), (18.9222, 72.8347)]
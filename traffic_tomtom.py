@@ -1,17 +1,22 @@
-import requests
 import os
+from http_clients import get_client
+from singleflight import coalesce
+import metrics
 
 TOMTOMKEY = os.getenv("TOMTOMKEY")
 
-def get_traffic_status(lat: float, lon: float):
-    url = "https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json"
+@metrics.timed("get_traffic_status", fallback=lambda r: r.get("status") == "Unavailable")
+@coalesce("tomtom")
+async def get_traffic_status(lat: float, lon: float):
+    url = "/traffic/services/4/flowSegmentData/absolute/10/json"
     params = {
         "point": f"{lat},{lon}",
         "key": TOMTOMKEY
     }
 
     try:
-        r = requests.get(url, params=params, timeout=10).json()
+        res = await get_client("tomtom").get(url, params=params)
+        r = res.json()
         data = r.get("flowSegmentData")
 
         if not data:
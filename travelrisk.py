@@ -1,13 +1,18 @@
-import httpx
 import os
+import logging
 from dotenv import load_dotenv
+from http_clients import get_client
+import metrics
 
 load_dotenv()
 GNEWS_API_KEY = os.getenv("GNEWS_API_KEY")
 
+log = logging.getLogger(__name__)
+
+@metrics.timed("get_custom_travel_risk")
 async def get_custom_travel_risk(country: str):
     try:
-        url = "https://gnews.io/api/v4/search"
+        url = "/api/v4/search"
         params = {
             "q": f"{country} travel OR {country} safety OR {country} unrest",
             "lang": "en",
@@ -15,28 +20,27 @@ async def get_custom_travel_risk(country: str):
             "max": 10
         }
 
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
+        response = await get_client("gnews").get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
 
-            headlines = [article["title"] for article in data["articles"]]
-            content_summary = " | ".join(headlines)
+        headlines = [article["title"] for article in data["articles"]]
+        content_summary = " | ".join(headlines)
 
-            # Simple scoring logic (demo only)
-            risk_score = 1.0  # default low risk
-            risk_keywords = ["protest", "riot", "unrest", "emergency", "alert", "ban", "evacuation"]
+        # Simple scoring logic (demo only)
+        risk_score = 1.0  # default low risk
+        risk_keywords = ["protest", "riot", "unrest", "emergency", "alert", "ban", "evacuation"]
 
-            if any(kw in content_summary.lower() for kw in risk_keywords):
-                risk_score = 4.0  # higher risk
+        if any(kw in content_summary.lower() for kw in risk_keywords):
+            risk_score = 4.0  # higher risk
 
-            return {
-                "risk_level": risk_score,
-                "message": f"Top news: {headlines[:3]}"
-            }
+        return {
+            "risk_level": risk_score,
+            "message": f"Top news: {headlines[:3]}"
+        }
 
     except Exception as e:
-        print("Custom Travel Risk Error:", e)
+        log.warning("travel risk error: %s", e, extra={"provider": "gnews"})
         return {
             "risk_level": "Unknown",
             "message": "Could not fetch risk data."
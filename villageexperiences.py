@@ -1,10 +1,28 @@
-import aiohttp
 import os
+from http_clients import get_client
+from geocoding import geocode
+from geo import haversine_m
+from singleflight import coalesce
+import poi_index
+import metrics
 
 GEOAPIFY_API_KEY = os.getenv("GEOAPIFY_API_KEY")
 
-GEOAPIFY_GEOCODE_URL = "https://api.geoapify.com/v1/geocode/search"
-GEOAPIFY_PLACES_URL = "https://api.geoapify.com/v2/places"
+GEOAPIFY_GEOCODE_URL = "/v1/geocode/search"
+GEOAPIFY_PLACES_URL = "/v2/places"
+
+VILLAGE_CATEGORIES = [
+    "tourism.sights",
+    "heritage",
+    "natural",
+    "leisure.park",
+    "entertainment.museum",
+    "religion.place_of_worship"
+]
+
+UI_LIMIT = 10
+# Places per Geoapify request; a full page means the region was not seen whole
+FETCH_LIMIT = 50
 
 
 def label_from_category(categories):
@@ -26,6 +44,7 @@ def label_from_category(categories):
     return "Local Attraction"
 
 
+@metrics.timed("geocode_location", fallback=lambda r: r[0] is None)
 async def geocode_location(location: str):
     """
     Step 1: Convert location name -> latitude & longitude
@@ -33,96 +52,131 @@ async def geocode_location(location: str):
     if not GEOAPIFY_API_KEY:
         raise RuntimeError("GEOAPIFY_API_KEY not set")
 
+    return await geocode(location, "geoapify", fetch_geocode)
+
+
+async def fetch_geocode(location: str):
     params = {
         "text": location,
         "limit": 1,
         "apiKey": GEOAPIFY_API_KEY
     }
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
-        async with session.get(GEOAPIFY_GEOCODE_URL, params=params) as res:
-            if res.status != 200:
-                text = await res.text()
-                raise RuntimeError(f"Geoapify geocode error {res.status}: {text}")
+    res = await get_client("geoapify").get(GEOAPIFY_GEOCODE_URL, params=params)
+    if res.status_code != 200:
+        raise RuntimeError(f"Geoapify geocode error {res.status_code}: {res.text}")
 
-            data = await res.json()
-            features = data.get("features", [])
+    data = res.json()
+    features = data.get("features", [])
 
-            if not features:
-                return None, None
+    if not features:
+        return None, None
 
-            coords = features[0]["geometry"]["coordinates"]
-            lon, lat = coords[0], coords[1]
+    coords = features[0]["geometry"]["coordinates"]
+    lon, lat = coords[0], coords[1]
 
-            return lat, lon
+    return lat, lon
 
 
+@metrics.timed("search_village_experiences", fallback=metrics.is_empty)
+@coalesce("geoapify_village")
 async def search_village_experiences(lat: float, lon: float, radius_m: int = 50000):
     """
-    Step 2: Fetch nearby village / rural / natural / cultural experiences
+    Step 2: Fetch nearby village / rural / natural / cultural experiences.
+    Answered from the local POI index when a recent fetch around here
+    covered the whole radius, or at least enough of it to hold the UI_LIMIT
+    nearest places.
+    """
+    covered = min(poi_index.covered_radius("village", lat, lon), radius_m)
+    nearest = poi_index.radius(lat, lon, covered, VILLAGE_CATEGORIES, limit=UI_LIMIT) if covered else []
+    if covered and (covered >= radius_m or len(nearest) >= UI_LIMIT):
+        return [
+            {
+                "name": p.get("name") or "Local Attraction",
+                "category": poi_index.categories_of(p),
+                "type": label_from_category(poi_index.categories_of(p)),
+                "address": p.get("address"),
+                "lat": p["lat"],
+                "lon": p["lon"],
+                "distance_m": p["distance_m"],
+                "source": p.get("source", "geoapify")
+            }
+            for p in nearest
+        ]
+
+    results, complete_m = await fetch_village_experiences(lat, lon, radius_m)
+    await poi_index.add(results, coverage_kind="village", lat=lat, lon=lon, radius_m=complete_m)
+
+    # ✅ Sort by nearest first
+    results.sort(key=lambda x: x.get("distance_m") or 10**9)
+
+    # ✅ Limit for UI
+    return results[:UI_LIMIT]
+
+
+async def fetch_village_experiences(lat: float, lon: float, radius_m: int):
+    """
+    (results, complete_m): every place within complete_m of (lat, lon) is
+    in the results. That is the whole radius unless Geoapify returned a
+    full page; then, since results are nearest first, it is the distance
+    of the farthest one.
     """
-
     if not GEOAPIFY_API_KEY:
         raise RuntimeError("GEOAPIFY_API_KEY not set")
 
     params = {
-        "categories": ",".join([
-            "tourism.sights",
-            "heritage",
-            "natural",
-            "leisure.park",
-            "entertainment.museum",
-            "religion.place_of_worship"
-        ]),
+        "categories": ",".join(VILLAGE_CATEGORIES),
         "filter": f"circle:{lon},{lat},{radius_m}",
         "bias": f"proximity:{lon},{lat}",
-        "limit": 50,   # fetch more, we will filter + trim later
+        "limit": FETCH_LIMIT,   # fetch more, we will filter + trim later
         "apiKey": GEOAPIFY_API_KEY
     }
 
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
-        async with session.get(GEOAPIFY_PLACES_URL, params=params) as res:
-            if res.status != 200:
-                text = await res.text()
-                raise RuntimeError(f"Geoapify places error {res.status}: {text}")
-
-            data = await res.json()
-            features = data.get("features", [])
-
-            results = []
-
-            for f in features:
-                props = f.get("properties", {})
-                geom = f.get("geometry", {})
-                coords = geom.get("coordinates", [None, None])
-
-                name = props.get("name")
-                categories = props.get("categories", [])
-                distance = props.get("distance")
-
-                # ✅ Skip unnamed forests (your requirement)
-                if "natural.forest" in categories and not name:
-                    continue
-
-                # Build clean item
-                results.append({
-                    "name": name or "Local Attraction",
-                    "category": categories,
-                    "type": label_from_category(categories),   # friendly tag
-                    "address": props.get("formatted"),
-                    "lat": coords[1],
-                    "lon": coords[0],
-                    "distance_m": distance,
-                    "source": "geoapify"
-                })
-
-            # ✅ Sort by nearest first
-            results.sort(key=lambda x: x.get("distance_m", 10**9))
-
-            # ✅ Limit for UI
-            results = results[:10]
-
-            return results
+    res = await get_client("geoapify").get(GEOAPIFY_PLACES_URL, params=params)
+    if res.status_code != 200:
+        raise RuntimeError(f"Geoapify places error {res.status_code}: {res.text}")
+
+    data = res.json()
+    features = data.get("features", [])
+
+    results = []
+
+    for f in features:
+        props = f.get("properties", {})
+        geom = f.get("geometry", {})
+        coords = geom.get("coordinates", [None, None])
+
+        name = props.get("name")
+        categories = props.get("categories", [])
+        distance = props.get("distance")
+
+        # ✅ Skip unnamed forests (your requirement)
+        if "natural.forest" in categories and not name:
+            continue
+
+        # Build clean item
+        results.append({
+            "name": name or "Local Attraction",
+            "category": categories,
+            "type": label_from_category(categories),   # friendly tag
+            "address": props.get("formatted"),
+            "lat": coords[1],
+            "lon": coords[0],
+            "distance_m": distance,
+            "source": "geoapify"
+        })
+
+    if len(features) < FETCH_LIMIT:
+        return results, radius_m
+    # Unnamed forests were skipped above but still bound what we have seen
+    farthest = 0.0
+    for f in features:
+        distance = f.get("properties", {}).get("distance")
+        coords = f.get("geometry", {}).get("coordinates") or [None, None]
+        if distance is None and None not in coords[:2]:
+            distance = haversine_m(lat, lon, coords[1], coords[0])
+        farthest = max(farthest, distance or 0.0)
+    return results, min(farthest, radius_m)
 
 
 async def get_village_experiences(location: str):
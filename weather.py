@@ -1,40 +1,67 @@
-import os, httpx
+import os
+import logging
 from dotenv import load_dotenv
+from http_clients import get_client
+from singleflight import coalesce
+from weather_openmeteo import get_lat_lon_from_city
+import env_cache
+import metrics
 
 load_dotenv()
 WEATHERAPI_KEY = os.getenv("WEATHERAPI_KEY")
 
+log = logging.getLogger(__name__)
+
+@metrics.timed("get_weather_and_risk", fallback=lambda r: r.get("temperature_c") is None)
+@coalesce("weatherapi")
 async def get_weather_and_risk(location: str):
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            url = "https://api.weatherapi.com/v1/current.json"  # HTTPS
-            params = {
-                "key": WEATHERAPI_KEY,
-                "q": location,
-                "aqi": "no"
-            }
-
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json()
-
-            condition = data["current"]["condition"]["text"].lower()
-            temp_c = data["current"]["temp_c"]
-
-            indoor_preferred = any(word in condition for word in [
-                "rain", "snow", "storm", "fog", "drizzle", "wind"
-            ])
-
-            return {
-                "summary": condition.title(),
-                "temperature_c": temp_c,
-                "indoor_preferred": indoor_preferred
-            }
+        lat, lon = await get_lat_lon_from_city(location)
+    except Exception as e:
+        log.warning("geocoding error: %s", e, extra={"provider": "openmeteo_geocoding"})
+        lat, lon = None, None
+
+    try:
+        if lat is None or lon is None:
+            # Unknown to the geocoder: let WeatherAPI resolve the name, uncached
+            return await fetch_current_weather(location)
+
+        # Current conditions are cached per geohash cell for a few minutes
+        return await env_cache.get(
+            "current", lat, lon, lambda: fetch_current_weather(f"{lat},{lon}")
+        )
 
     except Exception as e:
-        print("WeatherAPI error:", e)
+        log.warning("weatherapi error: %s", e, extra={"provider": "weatherapi"})
         return {
             "summary": "Unknown",
             "temperature_c": None,
             "indoor_preferred": True
         }
+
+
+async def fetch_current_weather(q: str):
+    client = get_client("weatherapi")
+    url = "/v1/current.json"
+    params = {
+        "key": WEATHERAPI_KEY,
+        "q": q,
+        "aqi": "no"
+    }
+
+    r = await client.get(url, params=params)
+    r.raise_for_status()
+    data = r.json()
+
+    condition = data["current"]["condition"]["text"].lower()
+    temp_c = data["current"]["temp_c"]
+
+    indoor_preferred = any(word in condition for word in [
+        "rain", "snow", "storm", "fog", "drizzle", "wind"
+    ])
+
+    return {
+        "summary": condition.title(),
+        "temperature_c": temp_c,
+        "indoor_preferred": indoor_preferred
+    }
@@ -1,10 +1,18 @@
-import requests
 import os
+from http_clients import get_client
+from geocoding import geocode
+import env_cache
+import metrics
 
 OPENWEATHER = os.getenv("OPENWEATHER")
 
-def get_lat_lon_from_city(city: str):
-    url = "https://geocoding-api.open-meteo.com/v1/search"
+@metrics.timed("get_lat_lon_from_city", fallback=lambda r: r[0] is None)
+async def get_lat_lon_from_city(city: str):
+    return await geocode(city, "openmeteo", fetch_lat_lon_from_city)
+
+
+async def fetch_lat_lon_from_city(city: str):
+    url = "/v1/search"
     params = {
         "name": city,
         "count": 1,
@@ -12,7 +20,8 @@ def get_lat_lon_from_city(city: str):
         "format": "json"
     }
 
-    r = requests.get(url, params=params, timeout=10).json()
+    res = await get_client("openmeteo_geocoding").get(url, params=params)
+    r = res.json()
 
     if "results" not in r or not r["results"]:
         return None, None
@@ -20,26 +29,26 @@ def get_lat_lon_from_city(city: str):
     return r["results"][0]["latitude"], r["results"][0]["longitude"]
 
 
-def get_weather_16_days(lat: float, lon: float):
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "daily": (
-            "temperature_2m_max,"
-            "temperature_2m_min,"
-            "weathercode,"
-            "rain_sum,"
-            "windspeed_10m_max"
-        ),
-        "forecast_days": 16,
-        "timezone": "auto"
-    }
+@metrics.timed("get_weather_16_days", fallback=metrics.is_empty)
+async def get_weather_16_days(lat: float, lon: float):
+    """
+    16-day forecast, cached per geohash cell for a few hours (stale-while-revalidate).
+    """
+    return await env_cache.get(
+        "forecast_16d", lat, lon, lambda: fetch_weather_16_days(lat, lon)
+    )
 
-    r = requests.get(url, params=params, timeout=10).json()
 
-    daily = r.get("daily", {})
+FORECAST_DAILY = (
+    "temperature_2m_max,"
+    "temperature_2m_min,"
+    "weathercode,"
+    "rain_sum,"
+    "windspeed_10m_max"
+)
 
+
+def parse_daily(daily: dict):
     forecast = []
     for i in range(len(daily.get("time", []))):
         forecast.append({
@@ -53,8 +62,60 @@ def get_weather_16_days(lat: float, lon: float):
 
     return forecast
 
+
+async def fetch_weather_16_days(lat: float, lon: float):
+    url = "/v1/forecast"
+    params = {
+        "latitude": lat,
+        "longitude": lon,
+        "daily": FORECAST_DAILY,
+        "forecast_days": 16,
+        "timezone": "auto"
+    }
+
+    res = await get_client("openmeteo").get(url, params=params)
+    res.raise_for_status()
+    r = res.json()
+
+    return parse_daily(r.get("daily", {}))
+
+
+@metrics.timed("get_weather_16_days_many")
+async def get_weather_16_days_many(coords):
+    """
+    16-day forecasts for several (lat, lon) pairs: cached cells are served
+    from env_cache, all the others come from one multi-location request.
+    """
+    return await env_cache.get_many("forecast_16d", coords, fetch_weather_16_days_many)
+
+
+async def fetch_weather_16_days_many(coords):
+    """
+    One Open-Meteo call for many locations (comma-separated coordinates).
+    """
+    url = "/v1/forecast"
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in coords),
+        "longitude": ",".join(str(lon) for _, lon in coords),
+        "daily": FORECAST_DAILY,
+        "forecast_days": 16,
+        "timezone": "auto"
+    }
+
+    res = await get_client("openmeteo").get(url, params=params)
+    res.raise_for_status()
+    r = res.json()
+
+    # A single location comes back as an object, several as a list
+    locations = r if isinstance(r, list) else [r]
+    if len(locations) != len(coords):
+        raise RuntimeError(f"Open-Meteo returned {len(locations)} forecasts for {len(coords)} locations")
+
+    return [parse_daily(loc.get("daily", {})) for loc in locations]
+
 # ---------- AQI ----------
-def get_aqi(city: str = None, lat: float = None, lon: float = None):
+@metrics.timed("get_aqi", fallback=lambda r: r.get("aqi") == "N/A")
+async def get_aqi(city: str = None, lat: float = None, lon: float = None):
     if not OPENWEATHER:
         return {
             "aqi": "N/A",
@@ -67,14 +128,24 @@ def get_aqi(city: str = None, lat: float = None, lon: float = None):
             "health_note": "Location not found"
         }
 
-    url = "https://api.openweathermap.org/data/2.5/air_pollution"
+    # AQI buckets by the hour; a stale cell is refreshed in the background
+    return await env_cache.get(
+        "aqi", lat, lon, lambda: fetch_aqi(lat, lon),
+        cacheable=lambda value: value.get("aqi") != "N/A",
+    )
+
+
+async def fetch_aqi(lat: float, lon: float):
+    url = "/data/2.5/air_pollution"
     params = {
         "lat": lat,
         "lon": lon,
         "appid": OPENWEATHER
     }
 
-    r = requests.get(url, params=params, timeout=10).json()
+    res = await get_client("openweather").get(url, params=params)
+    res.raise_for_status()
+    r = res.json()
 
     if "list" not in r or not r["list"]:
         return {
@@ -1,33 +1,42 @@
 import os
-import aiohttp
+from http_clients import get_client
+from singleflight import coalesce
+import metrics
+import poi_index
 
 YELP_API_KEY = os.getenv("YELP_API_KEY")
 
 
+@metrics.timed("search_yelp", fallback=metrics.is_empty)
+@coalesce("yelp")
 async def search_yelp(location: str, query: str):
     if not YELP_API_KEY:
         return []
 
-    url = "https://api.yelp.com/v3/businesses/search"
+    url = "/v3/businesses/search"
     headers = {"Authorization": f"Bearer {YELP_API_KEY}"}
     params = {"location": location, "term": query, "limit": 10, "sort_by": "rating"}
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers, params=params) as res:
-            try:
-                data = await res.json()
-                businesses = data.get("businesses", [])
-                return [
-                    {
-                        "name": b["name"],
-                        "rating": b.get("rating", "n/a"),
-                        "address": ", ".join(b["location"].get("display_address", [])),
-                        "image": b.get("image_url"),
-                        "url": b.get("url"),
-                        "lat": b["coordinates"].get("latitude"),
-                        "lon": b["coordinates"].get("longitude"),
-                    }
-                    for b in businesses
-                ]
-            except:
-                return []
+    res = await get_client("yelp").get(url, headers=headers, params=params)
+    try:
+        data = res.json()
+        businesses = data.get("businesses", [])
+        results = [
+            {
+                "name": b["name"],
+                "categories": [c.get("alias", "") for c in b.get("categories", [])],
+                "rating": b.get("rating", "n/a"),
+                "address": ", ".join(b["location"].get("display_address", [])),
+                "image": b.get("image_url"),
+                "url": b.get("url"),
+                "lat": b["coordinates"].get("latitude"),
+                "lon": b["coordinates"].get("longitude"),
+                "source": "yelp",
+            }
+            for b in businesses
+        ]
+    except:
+        return []
+
+    await poi_index.add(results)
+    return results